@@ -126,6 +126,10 @@ export const SummarizeDebugInfoSchema = z.object({
     model: z.string(),
     usage: z.any().optional(),
   }).optional(),
+  timings: z.object({
+    extraction_ms: z.number(),
+    llm_ms: z.number(),
+  }).optional(),
 })
 
 const RoutingInfoSchema = z.object({
@@ -0,0 +1,389 @@
+"""
+Shared RSS harvester with a persistent URL frontier.
+
+crawl_tienphong.py, open_browser.py and test_sites_stability.py used to each
+download their feeds one after another, decompress gzip by hand, parse them
+with regexes or a full DOM and forget everything on exit. This module does it
+once for all of them:
+
+- every feed is fetched concurrently (thread pool), with at most
+  ``per_host`` requests in flight and ``min_interval`` seconds between
+  requests to the same host;
+- feeds are fetched conditionally: the stored ``ETag`` / ``Last-Modified`` go
+  out as ``If-None-Match`` / ``If-Modified-Since`` and an unchanged feed
+  costs a ``304`` with no body; feeds fetched less than ``max_age`` seconds
+  ago are not requested at all;
+- responses are decompressed and parsed as a stream (``gzip`` + ``iterparse``),
+  clearing each ``<item>`` / ``<entry>`` once read;
+- discovered article URLs are deduplicated into a SQLite frontier
+  (``frontier.sqlite`` next to this file) that remembers which feeds each URL
+  was seen in, so callers can ask for the freshest links of a site or topic
+  without touching the network.
+
+    python harvester.py                      # refresh every known feed
+    python harvester.py --feeds tienphong_topics --list 1_thoi_su --limit 10
+    python harvester.py --stats
+"""
+
+import argparse
+import gzip
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(HERE, "frontier.sqlite")
+USER_AGENT = "Mozilla/5.0"
+
+# Feed label -> URL, grouped by the scripts that use them. A feed shared by
+# several groups keeps the same label so frontier queries by label stay stable.
+FEED_GROUPS = {
+    "sites": {
+        "vnexpress": "https://vnexpress.net/rss/tin-moi-nhat.rss",
+        "tuoitre": "https://tuoitre.vn/rss/tin-moi-nhat.rss",
+        "dantri": "https://dantri.com.vn/rss/home.rss",
+        "thanhnien": "https://thanhnien.vn/rss/home.rss",
+        "tienphong": "https://tienphong.vn/rss/home.rss",
+    },
+    "tienphong_topics": {
+        "1_thoi_su": "https://tienphong.vn/rss/thoi-su-2.rss",
+        "2_phap_luat": "https://tienphong.vn/rss/phap-luat-12.rss",
+        "3_kinh_te": "https://tienphong.vn/rss/kinh-te-3.rss",
+        "4_giao_duc": "https://tienphong.vn/rss/giao-duc-71.rss",
+        "5_van_hoa": "https://tienphong.vn/rss/van-hoa-7.rss",
+    },
+    "tienphong_sections": {
+        "tienphong": "https://tienphong.vn/rss/home.rss",
+        "tienphong_xa_hoi": "https://tienphong.vn/rss/xa-hoi-2.rss",
+        "3_kinh_te": "https://tienphong.vn/rss/kinh-te-3.rss",
+        "tienphong_the_gioi": "https://tienphong.vn/rss/the-gioi-5.rss",
+        "tienphong_gioi_tre": "https://tienphong.vn/rss/gioi-tre-4.rss",
+        "2_phap_luat": "https://tienphong.vn/rss/phap-luat-12.rss",
+    },
+}
+SITES = FEED_GROUPS["sites"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    url           TEXT PRIMARY KEY,
+    label         TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    fetched_at    REAL,
+    status        INTEGER,
+    item_count    INTEGER
+);
+CREATE TABLE IF NOT EXISTS articles (
+    url           TEXT PRIMARY KEY,
+    host          TEXT NOT NULL,
+    title         TEXT,
+    published_at  REAL,
+    discovered_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sightings (
+    url      TEXT NOT NULL REFERENCES articles(url),
+    feed_url TEXT NOT NULL REFERENCES feeds(url),
+    PRIMARY KEY (url, feed_url)
+);
+CREATE INDEX IF NOT EXISTS articles_host ON articles (host, published_at);
+"""
+
+
+def host_of(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def feeds_for(*groups):
+    """{label: url} for the named groups (all groups when none are given)."""
+    feeds = {}
+    for group in groups or FEED_GROUPS:
+        feeds.update(FEED_GROUPS[group])
+    return feeds
+
+
+# ----------------------------------------------------------------------
+# Fetching and parsing
+# ----------------------------------------------------------------------
+class HostLimiter:
+    """At most ``per_host`` concurrent requests and ``min_interval`` s between starts, per host."""
+
+    def __init__(self, per_host=2, min_interval=1.0):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def __call__(self, host):
+        return _HostSlot(self, host)
+
+    def _acquire(self, host):
+        with self._lock:
+            slot = self._slots.setdefault(host, threading.Semaphore(self.per_host))
+        slot.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _release(self, host):
+        self._slots[host].release()
+
+
+class _HostSlot:
+    def __init__(self, limiter, host):
+        self.limiter = limiter
+        self.host = host
+
+    def __enter__(self):
+        self.limiter._acquire(self.host)
+
+    def __exit__(self, *exc):
+        self.limiter._release(self.host)
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_items(stream):
+    """Yield ``(link, title, published_at)`` for each RSS ``<item>`` / Atom ``<entry>``, streaming."""
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        tag = _local(elem.tag)
+        if tag not in ("item", "entry"):
+            continue
+        link = title = published = None
+        for child in elem:
+            name = _local(child.tag)
+            if name == "link":
+                link = (child.text or child.get("href") or "").strip() or link
+            elif name == "title":
+                title = (child.text or "").strip()
+            elif name in ("pubDate", "published", "updated") and child.text and published is None:
+                published = _parse_date(child.text.strip())
+        elem.clear()
+        if link and link.startswith("http"):
+            yield link, title, published
+
+
+def _parse_date(text):
+    try:
+        return parsedate_to_datetime(text).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def fetch_feed(url, etag=None, last_modified=None, timeout=10):
+    """
+    Conditionally GET ``url`` and parse it while it downloads.
+
+    Returns ``(status, items, etag, last_modified)``; ``items`` is empty on 304.
+    """
+    headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            stream = resp
+            # Some feeds are gzipped without saying so; peek at the magic bytes.
+            if resp.headers.get("Content-Encoding") == "gzip" or resp.peek(2)[:2] == b"\x1f\x8b":
+                stream = gzip.GzipFile(fileobj=resp)
+            items = list(parse_items(stream))
+            return resp.status, items, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, [], etag, last_modified
+        raise
+
+
+# ----------------------------------------------------------------------
+# Frontier
+# ----------------------------------------------------------------------
+class Frontier:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def feed_state(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, fetched_at FROM feeds WHERE url = ?", (url,)
+            ).fetchone()
+
+    def record_feed(self, url, label, status, items, etag, last_modified):
+        """Store a fetch result; returns how many article URLs were new."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO feeds (url, label, etag, last_modified, fetched_at, status, item_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET label = excluded.label, "
+                    "etag = excluded.etag, last_modified = excluded.last_modified, fetched_at = excluded.fetched_at, "
+                    "status = excluded.status, item_count = COALESCE(excluded.item_count, feeds.item_count)",
+                    (url, label, etag, last_modified, now, status, len(items) if status == 200 else None),
+                )
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO articles (url, host, title, published_at, discovered_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(link, host_of(link), title, published, now) for link, title, published in items],
+                )
+                new = self._conn.total_changes - before
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO sightings (url, feed_url) VALUES (?, ?)",
+                    [(link, url) for link, _, _ in items],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return new
+
+    def links(self, label=None, host=None, limit=None, max_age_days=None, pattern=None):
+        """Article URLs, newest first, optionally restricted to a feed label, host or age."""
+        sql = "SELECT DISTINCT a.url, COALESCE(a.published_at, a.discovered_at) AS ts FROM articles a"
+        where, params = [], []
+        if label:
+            sql += " JOIN sightings s ON s.url = a.url JOIN feeds f ON f.url = s.feed_url"
+            where.append("f.label = ?")
+            params.append(label)
+        if host:
+            where.append("a.host = ?")
+            params.append(host_of("//" + host))
+        if pattern:
+            where.append("a.url GLOB ?")
+            params.append(pattern)
+        if max_age_days is not None:
+            where.append("COALESCE(a.published_at, a.discovered_at) >= ?")
+            params.append(time.time() - max_age_days * 86400)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("feeds", "articles", "sightings")
+            }
+
+
+# ----------------------------------------------------------------------
+# Harvest
+# ----------------------------------------------------------------------
+def harvest(frontier, feeds, workers=8, per_host=2, min_interval=1.0, max_age=600, timeout=10, verbose=True):
+    """
+    Refresh ``feeds`` ({label: url}) into ``frontier`` concurrently.
+
+    Feeds fetched less than ``max_age`` seconds ago are skipped. Returns
+    ``{label: (status, new_urls)}``; status is ``"fresh"`` for skipped feeds
+    and the exception name for failed ones.
+    """
+    limiter = HostLimiter(per_host=per_host, min_interval=min_interval)
+    results = {}
+
+    def refresh(label, url):
+        state = frontier.feed_state(url)
+        if state and state[2] and max_age and time.time() - state[2] < max_age:
+            return label, "fresh", 0
+        etag, last_modified = (state[0], state[1]) if state else (None, None)
+        try:
+            with limiter(host_of(url)):
+                status, items, etag, last_modified = fetch_feed(url, etag, last_modified, timeout)
+        except Exception as e:
+            return label, type(e).__name__, 0
+        return label, status, frontier.record_feed(url, label, status, items, etag, last_modified)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for label, status, new in pool.map(lambda kv: refresh(*kv), feeds.items()):
+            results[label] = (status, new)
+            if verbose:
+                print(f"  {label:<22} {status!s:>6}  +{new} new")
+    if verbose:
+        print(f"Harvested {len(feeds)} feeds in {time.monotonic() - started:.1f}s; frontier {frontier.stats()}")
+    return results
+
+
+def refresh(feeds, db=DEFAULT_DB, **kwargs):
+    """``harvest`` into the frontier at ``db``."""
+    frontier = Frontier(db)
+    try:
+        return harvest(frontier, feeds, **kwargs)
+    finally:
+        frontier.close()
+
+
+def fresh_links(feeds, label=None, host=None, limit=None, pattern=None, db=DEFAULT_DB, **kwargs):
+    """Refresh ``feeds`` and return the newest frontier links matching the filters."""
+    frontier = Frontier(db)
+    try:
+        harvest(frontier, feeds, **kwargs)
+        return frontier.links(label=label, host=host, limit=limit, pattern=pattern)
+    finally:
+        frontier.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh RSS feeds into the URL frontier")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Frontier database (default: {DEFAULT_DB})")
+    parser.add_argument("--feeds", nargs="*", choices=sorted(FEED_GROUPS), default=[],
+                        help="Feed groups to refresh (default: all)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=2, help="Concurrent requests per host")
+    parser.add_argument("--min-interval", type=float, default=1.0, help="Seconds between requests to one host")
+    parser.add_argument("--max-age", type=float, default=600, help="Skip feeds fetched less than this many seconds ago")
+    parser.add_argument("--no-refresh", action="store_true", help="Only query the frontier")
+    parser.add_argument("--list", metavar="LABEL", nargs="?", const="", help="Print links (optionally of one feed label)")
+    parser.add_argument("--host", help="Restrict --list to one host")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--stats", action="store_true", help="Print frontier counts and exit")
+    args = parser.parse_args()
+
+    frontier = Frontier(args.db)
+    try:
+        if args.stats:
+            print(frontier.stats())
+            return
+        if not args.no_refresh:
+            harvest(frontier, feeds_for(*args.feeds), workers=args.workers, per_host=args.per_host,
+                    min_interval=args.min_interval, max_age=args.max_age)
+        if args.list is not None:
+            for url in frontier.links(label=args.list or None, host=args.host, limit=args.limit):
+                print(url)
+    finally:
+        frontier.close()
+
+
+if __name__ == "__main__":
+    main()
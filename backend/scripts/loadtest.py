@@ -0,0 +1,489 @@
+"""
+Open-loop load test for the summarize pipeline and the BERT service.
+
+Replays the metrics_reports dataset URLs (and the article texts / summaries
+cached in run_metrics.py's result store) against one endpoint at fixed
+request rates, and reports latency percentiles, throughput and error rate
+per rate step:
+
+    python loadtest.py run --target summarize --rate 0.5 1 2 --duration 60 --out base.json
+    python loadtest.py run --target evaluate  --rate 5 10 --duration 30
+    python loadtest.py run --target bert      --rate 5 10 20 --duration 30 --bert http://localhost:7860
+    python loadtest.py compare base.json new.json --threshold 0.10
+
+Requests are sent on a fixed schedule (``--arrival constant`` or ``poisson``)
+whether or not earlier ones have finished, so a slow server shows up as
+growing latency instead of a silently lower request rate. ``latency_ms`` is
+measured from the scheduled send time (it includes client-side queueing once
+``--max-in-flight`` requests are outstanding); ``service_ms`` from the actual
+send.
+
+Per-stage breakdown:
+- summarize: ``debug.timings`` (content extraction / LLM call) of each response
+- bert: the ``bert_stage_duration_seconds`` histograms of ``GET /metrics``,
+  scraped before and after each step (one worker's view in multi-worker mode)
+
+Offline: ``python loadtest.py stub-llm --port 8089`` serves an
+OpenAI-compatible ``/v1/chat/completions`` with configurable latency and
+error rate. Start the backend with ``OPENAI_BASE_URL=http://localhost:8089/v1``
+and run the summarize target with ``--cached-content`` so articles come from
+the result store instead of being fetched.
+
+``compare`` matches steps by target and rate and exits non-zero when p50/p95/p99
+latency or error rate got worse, or throughput dropped, by more than the threshold.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+METRICS_DIR = os.path.normpath(os.path.join(HERE, "..", "..", "metrics_reports"))
+DEFAULT_DATASET_DIR = os.path.join(METRICS_DIR, "dataset")
+DEFAULT_DB = os.path.join(METRICS_DIR, "results", "results.sqlite")
+
+TARGETS = ("summarize", "evaluate", "bert")
+
+# The bert target sends what backend/services/bert.service.ts sends, with the
+# same cuts (kept in one place, bert/batch_score.py).
+sys.path.insert(0, os.path.normpath(os.path.join(HERE, "..", "..", "bert")))
+from batch_score import MAX_CANDIDATE_CHARS, MAX_LONG_REFERENCE_CHARS, MAX_REFERENCE_CHARS  # noqa: E402
+STAGE_RE = re.compile(r'^bert_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+# ----------------------------------------------------------------------
+# Corpus
+# ----------------------------------------------------------------------
+def load_urls(dataset_dir):
+    urls = []
+    for name in sorted(os.listdir(dataset_dir)):
+        if not name.endswith(".csv"):
+            continue
+        with open(os.path.join(dataset_dir, name), "r", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            urls += [row[0].strip() for row in reader if row and row[0].strip().startswith("http")]
+    return urls
+
+
+def load_cached_pairs(db_path):
+    """(url, article, summary) triples from run_metrics.py's result store."""
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT s.url, c.text, s.summary FROM summaries s "
+            "JOIN contents c ON c.sha256 = s.content_sha256 ORDER BY s.url, s.model"
+        ).fetchall()
+    finally:
+        conn.close()
+    return rows
+
+
+def build_requests(args):
+    """List of (path, payload) to cycle through for the chosen target."""
+    if args.target == "summarize":
+        if args.cached_content:
+            pairs = load_cached_pairs(args.db)
+            articles = {url: text for url, text, _ in pairs}
+            if not articles:
+                raise SystemExit(f"--cached-content: no cached articles in {args.db} (run run_metrics.py first)")
+            return [("/api/summarize", {"url": url, "content": text, "debug": True})
+                    for url, text in articles.items()]
+        urls = load_urls(args.dataset_dir)
+        if not urls:
+            raise SystemExit(f"No dataset URLs found in {args.dataset_dir}")
+        return [("/api/summarize", {"url": url, "debug": True}) for url in urls]
+
+    pairs = load_cached_pairs(args.db)
+    if not pairs:
+        raise SystemExit(f"The {args.target} target needs cached articles and summaries in {args.db}")
+    if args.target == "evaluate":
+        return [("/api/evaluate", {"original": text, "summary": summary}) for _, text, summary in pairs]
+    # Cut like bert.service.ts: the service never sees more than this, so
+    # longer payloads would measure segmentation/tokenization work it never does.
+    ref_chars = MAX_LONG_REFERENCE_CHARS if args.long_document else MAX_REFERENCE_CHARS
+    payload = {"long_document": True} if args.long_document else {}
+    return [
+        ("/calculate-score", {"reference_text": text[:ref_chars], "candidate_text": summary[:MAX_CANDIDATE_CHARS],
+                              **payload})
+        for _, text, summary in pairs
+    ]
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+def post_json(url, payload, timeout):
+    """POST and return (status, parsed body or None, error string or None)."""
+    data = json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = resp.read()
+            try:
+                return resp.status, json.loads(body), None
+            except ValueError:
+                return resp.status, None, None
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, None, f"HTTP {e.code}"
+    except (socket.timeout, TimeoutError):
+        return None, None, "timeout"
+    except Exception as e:
+        return None, None, type(e).__name__
+
+
+def scrape_stages(bert_url):
+    """{stage: (sum_seconds, count)} from the BERT service's /metrics."""
+    try:
+        with urllib.request.urlopen(f"{bert_url}/metrics", timeout=5) as resp:
+            text = resp.read().decode("utf-8")
+    except Exception:
+        return None
+    stages = {}
+    for line in text.splitlines():
+        m = STAGE_RE.match(line)
+        if m:
+            kind, stage, value = m.groups()
+            total, count = stages.get(stage, (0.0, 0))
+            stages[stage] = (float(value), count) if kind == "sum" else (total, int(float(value)))
+    return stages
+
+
+# ----------------------------------------------------------------------
+# Statistics
+# ----------------------------------------------------------------------
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def describe(values):
+    values = sorted(values)
+    if not values:
+        return {"n": 0}
+    r = lambda v: round(v, 1)
+    return {
+        "n": len(values),
+        "mean": r(sum(values) / len(values)),
+        "p50": r(percentile(values, 0.50)),
+        "p95": r(percentile(values, 0.95)),
+        "p99": r(percentile(values, 0.99)),
+        "max": r(values[-1]),
+    }
+
+
+# ----------------------------------------------------------------------
+# Runner
+# ----------------------------------------------------------------------
+def schedule(rate, count, arrival, rng):
+    """Send offsets (seconds from step start) for ``count`` requests at ``rate``/s."""
+    if arrival == "poisson":
+        t, times = 0.0, []
+        for _ in range(count):
+            times.append(t)
+            t += rng.expovariate(rate)
+        return times
+    return [i / rate for i in range(count)]
+
+
+def run_step(args, base_url, requests, rate, offset):
+    count = args.requests or max(1, int(round(rate * args.duration)))
+    times = schedule(rate, count, args.arrival, random.Random(args.seed))
+    samples = []
+    lock = threading.Lock()
+
+    def one(path, payload, scheduled):
+        sent = time.perf_counter()
+        status, body, error = post_json(base_url + path, payload, args.timeout)
+        done = time.perf_counter()
+        stages = {}
+        if body and isinstance(body.get("debug"), dict):
+            stages = {k: float(v) for k, v in (body["debug"].get("timings") or {}).items()}
+        with lock:
+            samples.append({
+                "ok": error is None and status is not None and status < 400,
+                "status": status if status is not None else error,
+                "latency_ms": (done - scheduled) * 1000,
+                "service_ms": (done - sent) * 1000,
+                "done": done,
+                "stages": stages,
+            })
+
+    before = scrape_stages(args.bert) if args.target == "bert" else None
+    print(f"--> {args.target} @ {rate:g} req/s: {count} requests ({args.arrival} arrivals)")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+        for i, t in enumerate(times):
+            delay = started + t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            path, payload = requests[(offset + i) % len(requests)]
+            pool.submit(one, path, payload, started + t)
+    elapsed = max(s["done"] for s in samples) - started if samples else 0.0
+    after = scrape_stages(args.bert) if args.target == "bert" else None
+
+    ok = [s for s in samples if s["ok"]]
+    status_counts = {}
+    for s in samples:
+        key = str(s["status"])
+        status_counts[key] = status_counts.get(key, 0) + 1
+
+    stages = {}
+    for name in sorted({k for s in ok for k in s["stages"]}):
+        stages[name] = describe([s["stages"][name] for s in ok if name in s["stages"]])
+    if before is not None and after is not None:
+        for name, (total, n) in sorted(after.items()):
+            prev_total, prev_n = before.get(name, (0.0, 0))
+            if n > prev_n:
+                stages[name] = {"n": n - prev_n, "mean": round((total - prev_total) / (n - prev_n) * 1000, 1)}
+
+    step = {
+        "target": args.target,
+        "long_document": args.long_document,
+        "rate": rate,
+        "arrival": args.arrival,
+        "sent": len(samples),
+        "completed": len(ok),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else None,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else None,
+        "latency_ms": describe([s["latency_ms"] for s in ok]),
+        "service_ms": describe([s["service_ms"] for s in ok]),
+        "stages_ms": stages,
+        "status_counts": status_counts,
+    }
+    lat = step["latency_ms"]
+    print(f"    ok {step['completed']}/{step['sent']}, {step['throughput_rps']} req/s, "
+          f"p50 {lat.get('p50')} ms, p95 {lat.get('p95')} ms, p99 {lat.get('p99')} ms, "
+          f"errors {step['status_counts'] if step['errors'] else 0}")
+    for name, s in stages.items():
+        print(f"    stage {name}: mean {s.get('mean')} ms" + (f", p95 {s['p95']} ms" if "p95" in s else ""))
+    return step, offset + count
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def cmd_run(args):
+    requests = build_requests(args)
+    base_url = (args.bert if args.target == "bert" else args.backend).rstrip("/")
+    result = {
+        "meta": {
+            "label": args.label,
+            "target": args.target,
+            "base_url": base_url,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "corpus_size": len(requests),
+            "duration_s": args.duration,
+            "max_in_flight": args.max_in_flight,
+            "timeout_s": args.timeout,
+            "long_document": args.long_document,
+        },
+        "steps": [],
+    }
+    offset = 0
+    for i, rate in enumerate(args.rate):
+        if i and args.pause:
+            time.sleep(args.pause)
+        step, offset = run_step(args, base_url, requests, rate, offset)
+        result["steps"].append(step)
+
+    out = args.out or f"loadtest-{args.target}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Saved {out}")
+
+
+# ----------------------------------------------------------------------
+# Compare
+# ----------------------------------------------------------------------
+# (label, getter, True if higher is worse)
+COMPARED = [
+    ("p50 ms", lambda s: s["latency_ms"].get("p50"), True),
+    ("p95 ms", lambda s: s["latency_ms"].get("p95"), True),
+    ("p99 ms", lambda s: s["latency_ms"].get("p99"), True),
+    ("throughput", lambda s: s.get("throughput_rps"), False),
+    ("error rate", lambda s: s.get("error_rate"), True),
+]
+
+
+def compare(base, new, threshold, error_slack=0.01):
+    """Rows of (step, metric, base, new, change, regressed) for steps present in both runs."""
+    def key_of(s):
+        return s["target"], s["rate"], s.get("long_document", False)
+
+    base_steps = {key_of(s): s for s in base["steps"]}
+    rows = []
+    for step in new["steps"]:
+        key = key_of(step)
+        if key not in base_steps:
+            continue
+        for label, get, higher_is_worse in COMPARED:
+            a, b = get(base_steps[key]), get(step)
+            if a is None or b is None:
+                continue
+            if label == "error rate":
+                # Absolute: 0% -> 0.5% is not a 'regression of infinity'.
+                change = b - a
+                regressed = change > error_slack
+            else:
+                change = (b - a) / a if a else 0.0
+                regressed = change > threshold if higher_is_worse else change < -threshold
+            name = f"{key[0]}{'+long' if key[2] else ''}@{key[1]:g}"
+            rows.append((name, label, a, b, change, regressed))
+    return rows
+
+
+def cmd_compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows = compare(base, new, args.threshold)
+    if not rows:
+        raise SystemExit("No steps in common (same target and rate) between the two runs")
+
+    print(f"{'step':<18} {'metric':<12} {'base':>10} {'new':>10} {'change':>9}")
+    print("-" * 63)
+    for step, label, a, b, change, regressed in rows:
+        shown = f"{change * 100:+.1f}%" if label != "error rate" else f"{change * 100:+.2f}pp"
+        print(f"{step:<18} {label:<12} {a:>10} {b:>10} {shown:>9}" + ("  REGRESSION" if regressed else ""))
+    regressions = sum(1 for r in rows if r[5])
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    raise SystemExit(1 if regressions else 0)
+
+
+# ----------------------------------------------------------------------
+# Stub LLM
+# ----------------------------------------------------------------------
+def stub_handler(latency_ms, jitter_ms, error_rate):
+    class StubLLM(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": f"stub-llm does not serve {self.path}"}})
+            time.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+            if random.random() < error_rate:
+                return self._send(429, {"error": {"message": "stub-llm: rate limited", "type": "rate_limit"}})
+            if req.get("stream"):
+                return self._send(400, {"error": {"message": "stub-llm does not support streaming"}})
+
+            prompt = "\n".join(str(m.get("content", "")) for m in req.get("messages", []))
+            words = prompt.split()
+            summary = " ".join(words[-60:]) if words else "Tóm tắt."
+            content = json.dumps({"summary": summary, "category": "Thời sự", "readingTime": 1}, ensure_ascii=False)
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = len(content) // 4
+            self._send(200, {
+                "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": req.get("model") or "stub-llm",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+    return StubLLM
+
+
+def cmd_stub_llm(args):
+    server = ThreadingHTTPServer((args.host, args.port), stub_handler(args.latency_ms, args.jitter_ms, args.error_rate))
+    print(f"stub-llm on http://{args.host}:{args.port}/v1 "
+          f"(latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the summarize pipeline and the BERT service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Replay the corpus at one or more open-loop request rates")
+    run.add_argument("--target", choices=TARGETS, required=True)
+    run.add_argument("--rate", type=float, nargs="+", default=[1.0], help="Requests per second, one step per value")
+    run.add_argument("--duration", type=float, default=30.0, help="Seconds per step")
+    run.add_argument("--requests", type=int, help="Fixed number of requests per step (overrides --duration)")
+    run.add_argument("--arrival", choices=("constant", "poisson"), default="constant")
+    run.add_argument("--max-in-flight", type=int, default=128, help="Client-side concurrency cap")
+    run.add_argument("--timeout", type=float, default=180.0, help="Per-request timeout (s)")
+    run.add_argument("--pause", type=float, default=5.0, help="Seconds to idle between steps")
+    run.add_argument("--backend", default="http://localhost:3000")
+    run.add_argument("--bert", default=os.environ.get("BERT_SERVICE_URL", "http://localhost:7860"))
+    run.add_argument("--dataset-dir", default=DEFAULT_DATASET_DIR)
+    run.add_argument("--db", default=DEFAULT_DB, help="run_metrics.py result store with cached articles/summaries")
+    run.add_argument("--cached-content", action="store_true",
+                     help="summarize: send cached article text instead of letting the backend fetch the URL")
+    run.add_argument("--long-document", action="store_true",
+                     help=f"bert: send up to {MAX_LONG_REFERENCE_CHARS} reference chars with long_document=true, "
+                          f"as the backend does with BERT_LONG_DOCUMENT=true (default: first {MAX_REFERENCE_CHARS})")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--label", default="", help="Free-form label stored in the JSON")
+    run.add_argument("--out", help="Output JSON (default: loadtest-<target>-<timestamp>.json)")
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser("compare", help="Flag regressions between two result files")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    cmp_.set_defaults(func=cmd_compare)
+
+    stub = sub.add_parser("stub-llm", help="Serve an OpenAI-compatible stub for offline runs")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8089)
+    stub.add_argument("--latency-ms", type=float, default=800.0)
+    stub.add_argument("--jitter-ms", type=float, default=200.0)
+    stub.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    stub.set_defaults(func=cmd_stub_llm)
+
+    args = parser.parse_args()
+    if args.command == "run" and any(r <= 0 for r in args.rate):
+        parser.error("--rate values must be positive")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
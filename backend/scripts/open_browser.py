@@ -1,42 +1,12 @@
-import urllib.request
-import gzip
-import re
 import random
 import webbrowser
 import time
 
+from harvester import FEED_GROUPS, fresh_links
+
 def get_tienphong_articles():
-    categories = [
-        "https://tienphong.vn/rss/home.rss",
-        "https://tienphong.vn/rss/xa-hoi-2.rss",
-        "https://tienphong.vn/rss/kinh-te-3.rss",
-        "https://tienphong.vn/rss/the-gioi-5.rss",
-        "https://tienphong.vn/rss/gioi-tre-4.rss",
-        "https://tienphong.vn/rss/phap-luat-12.rss",
-    ]
-    
-    unique_links = set()
-    for cat in categories:
-        try:
-            req = urllib.request.Request(
-                cat, 
-                headers={
-                    'User-Agent': 'Mozilla/5.0', 
-                    'Accept-Encoding': 'gzip'
-                }
-            )
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                data = resp.read()
-                if resp.info().get('Content-Encoding') == 'gzip':
-                    data = gzip.decompress(data)
-                content = data.decode('utf-8')
-                
-            links = re.findall(r'<link>\s*(https://tienphong\.vn/[^<]+?-post\d+\.tpo)\s*</link>', content)
-            unique_links.update(links)
-        except Exception as e:
-            print(f"Error fetching {cat}: {e}")
-            
-    return list(unique_links)
+    # Concurrent, conditional refresh of the section feeds into the shared frontier
+    return fresh_links(FEED_GROUPS["tienphong_sections"], host="tienphong.vn", pattern="https://tienphong.vn/*-post*.tpo")
 
 def main():
     print("Fetching real articles from tienphong.vn RSS feeds...")
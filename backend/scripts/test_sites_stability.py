@@ -1,50 +1,13 @@
 import urllib.request
 import urllib.error
-import gzip
-import re
 import json
 import time
 import argparse
 
-SITES = {
-    "vnexpress": "https://vnexpress.net/rss/tin-moi-nhat.rss",
-    "tuoitre": "https://tuoitre.vn/rss/tin-moi-nhat.rss",
-    "dantri": "https://dantri.com.vn/rss/home.rss",
-    "thanhnien": "https://thanhnien.vn/rss/home.rss",
-    "tienphong": "https://tienphong.vn/rss/home.rss",
-}
+from harvester import SITES, Frontier, refresh
 
 API_URL = "http://localhost:3000/api/summarize"
 
-def get_links_from_rss(feed_url, max_links):
-    try:
-        req = urllib.request.Request(
-            feed_url, 
-            headers={'User-Agent': 'Mozilla/5.0', 'Accept-Encoding': 'gzip'}
-        )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            data = resp.read()
-            if resp.info().get('Content-Encoding') == 'gzip':
-                data = gzip.decompress(data)
-            content = data.decode('utf-8')
-            
-        links = re.findall(r'<link>\s*(?:<!\[CDATA\[)?(https?://[^\s<\]]+)(?:\]\]>)?\s*</link>', content)
-        
-        # Filter out the rss feed link itself or non-article links if needed
-        # Commonly RSS contains the homepage link as the first <link>
-        article_links = [l for l in links if l != feed_url and not l.endswith('.rss') and l.strip('/') != feed_url.split('/rss')[0]]
-        
-        # Remove duplicates while preserving order
-        unique_links = []
-        for l in article_links:
-            if l not in unique_links:
-                unique_links.append(l)
-                
-        return unique_links[:max_links]
-    except Exception as e:
-        print(f"Error fetching RSS {feed_url}: {e}")
-        return []
-
 def test_article(url):
     payload = json.dumps({"url": url, "stream": False}).encode('utf-8')
     req = urllib.request.Request(
@@ -68,10 +31,16 @@ def test_article(url):
 def main():
     parser = argparse.ArgumentParser(description="Test news sites stability")
     parser.add_argument("--num", type=int, default=5, help="Number of articles to test per site")
+    parser.add_argument("--no-refresh", action="store_true", help="Use the links already in the frontier")
     args = parser.parse_args()
 
     results = {}
 
+    # Refresh all feeds concurrently up front; each site then reads its links from the frontier.
+    if not args.no_refresh:
+        refresh(SITES)
+    frontier = Frontier()
+
     print(f"Testing {args.num} articles from each site...")
     print("-" * 50)
 
@@ -79,7 +48,7 @@ def main():
         print(f"\n=> Site: {site_name.upper()}")
         results[site_name] = {"total": 0, "success": 0, "failed": 0, "latencies": []}
         
-        links = get_links_from_rss(feed_url, args.num)
+        links = frontier.links(label=site_name, limit=args.num)
         if not links:
             print(f"No links found or failed to fetch feed for {site_name}")
             continue
@@ -97,6 +66,8 @@ def main():
                 results[site_name]["failed"] += 1
                 print(f"      FAILED - {res['error'][:100]}...")
 
+    frontier.close()
+
     print("\n" + "=" * 50)
     print("TEST RESULTS SITES STABILITY")
     print("=" * 50)
@@ -1,9 +1,18 @@
 import { logger } from '@/lib/logger';
 
 const BERT_SERVICE_URL = process.env.BERT_SERVICE_URL;
-// HF Spaces free tier can cold-start in 30-60 seconds — use a generous timeout.
-const BERT_TIMEOUT_MS = 90_000; // 90 s to cover full cold-start
-const BERT_WARMUP_TIMEOUT_MS = 70_000; // 70 s for the pre-warm healthcheck ping
+// The score call is only sent once /readyz reports the model as loaded, so its
+// timeout no longer has to absorb a cold start. It must still outlast the
+// service's own deadline for queueing + inference (BERT_REQUEST_TIMEOUT_S in
+// bert/main.py, same variable and default): giving up earlier drops scores the
+// service would have returned while it keeps computing them anyway, which hits
+// batch and long-document calls first. The margin covers network transfer.
+const BERT_REQUEST_TIMEOUT_S = Number(process.env.BERT_REQUEST_TIMEOUT_S) || 60;
+const BERT_TIMEOUT_MS = BERT_REQUEST_TIMEOUT_S * 1000 + 5_000;
+// Budget for waking a sleeping HF Space (container start + model load).
+const BERT_WARMUP_TIMEOUT_MS = 70_000;
+// Delay between /readyz polls while the model is loading.
+const BERT_READY_POLL_MS = 1_000;
 
 // Truncation limits to keep payloads manageable for the HF Spaces BERT endpoint.
 // Vietnamese news articles can be 10 k+ characters — sending the full text caused
@@ -11,37 +20,59 @@ const BERT_WARMUP_TIMEOUT_MS = 70_000; // 70 s for the pre-warm healthcheck ping
 const MAX_REFERENCE_CHARS = 2000;
 const MAX_CANDIDATE_CHARS = 1000;
 
+// Opt-in: let the BERT service encode the whole article through overlapping
+// 256-token windows (`long_document` mode) instead of comparing the summary
+// against the opening paragraphs only. The reference cap is then only a guard
+// against pathological pages.
+const BERT_LONG_DOCUMENT = process.env.BERT_LONG_DOCUMENT === 'true';
+const MAX_LONG_REFERENCE_CHARS = 50_000;
+
 /**
- * Pings the /healthz endpoint to wake up a sleeping HF Space before the
- * main score call. This prevents the 30 s cold-start from eating into the
- * scoring timeout and causing the score to be dropped as null.
+ * Polls the /readyz endpoint until the BERT service reports its model as
+ * loaded, waking up a sleeping HF Space on the way. The service starts
+ * listening before the model is loaded and answers 503 with the current load
+ * phase until then, so each poll returns quickly instead of hanging on a
+ * cold start.
  *
- * Returns true if the space responded healthy, false otherwise.
+ * Returns true if the service became ready within the warm-up budget.
  */
 async function warmUpBertService(): Promise<boolean> {
   if (!BERT_SERVICE_URL) return false;
-  const controller = new AbortController();
-  const timeoutId = setTimeout(() => controller.abort(), BERT_WARMUP_TIMEOUT_MS);
-  try {
-    const res = await fetch(`${BERT_SERVICE_URL}/healthz`, {
-      method: 'GET',
-      signal: controller.signal,
-    });
-    const healthy = res.ok;
-    if (healthy) {
-      logger.addLog('bert', 'warmup-ok', { status: res.status });
-    } else {
-      logger.addLog('bert', 'warmup-unhealthy', { status: res.status });
+  const deadline = Date.now() + BERT_WARMUP_TIMEOUT_MS;
+  let lastStatus: number | undefined;
+  let lastPhase: string | undefined;
+
+  while (Date.now() < deadline) {
+    const controller = new AbortController();
+    const timeoutId = setTimeout(() => controller.abort(), deadline - Date.now());
+    try {
+      const res = await fetch(`${BERT_SERVICE_URL}/readyz`, {
+        method: 'GET',
+        signal: controller.signal,
+      });
+      lastStatus = res.status;
+      const body = await res.json().catch(() => null);
+      lastPhase = body?.phase;
+      if (res.ok) {
+        logger.addLog('bert', 'warmup-ok', {
+          status: res.status,
+          source: body?.source,
+          timings_ms: body?.timings_ms,
+        });
+        return true;
+      }
+      if (lastPhase === 'failed') break;
+    } catch (err) {
+      if (controller.signal.aborted) break;
+      lastPhase = err instanceof Error ? err.message : String(err);
+    } finally {
+      clearTimeout(timeoutId);
     }
-    return healthy;
-  } catch (err) {
-    logger.addLog('bert', 'warmup-failed', {
-      error: err instanceof Error ? err.message : String(err),
-    });
-    return false;
-  } finally {
-    clearTimeout(timeoutId);
+    await new Promise((resolve) => setTimeout(resolve, BERT_READY_POLL_MS));
   }
+
+  logger.addLog('bert', 'warmup-unready', { status: lastStatus, phase: lastPhase });
+  return false;
 }
 
 export interface BertScoreResult {
@@ -49,12 +80,30 @@ export interface BertScoreResult {
   model_used: string;
 }
 
+export interface BertBatchScoreResult {
+  scores: Array<{ precision: number; recall: number; f1_score: number }>;
+  model_used: string;
+}
+
+function truncateReference(referenceText: string): string {
+  const limit = BERT_LONG_DOCUMENT ? MAX_LONG_REFERENCE_CHARS : MAX_REFERENCE_CHARS;
+  return referenceText.length > limit
+    ? referenceText.substring(0, limit)
+    : referenceText;
+}
+
+function truncateCandidate(candidateText: string): string {
+  return candidateText.length > MAX_CANDIDATE_CHARS
+    ? candidateText.substring(0, MAX_CANDIDATE_CHARS)
+    : candidateText;
+}
+
 /**
  * Calls the HF-hosted BERTScore microservice to compute the F1 score between
  * a reference text and a candidate (generated summary).
  *
  * Both texts are truncated to keep the payload within limits that the free-tier
- * HF Spaces endpoint can reliably handle within the 30 s timeout.
+ * HF Spaces endpoint can reliably handle within the request timeout.
  *
  * Returns `null` on any failure so callers can treat BERTScore as optional
  * and never block the main summarization flow.
@@ -71,24 +120,19 @@ export async function calculateBertScore(
   }
 
   // Wake up the HF Space if it is sleeping (free-tier spaces sleep after ~5 min of
-  // inactivity and can take 30-60 s to cold-start). By pinging /healthz first we
-  // ensure the space is fully loaded before we send the scoring payload. If the
-  // ping itself times out, the score call below will fail fast with an abort error
-  // and return null — which is acceptable since without this the score was always null.
+  // inactivity). By waiting for /readyz first we ensure the model is loaded before
+  // we send the scoring payload. If it never becomes ready, the score call below
+  // fails and returns null — which is acceptable since BERTScore is optional.
   await warmUpBertService();
 
   const controller = new AbortController();
   const timeoutId = setTimeout(() => controller.abort(), BERT_TIMEOUT_MS);
 
   // Truncate texts to stay within safe payload limits
-  const truncatedReference = referenceText.length > MAX_REFERENCE_CHARS
-    ? referenceText.substring(0, MAX_REFERENCE_CHARS)
-    : referenceText;
-  const truncatedCandidate = candidateText.length > MAX_CANDIDATE_CHARS
-    ? candidateText.substring(0, MAX_CANDIDATE_CHARS)
-    : candidateText;
+  const truncatedReference = truncateReference(referenceText);
+  const truncatedCandidate = truncateCandidate(candidateText);
 
-  if (referenceText.length > MAX_REFERENCE_CHARS || candidateText.length > MAX_CANDIDATE_CHARS) {
+  if (truncatedReference.length < referenceText.length || truncatedCandidate.length < candidateText.length) {
     logger.addLog('bert', 'truncated', {
       originalReferenceLen: referenceText.length,
       truncatedReferenceLen: truncatedReference.length,
@@ -104,6 +148,7 @@ export async function calculateBertScore(
       body: JSON.stringify({
         reference_text: truncatedReference,
         candidate_text: truncatedCandidate,
+        long_document: BERT_LONG_DOCUMENT,
       }),
       signal: controller.signal,
     });
@@ -138,3 +183,74 @@ export async function calculateBertScore(
     clearTimeout(timeoutId);
   }
 }
+
+/**
+ * Scores several candidates against one reference in a single call to the
+ * BERT service's /calculate-score-batch endpoint, so the article is sent,
+ * tokenized and encoded once instead of once per candidate.
+ *
+ * Returns one F1 per candidate (in input order). Every entry is `null` on any
+ * failure, mirroring `calculateBertScore`.
+ */
+export async function calculateBertScoreBatch(
+  referenceText: string,
+  candidateTexts: string[],
+): Promise<Array<number | null>> {
+  const failed = () => candidateTexts.map(() => null);
+
+  if (candidateTexts.length === 0) return [];
+  if (!BERT_SERVICE_URL) {
+    logger.addLog('bert', 'config-missing', {
+      message: 'BERT_SERVICE_URL is not set — skipping BERTScore calculation',
+    });
+    return failed();
+  }
+
+  await warmUpBertService();
+
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), BERT_TIMEOUT_MS);
+
+  try {
+    const response = await fetch(`${BERT_SERVICE_URL}/calculate-score-batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        reference_text: truncateReference(referenceText),
+        candidate_texts: candidateTexts.map(truncateCandidate),
+        long_document: BERT_LONG_DOCUMENT,
+      }),
+      signal: controller.signal,
+    });
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      logger.addLog('bert', 'http-error', {
+        status: response.status,
+        body: errorText.substring(0, 200),
+      });
+      return failed();
+    }
+
+    const result: BertBatchScoreResult = await response.json();
+    logger.addLog('bert', 'batch-success', {
+      count: result.scores.length,
+      f1_scores: result.scores.map(s => s.f1_score),
+      model_used: result.model_used,
+    });
+    return result.scores.map(s => s.f1_score);
+  } catch (err) {
+    if (err instanceof Error && err.name === 'AbortError') {
+      logger.addLog('bert', 'timeout', {
+        message: `Request exceeded ${BERT_TIMEOUT_MS}ms`,
+      });
+    } else {
+      logger.addLog('bert', 'fetch-error', {
+        error: err instanceof Error ? err.message : String(err),
+      });
+    }
+    return failed();
+  } finally {
+    clearTimeout(timeoutId);
+  }
+}
@@ -1,7 +1,7 @@
 import { logger } from "@/lib/logger"
 import { getSupabaseAdmin } from "@/lib/supabase"
 import { performSummarize } from "./summarize.service"
-import { calculateBertScore } from "./bert.service"
+import { calculateBertScoreBatch } from "./bert.service"
 import { calculateLexicalMetrics } from "./evaluation.service"
 import {
   saveRoutingDecision,
@@ -81,21 +81,23 @@ export async function runFusedSummarization(
   }
 
   // 3. Score each summary with BERTScore (original article as reference)
-  //    Fall back to ROUGE-1 if BERTScore is unavailable
+  //    Fall back to ROUGE-1 if BERTScore is unavailable.
+  //    All summaries share the same reference, so they are scored in one batch call.
+  let bertScores: Array<number | null> = fulfilled.map(() => null)
+  try {
+    bertScores = await calculateBertScoreBatch(text, fulfilled.map(f => f.response.summary))
+  } catch (err) {
+    logger.addLog('fusion', 'bert-score-error', {
+      models: fulfilled.map(f => f.modelConfig.model_name),
+      error: err instanceof Error ? err.message : String(err),
+    })
+  }
+
   const candidates: ModelComparisonResult[] = await Promise.all(
-    fulfilled.map(async ({ modelConfig, response, latencyMs }) => {
-      let bertScore: number | null = null
+    fulfilled.map(async ({ modelConfig, response, latencyMs }, index) => {
+      const bertScore: number | null = bertScores[index] ?? null
       let rouge1: number | null = null
 
-      try {
-        bertScore = await calculateBertScore(text, response.summary)
-      } catch (err) {
-        logger.addLog('fusion', 'bert-score-error', {
-          model: modelConfig.model_name,
-          error: err instanceof Error ? err.message : String(err),
-        })
-      }
-
       // Always calculate ROUGE-1 as fallback scoring metric
       try {
         const lexical = calculateLexicalMetrics(response.summary, text)
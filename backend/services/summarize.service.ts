@@ -27,6 +27,7 @@ export async function performSummarize(request: SummarizeRequest, modelConfig?:
   const { content, url, debug, judge_config: judgeConfigOverride } = request
 
   const debugInfo: SummarizeDebugInfo = {}
+  const requestStart = Date.now()
   let extractedContent = ""
   let contentLength = 0
   let extractedTitle: string | undefined
@@ -89,6 +90,8 @@ export async function performSummarize(request: SummarizeRequest, modelConfig?:
     throw new Error("Content cannot be empty")
   }
 
+  const extractionMs = Date.now() - requestStart
+
   // Generate prompt using template
   const prompt = getSummarizePrompt({ content: extractedContent })
   if (debug) {
@@ -156,6 +159,10 @@ export async function performSummarize(request: SummarizeRequest, modelConfig?:
   if (debug && llmResult.debugInfo) {
     debugInfo.openaiResponse = llmResult.debugInfo
   }
+  if (debug) {
+    // Per-stage breakdown for load tests (backend/scripts/loadtest.py)
+    debugInfo.timings = { extraction_ms: extractionMs, llm_ms: latency }
+  }
 
   // Build response and validate it
   const responseData: Omit<SummarizeResponse, "debug"> = {
@@ -0,0 +1,299 @@
+"""
+Offline batch scoring with the service's own scorer.
+
+Rescoring historical outputs no longer needs the HTTP service and one request
+per pair: records are streamed from the inputs, grouped into batches and
+scored by a pool of worker processes, each holding the ``ScoringCore`` that
+``main.build_scoring_core`` builds for the service (same model, backend,
+word segmentation and rounding — configured by the same ``BERT_*``
+variables), so offline and online numbers are identical.
+
+Inputs (any mix):
+
+- ``*.jsonl`` — one object per line with ``reference`` / ``reference_text``
+  and ``candidate`` / ``candidate_text`` (e.g. ``snapshot_store.py pairs``);
+  other fields (``url``, ``model`` …) are copied to the output.
+- ``*.json`` — ``fusion_reports/results`` reports: the fused summary and
+  every forced single-model summary of each record.
+- ``*.sqlite`` — a ``metrics_reports`` result store: every cached summary
+  against its cached article text.
+
+Records without their article text are resolved by URL through
+``--articles`` (a result store, or JSONL with ``url`` + ``reference``).
+Texts are cut like ``backend/services/bert.service.ts`` does before calling
+the service (``--reference-chars`` / ``--candidate-chars``).
+
+Results are appended to ``--out`` as JSONL after every batch; rerunning the
+same command skips records already in it, so an interrupted run resumes:
+
+    python -m batch_score ../fusion_reports/results/moa-*.json \\
+        --articles ../metrics_reports/results/results.sqlite --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator
+
+# The streaming report reader is shared with fusion_reports/report_index.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fusion_reports"))
+from report_stream import iter_report  # noqa: E402
+
+# Same cuts as backend/services/bert.service.ts.
+MAX_REFERENCE_CHARS = 2000
+MAX_LONG_REFERENCE_CHARS = 50_000
+MAX_CANDIDATE_CHARS = 1000
+
+_TEXT_FIELDS = ("reference", "reference_text", "candidate", "candidate_text")
+
+# ---------------------------------------------------------------------------
+# Worker processes
+# ---------------------------------------------------------------------------
+_long_document = False
+
+
+def _init_worker(workers: int, long_document: bool) -> None:
+    """Build the service's scoring core in this process, with 1/workers of the cores."""
+    global _long_document
+    os.environ["BERT_WORKERS"] = str(workers)  # read by main._intra_op_threads at import
+    import main
+
+    main.scoring_core = main.build_scoring_core(main.LoadProgress(), main.reference_cache, main._intra_op_threads())
+    _long_document = long_document
+
+
+def _score_batch(refs: list[str], cands: list[str]) -> list[dict]:
+    import main
+
+    return [score.model_dump(exclude_none=True) for score in main._score_pairs(refs, cands, _long_document)]
+
+
+# ---------------------------------------------------------------------------
+# Inputs
+# ---------------------------------------------------------------------------
+class Articles:
+    """Article text by URL, from a result store or a ``{url, reference}`` JSONL file."""
+
+    def __init__(self, path: str | None) -> None:
+        self._texts: dict[str, str] = {}
+        self._conn: sqlite3.Connection | None = None
+        if path is None:
+            return
+        if path.endswith((".sqlite", ".db")):
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        text = row.get("reference") or row.get("reference_text")
+                        if row.get("url") and text:
+                            self._texts[row["url"]] = text
+
+    def get(self, url: str | None) -> str | None:
+        if not url:
+            return None
+        if self._conn is not None and url not in self._texts:
+            row = self._conn.execute(
+                "SELECT c.text FROM summaries s JOIN contents c ON c.sha256 = s.content_sha256 "
+                "WHERE s.url = ? ORDER BY s.created_at DESC LIMIT 1",
+                (url,),
+            ).fetchone()
+            self._texts[url] = row[0] if row else None
+        return self._texts.get(url)
+
+
+def _jsonl_records(path: str) -> Iterator[dict]:
+    name = os.path.basename(path)
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield {
+                "key": f"{name}:{line_no}",
+                **{k: v for k, v in row.items() if k not in _TEXT_FIELDS},
+                "reference": row.get("reference") or row.get("reference_text"),
+                "candidate": row.get("candidate") or row.get("candidate_text"),
+            }
+
+
+def _report_records(path: str) -> Iterator[dict]:
+    name = os.path.basename(path)
+    for event, _, record in iter_report(path):
+        if event != "record":
+            continue
+        url = record.get("url")
+        index = record.get("index")
+        fusion = record.get("fusion") or {}
+        if fusion.get("fused_summary"):
+            yield {
+                "key": f"{name}:{index}:fusion",
+                "url": url,
+                "model": fusion.get("aggregator_model"),
+                "mode": fusion.get("mode", "fusion"),
+                "reference": None,
+                "candidate": fusion["fused_summary"],
+            }
+        for forced in record.get("forced") or []:
+            if forced.get("summary"):
+                yield {
+                    "key": f"{name}:{index}:forced:{forced.get('model')}",
+                    "url": url,
+                    "model": forced.get("model"),
+                    "mode": "forced",
+                    "reference": None,
+                    "candidate": forced["summary"],
+                }
+
+
+def _store_records(path: str) -> Iterator[dict]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT s.url, s.model, s.config_hash, c.text, s.summary FROM summaries s "
+            "JOIN contents c ON c.sha256 = s.content_sha256 ORDER BY s.url, s.model"
+        )
+        for url, model, config_hash, text, summary in rows:
+            yield {
+                "key": f"{url}|{model}|{config_hash}",
+                "url": url,
+                "model": model,
+                "config_hash": config_hash,
+                "reference": text,
+                "candidate": summary,
+            }
+    finally:
+        conn.close()
+
+
+def iter_records(paths: Iterable[str], articles: Articles) -> Iterator[dict]:
+    """Every record of every input, with its article text resolved where possible."""
+    for path in paths:
+        if path.endswith(".jsonl"):
+            records = _jsonl_records(path)
+        elif path.endswith((".sqlite", ".db")):
+            records = _store_records(path)
+        else:
+            records = _report_records(path)
+        for record in records:
+            if not record["reference"]:
+                record["reference"] = articles.get(record.get("url"))
+            yield record
+
+
+def _cut(text: str, limit: int) -> str:
+    return text[:limit] if limit > 0 else text
+
+
+# ---------------------------------------------------------------------------
+# Checkpointed output
+# ---------------------------------------------------------------------------
+def load_done(out_path: str) -> set[str]:
+    """Keys already written to ``out_path``; a line cut off by a crash is dropped."""
+    done: set[str] = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r+b") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+    for line in data[:complete].decode("utf-8").splitlines():
+        if line.strip():
+            done.add(json.loads(line)["key"])
+    return done
+
+
+def run(args: argparse.Namespace) -> dict:
+    done = load_done(args.out)
+    articles = Articles(args.articles)
+    ref_chars = args.reference_chars
+    if ref_chars is None:
+        ref_chars = MAX_LONG_REFERENCE_CHARS if args.long_document else MAX_REFERENCE_CHARS
+
+    counts = {"scored": 0, "skipped_done": 0, "missing_reference": 0}
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args.workers, args.long_document),
+    )
+    in_flight: dict[Future, list[dict]] = {}
+
+    def drain(block_until: int) -> None:
+        while len(in_flight) > block_until:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch = in_flight.pop(future)
+                for record, score in zip(batch, future.result()):
+                    out.write(json.dumps({**record, **score}, ensure_ascii=False) + "\n")
+                out.flush()
+                counts["scored"] += len(batch)
+                rate = counts["scored"] / (time.perf_counter() - started)
+                print(f"\r{counts['scored']} scored ({rate:.1f} pairs/s)", end="", file=sys.stderr)
+
+    with open(args.out, "a", encoding="utf-8") as out:
+        try:
+            batch: list[dict] = []
+            texts: tuple[list[str], list[str]] = ([], [])
+            queued = 0
+            for record in iter_records(args.inputs, articles):
+                if record["key"] in done:
+                    counts["skipped_done"] += 1
+                    continue
+                if not record["reference"] or not record["candidate"]:
+                    counts["missing_reference"] += 1
+                    continue
+                done.add(record["key"])
+                texts[0].append(_cut(record.pop("reference"), ref_chars))
+                texts[1].append(_cut(record.pop("candidate"), args.candidate_chars))
+                batch.append(record)
+                queued += 1
+                if len(batch) >= args.batch_pairs:
+                    in_flight[pool.submit(_score_batch, *texts)] = batch
+                    batch, texts = [], ([], [])
+                    drain(2 * args.workers)  # bounded read-ahead
+                if args.limit and queued >= args.limit:
+                    break
+            if batch:
+                in_flight[pool.submit(_score_batch, *texts)] = batch
+            drain(0)
+        finally:
+            pool.shutdown(cancel_futures=True)
+            print(file=sys.stderr)
+
+    counts["elapsed_s"] = round(time.perf_counter() - started, 1)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("inputs", nargs="+", help="JSONL pairs, fusion report JSON or metrics result stores")
+    parser.add_argument("--articles", help="Article texts by URL: result store (.sqlite) or JSONL {url, reference}")
+    parser.add_argument("--out", default="batch_scores.jsonl", help="Output JSONL, also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=1, help="Scoring processes (cores are split between them)")
+    parser.add_argument("--batch-pairs", type=int, default=64, help="Pairs per task sent to a worker")
+    parser.add_argument("--long-document", action="store_true", help="Score against full references (sliding windows)")
+    parser.add_argument("--reference-chars", type=int, default=None,
+                        help=f"Cut references to this many characters, 0 = never "
+                             f"(default: {MAX_REFERENCE_CHARS}, {MAX_LONG_REFERENCE_CHARS} with --long-document)")
+    parser.add_argument("--candidate-chars", type=int, default=MAX_CANDIDATE_CHARS,
+                        help="Cut candidates to this many characters, 0 = never")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many new pairs")
+    args = parser.parse_args()
+
+    counts = run(args)
+    print(json.dumps(counts), f"-> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Token counts and latency with and without word segmentation.
+
+Tokenizes a corpus of Vietnamese texts raw and word-segmented
+(``word_segment.WordSegmenter``) with the service's tokenizer and reports the
+mean / p95 token count, how many texts exceed the 256-token cap, and the
+segmentation and tokenization time — once cold (every sentence a cache miss)
+and once warm (every sentence a hit, as when articles are rescored).
+
+Texts come from ``--texts`` (JSONL with ``reference`` / ``candidate`` fields,
+e.g. ``metrics_reports/snapshot_store.py pairs``) or the summaries in
+``fusion_reports/results/moa-*.json``:
+
+    python bench_segment.py --texts pairs.jsonl --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import time
+from pathlib import Path
+
+from main import CHECKPOINT_DIR, MAX_SEQ_LEN, MODEL_NAME, NUM_LAYERS, SEGMENT_CACHE
+from scoring import normalize_text
+from word_segment import WordSegmenter
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_texts(path: str | None) -> list[str]:
+    texts: list[str] = []
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    texts += [row[k] for k in ("reference", "candidate") if row.get(k)]
+    else:
+        for report in sorted(glob.glob(str(REPO_ROOT / "fusion_reports/results/moa-*.json"))):
+            with open(report, encoding="utf-8") as f:
+                for record in json.load(f).get("records", []):
+                    fused = (record.get("fusion") or {}).get("fused_summary")
+                    texts += [fused] if fused else []
+                    texts += [forced["summary"] for forced in record.get("forced", []) if forced.get("summary")]
+    return list(dict.fromkeys(normalize_text(t) for t in texts))
+
+
+def load_tokenizer():
+    from checkpoint import checkpoint_matches
+    from transformers import AutoTokenizer
+
+    if checkpoint_matches(CHECKPOINT_DIR, MODEL_NAME, NUM_LAYERS):
+        return AutoTokenizer.from_pretrained(CHECKPOINT_DIR)
+    return AutoTokenizer.from_pretrained(MODEL_NAME)
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def _token_stats(lengths: list[int]) -> dict:
+    ordered = sorted(lengths)
+    return {
+        "mean": round(sum(ordered) / len(ordered), 1),
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "over_cap": sum(1 for n in ordered if n > MAX_SEQ_LEN),
+    }
+
+
+def run(texts: list[str], tokenizer) -> dict:
+    segmenter = WordSegmenter.from_tokenizer(tokenizer, cache_size=max(SEGMENT_CACHE, 1))
+    tokenize = lambda batch: tokenizer(batch, add_special_tokens=True, verbose=False)["input_ids"]
+
+    raw_ids, raw_tok_ms = _timed(tokenize, texts)
+    segmented, cold_ms = _timed(segmenter.segment_batch, texts)
+    _, warm_ms = _timed(segmenter.segment_batch, texts)
+    seg_ids, seg_tok_ms = _timed(tokenize, segmented)
+
+    raw = _token_stats([len(ids) for ids in raw_ids])
+    seg = _token_stats([len(ids) for ids in seg_ids])
+    return {
+        "texts": len(texts),
+        "dictionary_words": segmenter.vocabulary_size,
+        "tokens_raw": raw,
+        "tokens_segmented": seg,
+        "token_reduction": round(1 - seg["mean"] / raw["mean"], 4) if raw["mean"] else None,
+        "tokenize_ms_raw": round(raw_tok_ms, 1),
+        "tokenize_ms_segmented": round(seg_tok_ms, 1),
+        "segment_ms_cold": round(cold_ms, 1),
+        "segment_ms_warm": round(warm_ms, 1),
+        "segment_cache": segmenter.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--texts", default=os.environ.get("BERT_PARITY_ARTICLES"),
+                        help="JSONL with reference/candidate fields (default: fusion report summaries)")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    if not texts:
+        raise SystemExit("No texts found.")
+    result = run(texts, load_tokenizer())
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    raw, seg = result["tokens_raw"], result["tokens_segmented"]
+    print(f"{result['texts']} texts, {result['dictionary_words']} multi-syllable vocabulary words")
+    print(f"{'':<12} {'mean tok':>9} {'p95 tok':>8} {'>' + str(MAX_SEQ_LEN):>6} {'tokenize ms':>12}")
+    print(f"{'raw':<12} {raw['mean']:>9} {raw['p95']:>8} {raw['over_cap']:>6} {result['tokenize_ms_raw']:>12}")
+    print(f"{'segmented':<12} {seg['mean']:>9} {seg['p95']:>8} {seg['over_cap']:>6} "
+          f"{result['tokenize_ms_segmented']:>12}")
+    print(f"token reduction {result['token_reduction']:.1%}; segmentation {result['segment_ms_cold']} ms cold, "
+          f"{result['segment_ms_warm']} ms warm (LRU)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Size and query latency of the near-duplicate vector index.
+
+Fills a fresh ``vector_index.VectorIndex`` with ``--size`` random unit vectors
+(query cost does not depend on the content, only on count and dimension) and
+reports the on-disk size, insert throughput, time to reopen the index, and
+``search`` latency percentiles — cold (first scan after reopening, pages not
+yet touched) and warm:
+
+    python bench_vector_index.py --size 100000 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(size: int, dim: int, queries: int, k: int, batch: int, directory: str) -> dict:
+    rng = np.random.default_rng(0)
+    index = VectorIndex(directory, dim)
+
+    started = time.perf_counter()
+    for start in range(0, size, batch):
+        n = min(batch, size - start)
+        index.add([f"https://example.vn/{i}" for i in range(start, start + n)],
+                  rng.standard_normal((n, dim), dtype=np.float32))
+    insert_s = time.perf_counter() - started
+    stats = index.stats()
+    index.close()
+
+    started = time.perf_counter()
+    index = VectorIndex(directory, dim)
+    open_ms = (time.perf_counter() - started) * 1000.0
+
+    probes = rng.standard_normal((queries + 1, dim), dtype=np.float32)
+    started = time.perf_counter()
+    index.search(probes[0], k)
+    cold_ms = (time.perf_counter() - started) * 1000.0
+
+    latencies = []
+    for probe in probes[1:]:
+        started = time.perf_counter()
+        index.search(probe, k, threshold=0.9)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+
+    started = time.perf_counter()
+    index.add(["https://example.vn/new"], probes[0][None])
+    single_add_ms = (time.perf_counter() - started) * 1000.0
+    index.close()
+
+    return {
+        "vectors": size,
+        "dim": dim,
+        "file_mb": round(stats["file_bytes"] / 2**20, 1),
+        "bytes_per_vector": dim * 2,
+        "insert_per_s": round(size / insert_s),
+        "single_add_ms": round(single_add_ms, 2),
+        "open_ms": round(open_ms, 1),
+        "query_cold_ms": round(cold_ms, 2),
+        "query_ms": {
+            "mean": round(statistics.fmean(latencies), 2),
+            "p50": round(_percentile(latencies, 0.50), 2),
+            "p95": round(_percentile(latencies, 0.95), 2),
+            "p99": round(_percentile(latencies, 0.99), 2),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=768, help="PhoBERT-base hidden size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=256, help="Vectors per add() call while filling")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.size:
+        with tempfile.TemporaryDirectory() as directory:
+            results.append(run(size, args.dim, args.queries, args.k, args.batch, directory))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'vectors':>8} {'file MB':>8} {'insert/s':>9} {'open ms':>8} {'cold ms':>8} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'add ms':>7}")
+    for r in results:
+        q = r["query_ms"]
+        print(f"{r['vectors']:>8} {r['file_mb']:>8} {r['insert_per_s']:>9} {r['open_ms']:>8} "
+              f"{r['query_cold_ms']:>8} {q['p50']:>7} {q['p95']:>7} {q['p99']:>7} {r['single_add_ms']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Throughput of the BERT service as the number of worker processes grows.
+
+For every worker count, starts ``serve.py`` on a free port, waits for
+``/readyz``, then keeps ``--concurrency`` clients posting ``/calculate-score``
+for ``--duration`` seconds (closed loop). Reports requests/sec, latency
+percentiles, and the resident (RSS) vs proportional (PSS) memory of the
+workers — with the memory-mapped checkpoint, PSS grows far slower than RSS
+because the weights pages are shared.
+
+    python bench_workers.py --workers 1 2 4 --concurrency 16 --duration 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+REFERENCE = (
+    "Sáng 12/5, Trường Đại học Bách khoa tổ chức ngày hội hiến máu Chủ Nhật Đỏ, "
+    "thu hút hơn 2.000 sinh viên và giảng viên tham gia. Ban tổ chức cho biết "
+    "lượng máu thu được sẽ được chuyển tới các bệnh viện trong thành phố. "
+) * 4
+CANDIDATES = [
+    "Hơn 2.000 sinh viên, giảng viên Bách khoa tham gia hiến máu Chủ Nhật Đỏ.",
+    "Ngày hội hiến máu tại Đại học Bách khoa thu hút đông đảo người tham gia.",
+    "Lượng máu thu được sẽ chuyển tới các bệnh viện trong thành phố.",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 5.0) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, {}
+
+
+def _post(url: str, payload: dict, timeout: float = 120.0) -> int:
+    req = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+def _children(pid: int) -> list[int]:
+    kids = []
+    for entry in Path("/proc").iterdir():
+        if entry.name.isdigit():
+            try:
+                stat = (entry / "stat").read_text()
+            except OSError:
+                continue
+            if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+                kids.append(int(entry.name))
+    return kids
+
+
+def _memory_mb(pids: list[int]) -> dict:
+    """Summed RSS and PSS of ``pids`` from /proc/<pid>/smaps_rollup (Linux only)."""
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for pid in pids:
+        try:
+            lines = Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                totals[f"{key.lower()}_mb"] += int(rest.split()[0]) / 1024.0
+    return {k: round(v, 1) for k, v in totals.items()}
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_one(workers: int, concurrency: int, duration: float, ready_timeout: float) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "BERT_WORKERS": str(workers), "PORT": str(port), "HOST": "127.0.0.1"}
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py"], cwd=HERE, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        # Every worker must be loaded; /readyz is answered by whichever accepts.
+        deadline = time.monotonic() + ready_timeout
+        ready_pids: set[int] = set()
+        while len(ready_pids) < workers:
+            if time.monotonic() > deadline or proc.poll() is not None:
+                raise RuntimeError(f"{workers} worker(s) did not become ready.")
+            try:
+                status, body = _get(f"{base}/readyz")
+            except OSError:
+                status, body = 0, {}
+            if status == 200:
+                ready_pids.add(body["pid"])
+            else:
+                time.sleep(0.2)
+
+        latencies: list[float] = []
+        errors = 0
+        lock = threading.Lock()
+        stop_at = time.monotonic() + duration
+
+        def client(offset: int) -> None:
+            nonlocal errors
+            i = offset
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                status = _post(f"{base}/calculate-score", {
+                    "reference_text": REFERENCE,
+                    "candidate_text": CANDIDATES[i % len(CANDIDATES)],
+                })
+                elapsed = (time.perf_counter() - started) * 1000.0
+                with lock:
+                    if status == 200:
+                        latencies.append(elapsed)
+                    else:
+                        errors += 1
+                i += 1
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.monotonic() - started
+
+        latencies.sort()
+        return {
+            "workers": workers,
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / wall, 2),
+            "p50_ms": round(_percentile(latencies, 0.50), 1),
+            "p95_ms": round(_percentile(latencies, 0.95), 1),
+            "p99_ms": round(_percentile(latencies, 0.99), 1),
+            **_memory_mb(_children(proc.pid) or [proc.pid]),
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark BERT service throughput vs worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>6} {'RSS MB':>8} {'PSS MB':>8}")
+    for n in args.workers:
+        r = run_one(n, args.concurrency, args.duration, args.ready_timeout)
+        results.append(r)
+        print(f"{r['workers']:>7} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['errors']:>6} {r['rss_mb']:>8} {r['pss_mb']:>8}")
+
+    base_rps = results[0]["rps"] or 1.0
+    for r in results[1:]:
+        print(f"{r['workers']} workers: {r['rps'] / base_rps:.2f}x the {results[0]['workers']}-worker throughput")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
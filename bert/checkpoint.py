@@ -0,0 +1,126 @@
+"""
+Pre-sliced PhoBERT checkpoint for fast cold starts.
+
+Building ``BERTScorer`` at startup imports ``bert_score`` (and with it pandas
+and matplotlib), loads all 12 PhoBERT layers from the Hugging Face cache and
+then throws three of them away. ``save_checkpoint`` does that work once, at
+image build time, and writes a directory holding:
+
+- ``config.json`` — the model config with ``num_hidden_layers`` = ``num_layers``
+- the tokenizer files
+- ``model.pt`` — the weights of the truncated encoder
+- ``manifest.json`` — which model / layer count the directory was built from
+
+``load_checkpoint`` builds the module skeleton on the ``meta`` device (no
+random initialisation) and attaches the weights straight from a memory-mapped
+``model.pt``, so load time no longer scales with checkpoint size and pages
+are only read when first touched.
+
+Build it with::
+
+    python checkpoint.py --model vinai/phobert-base --num-layers 9 --out checkpoint
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import torch
+
+logger = logging.getLogger("bert_service")
+
+WEIGHTS_FILE = "model.pt"
+MANIFEST_FILE = "manifest.json"
+
+
+def slice_layers(model: torch.nn.Module, num_layers: int) -> torch.nn.Module:
+    """Keep the first ``num_layers`` encoder layers, as ``bert_score.utils.get_model`` does."""
+    layers = model.encoder.layer
+    if not 0 <= num_layers <= len(layers):
+        raise ValueError(f"num_layers must be between 0 and {len(layers)}, got {num_layers}.")
+    model.encoder.layer = torch.nn.ModuleList(list(layers[:num_layers]))
+    model.config.num_hidden_layers = num_layers
+    return model
+
+
+def _non_persistent_buffers(model: torch.nn.Module) -> dict[str, torch.Tensor]:
+    """Buffers such as ``position_ids`` that ``state_dict`` leaves out."""
+    persistent = model.state_dict().keys()
+    return {name: buf for name, buf in model.named_buffers() if name not in persistent}
+
+
+def save_checkpoint(model_name: str, num_layers: int, out_dir: str | Path) -> Path:
+    """Download ``model_name``, keep ``num_layers`` layers and write it to ``out_dir``."""
+    from transformers import AutoModel, AutoTokenizer
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    model = slice_layers(AutoModel.from_pretrained(model_name).eval(), num_layers)
+    AutoTokenizer.from_pretrained(model_name, use_fast=True).save_pretrained(out)
+    model.config.save_pretrained(out)
+    torch.save(
+        {
+            "state_dict": {k: v.contiguous() for k, v in model.state_dict().items()},
+            "buffers": _non_persistent_buffers(model),
+        },
+        out / WEIGHTS_FILE,
+    )
+    (out / MANIFEST_FILE).write_text(
+        json.dumps({"model_name": model_name, "num_layers": num_layers}, indent=2)
+    )
+    logger.info(f"Saved {num_layers}-layer checkpoint of '{model_name}' to {out}.")
+    return out
+
+
+def checkpoint_matches(ckpt_dir: str | Path, model_name: str, num_layers: int) -> bool:
+    """True when ``ckpt_dir`` holds a checkpoint of ``model_name`` cut at ``num_layers``."""
+    manifest = Path(ckpt_dir) / MANIFEST_FILE
+    if not manifest.is_file() or not (Path(ckpt_dir) / WEIGHTS_FILE).is_file():
+        return False
+    try:
+        meta = json.loads(manifest.read_text())
+    except (OSError, ValueError):
+        return False
+    return meta.get("model_name") == model_name and meta.get("num_layers") == num_layers
+
+
+def load_checkpoint(ckpt_dir: str | Path):
+    """Return ``(model, tokenizer)`` from a directory written by ``save_checkpoint``."""
+    from transformers import AutoConfig, AutoModel, AutoTokenizer
+
+    ckpt = Path(ckpt_dir)
+    tokenizer = AutoTokenizer.from_pretrained(ckpt, use_fast=True)
+    config = AutoConfig.from_pretrained(ckpt)
+    with torch.device("meta"):
+        model = AutoModel.from_config(config)
+
+    saved = torch.load(ckpt / WEIGHTS_FILE, mmap=True, weights_only=True, map_location="cpu")
+    model.load_state_dict(saved["state_dict"], assign=True)
+    for name, buf in saved["buffers"].items():
+        module_name, _, attr = name.rpartition(".")
+        model.get_submodule(module_name).register_buffer(attr, buf, persistent=False)
+    return model.eval(), tokenizer
+
+
+def load_from_hub(model_name: str, num_layers: int):
+    """Slow path: the exact model / tokenizer ``BERTScorer`` would construct."""
+    from bert_score.utils import get_model, get_tokenizer
+
+    return get_model(model_name, num_layers), get_tokenizer(model_name, use_fast=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Save a layer-truncated PhoBERT checkpoint.")
+    parser.add_argument("--model", default=os.environ.get("BERT_MODEL", "vinai/phobert-base"))
+    parser.add_argument("--num-layers", type=int, default=9)
+    parser.add_argument("--out", default=os.environ.get("BERT_CHECKPOINT_DIR", "checkpoint"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    save_checkpoint(args.model, args.num_layers, args.out)
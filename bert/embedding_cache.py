@@ -0,0 +1,97 @@
+"""
+Memory-bounded LRU cache for encoded reference texts.
+
+The same article (``reference_text``) is scored again and again: once per
+fusion candidate, again when it is re-summarized with another model, and again
+for every ``/api/evaluate`` call from ``run_metrics.py``. Encoding it through
+PhoBERT dominates the cost of those calls, while the greedy-matching step that
+actually compares it to a candidate is a single small matmul.
+
+``EmbeddingCache`` stores the layer-N token embeddings and IDF weights of each
+encoded reference under a hash of (model, layer, max length, normalized
+truncated text), evicting least-recently-used entries once the total tensor
+size exceeds ``max_bytes``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Generic, Protocol, TypeVar
+
+
+class _Sized(Protocol):
+    @property
+    def nbytes(self) -> int: ...
+
+
+V = TypeVar("V", bound=_Sized)
+
+
+def cache_key(model_name: str, num_layers: int, max_len: int, text: str, variant: str = "") -> str:
+    """
+    Stable key for ``text`` encoded by ``model_name`` at layer ``num_layers``.
+    ``variant`` separates encodings of the same text made in different modes
+    (e.g. sliding-window long-document encoding).
+    """
+    h = hashlib.sha256()
+    h.update(f"{model_name}\x00{num_layers}\x00{max_len}\x00{variant}\x00".encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache(Generic[V]):
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(0, max_bytes)
+        self._entries: OrderedDict[str, V] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> V | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: V) -> None:
+        size = value.nbytes
+        if size > self.max_bytes:
+            return  # would evict everything and still not fit
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,146 @@
+"""
+Bounded worker pool that keeps CPU-bound BERTScore inference off the asyncio
+event loop.
+
+The tokenizer and the PhoBERT forward pass are synchronous and can take
+hundreds of milliseconds on CPU. Running them inline in an ``async`` endpoint
+stalls uvicorn's event loop, so ``/healthz`` and every other request wait
+behind the current score. ``InferencePool`` runs that work in a dedicated
+thread pool (torch releases the GIL inside its kernels) and bounds how much
+work may pile up behind it:
+
+- at most ``max_workers`` jobs run concurrently,
+- at most ``max_queue`` further jobs wait for a worker,
+- anything beyond that is rejected immediately with ``QueueFullError`` so the
+  caller can answer 503 + Retry-After instead of hanging,
+- each job carries a deadline; jobs that expire while still queued are
+  dropped without ever touching the model.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class QueueFullError(Exception):
+    """Raised when the pool already holds ``max_workers + max_queue`` jobs."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a job does not finish before its per-request deadline."""
+
+
+class InferencePool:
+    def __init__(
+        self,
+        max_workers: int = 1,
+        max_queue: int = 16,
+        on_wait: Callable[[float], None] | None = None,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must be >= 0")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bert-inference"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0  # queued + running
+        self._running = 0
+        # Called with the seconds each job waited for a worker (metrics hook).
+        self._on_wait = on_wait
+        # Runs each job as ``job_wrapper(job)`` when set (profiling hook, see profiling.py).
+        self.job_wrapper: Callable[[Callable[[], T]], T] | None = None
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+    @property
+    def pending(self) -> int:
+        """Jobs accepted but not yet finished (queued + running)."""
+        return self._pending
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return max(0, self._pending - self._running)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+        }
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    async def run(self, fn: Callable[..., T], *args, timeout: float) -> T:
+        """
+        Run ``fn(*args)`` on a worker thread and await its result.
+
+        Raises ``QueueFullError`` without queueing when the pool is saturated and
+        ``DeadlineExceededError`` when the result is not ready within ``timeout``
+        seconds. A job that times out while still queued is cancelled; one that
+        is already running finishes in the background and its slot is released
+        only then, so the bound always reflects real work on the CPU.
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise QueueFullError(
+                    f"{self._pending} inference jobs already pending "
+                    f"(limit {self.max_workers + self.max_queue})."
+                )
+            self._pending += 1
+
+        submitted = time.monotonic()
+        deadline = submitted + timeout
+
+        def job() -> T:
+            started = time.monotonic()
+            if self._on_wait is not None:
+                self._on_wait(started - submitted)
+            if started >= deadline:
+                raise DeadlineExceededError("Deadline expired while queued.")
+            with self._lock:
+                self._running += 1
+            try:
+                if self.job_wrapper is None:
+                    return fn(*args)
+                return self.job_wrapper(lambda: fn(*args))
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        try:
+            cf: Future = self._executor.submit(job)
+        except BaseException:
+            self._release(None)
+            raise
+        cf.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(cf), timeout=timeout)
+        except asyncio.TimeoutError as exc:
+            raise DeadlineExceededError(
+                f"Inference did not finish within {timeout:.1f}s."
+            ) from exc
+
+    def _release(self, _: Future | None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,21 @@
 import os
+import hmac
+import time
+import asyncio
 import logging
 import contextlib
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from typing import TYPE_CHECKING, Awaitable, Literal, TypeVar
+
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field, model_validator
+
+import lexical
+from embedding_cache import EmbeddingCache
+from inference_pool import DeadlineExceededError, InferencePool, QueueFullError
+from metrics import Counter, Gauge, ServiceMetrics
+from micro_batcher import MicroBatcher
+from profiling import Profiler
 
 # ---------------------------------------------------------------------------
 # Logging
@@ -19,12 +32,299 @@ logger = logging.getLogger("bert_service")
 # ---------------------------------------------------------------------------
 MODEL_NAME: str = os.environ.get("BERT_MODEL", "vinai/phobert-base")
 
+# Hidden layer whose token embeddings are compared.
+NUM_LAYERS: int = 9
+
+# PhoBERT has a maximum sequence length of 256 tokens.
+MAX_SEQ_LEN: int = 256
+
+# Number of padded sequences fed through PhoBERT per forward pass.
+BATCH_SIZE: int = int(os.environ.get("BERT_BATCH_SIZE", "32"))
+
+# Upper bound on pairs accepted by a single /calculate-score-batch call.
+MAX_BATCH_PAIRS: int = int(os.environ.get("BERT_MAX_BATCH_PAIRS", "256"))
+
+# Inference runs on a dedicated worker pool so the event loop (and /healthz)
+# stays responsive. One worker lets torch use all intra-op threads.
+INFERENCE_WORKERS: int = int(os.environ.get("BERT_INFERENCE_WORKERS", "1"))
+# Jobs allowed to wait for a worker before new requests are rejected with 503.
+MAX_QUEUE: int = int(os.environ.get("BERT_MAX_QUEUE", "16"))
+# Per-request deadline covering both queueing and inference.
+REQUEST_TIMEOUT_S: float = float(os.environ.get("BERT_REQUEST_TIMEOUT_S", "60"))
+# Value of the Retry-After header sent when the queue is full.
+RETRY_AFTER_S: int = int(os.environ.get("BERT_RETRY_AFTER_S", "2"))
+
+# Micro-batching of concurrent /calculate-score calls: wait at most this long
+# for more pairs to join a batch (0 = only coalesce pairs that are already waiting) …
+BATCH_WINDOW_MS: float = float(os.environ.get("BERT_BATCH_WINDOW_MS", "10"))
+# … and never put more than this many pairs in one batch.
+MICRO_BATCH_MAX: int = int(os.environ.get("BERT_MICRO_BATCH_MAX", "16"))
+# Pairs allowed to wait for a batch before new requests are rejected with 503.
+BATCHER_MAX_PENDING: int = int(os.environ.get("BERT_BATCHER_MAX_PENDING", "256"))
+
+# Memory budget for cached reference (article) embeddings.
+REF_CACHE_MB: int = int(os.environ.get("BERT_REF_CACHE_MB", "256"))
+
+# Opt-in long-document mode: the reference is encoded through overlapping
+# 256-token windows sharing this many tokens …
+LONG_DOC_OVERLAP: int = int(os.environ.get("BERT_LONG_DOC_OVERLAP", "64"))
+# … up to this many windows (~12k tokens by default); longer references are cut
+# and the response says so.
+LONG_DOC_MAX_WINDOWS: int = int(os.environ.get("BERT_LONG_DOC_MAX_WINDOWS", "64"))
+
+# Inference runtime for the PhoBERT encoder: "torch" (default), "onnx" (fp32
+# ONNX Runtime) or "onnx-int8" (dynamically quantized). ONNX graphs are
+# exported into BERT_ONNX_DIR on first start when missing.
+BACKEND: str = os.environ.get("BERT_BACKEND", "torch").lower()
+ONNX_DIR: str = os.environ.get("BERT_ONNX_DIR", "onnx")
+# ONNX Runtime intra-op threads (0 = same budget as torch, see below).
+ONNX_THREADS: int = int(os.environ.get("BERT_ONNX_THREADS", "0"))
+
+# Number of uvicorn worker processes (set by serve.py). Each worker maps the
+# same checkpoint file read-only and gets an equal share of the cores for
+# intra-op parallelism so workers don't oversubscribe the CPU.
+WORKERS: int = max(1, int(os.environ.get("BERT_WORKERS", "1")))
+# Intra-op threads per worker (0 = available cores // BERT_WORKERS).
+TORCH_THREADS: int = int(os.environ.get("BERT_TORCH_THREADS", "0"))
+
+# Pre-sliced NUM_LAYERS checkpoint written by `python checkpoint.py` at image
+# build time. When it is missing (local dev) the model is loaded from the
+# Hugging Face cache exactly as BERTScorer would.
+CHECKPOINT_DIR: str = os.environ.get("BERT_CHECKPOINT_DIR", "checkpoint")
+
+# Opt-in word segmentation ahead of the tokenizer (see word_segment.py): joins
+# syllables into the multi-syllable words of the PhoBERT vocabulary, as the
+# model saw them in pre-training. Changes scores, so it is off by default.
+WORD_SEGMENT: bool = os.environ.get("BERT_WORD_SEGMENT", "false").lower() == "true"
+# Segmented sentences memoised in the segmenter's LRU.
+SEGMENT_CACHE: int = int(os.environ.get("BERT_SEGMENT_CACHE", "50000"))
+
+# Upper bound on reference + candidate sentences in one /sentence-alignment call.
+MAX_ALIGN_SENTENCES: int = int(os.environ.get("BERT_MAX_ALIGN_SENTENCES", "256"))
+
+# Directory of the persistent near-duplicate index behind /embed and /similar
+# (see vector_index.py); empty disables indexing. Workers share it.
+VECTOR_INDEX_DIR: str = os.environ.get("BERT_VECTOR_INDEX_DIR", "vector_index")
+# Default cosine threshold above which /similar reports an article as a near-duplicate.
+SIMILAR_THRESHOLD: float = float(os.environ.get("BERT_SIMILAR_THRESHOLD", "0.95"))
+
+# Bearer token for the /admin endpoints (on-demand profiling); unset = no admin endpoints.
+ADMIN_TOKEN: str = os.environ.get("BERT_ADMIN_TOKEN", "")
+# Where profiling sessions store their folded stacks, Chrome traces and reports.
+PROFILE_DIR: str = os.environ.get("BERT_PROFILE_DIR", "profiles")
+# Upper bound on the length of one profiling session.
+PROFILE_MAX_SECONDS: float = float(os.environ.get("BERT_PROFILE_MAX_SECONDS", "300"))
+
+# Run one scoring pass right after loading so the first real request does not
+# pay for lazy kernel/allocator initialisation.
+WARMUP: bool = os.environ.get("BERT_WARMUP", "true").lower() != "false"
+_WARMUP_TEXT = "Ngày hội hiến máu thu hút đông đảo sinh viên tham gia."
+
 # ---------------------------------------------------------------------------
-# Global scorer — loaded once at startup
+# Global scorer — loaded in the background after the server starts listening
 # ---------------------------------------------------------------------------
-from bert_score import BERTScorer  # noqa: E402  (import after env vars are in scope)
+# torch / transformers are imported lazily inside _load_scoring_core so the
+# process binds its port (and answers /healthz) within a fraction of a second.
+if TYPE_CHECKING:
+    import numpy as np
+
+    from scoring import LongDocumentInfo, ScoringCore
+    from vector_index import VectorIndex
+
+scoring_core: "ScoringCore | None" = None
+vector_index: "VectorIndex | None" = None
+reference_cache: EmbeddingCache = EmbeddingCache(REF_CACHE_MB * 1024 * 1024)
+metrics = ServiceMetrics()
+profiler = Profiler(PROFILE_DIR)
+inference_pool: InferencePool | None = None
+micro_batcher: "MicroBatcher[PairScore] | None" = None
+model_loading: "asyncio.Task | None" = None
+
+
+class LoadProgress:
+    """Load phase and per-phase timings, reported by /readyz."""
+
+    def __init__(self) -> None:
+        self.phase = "starting"
+        self.source: str | None = None
+        self.error: str | None = None
+        self.timings_ms: dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def step(self, phase: str):
+        self.phase = phase
+        started = time.perf_counter()
+        yield
+        self.timings_ms[phase] = round((time.perf_counter() - started) * 1000.0, 1)
+
+    def finish(self, phase: str, error: str | None = None) -> None:
+        self.phase = phase
+        self.error = error
+        self.timings_ms["total"] = round((time.perf_counter() - self._started) * 1000.0, 1)
+
+    def snapshot(self) -> dict:
+        return {
+            "phase": self.phase,
+            "source": self.source,
+            "error": self.error,
+            "timings_ms": dict(self.timings_ms),
+        }
+
+
+load_progress = LoadProgress()
+
+
+def _intra_op_threads() -> int:
+    if TORCH_THREADS > 0:
+        return TORCH_THREADS
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        cores = os.cpu_count() or 1
+    return max(1, cores // WORKERS)
+
+
+def _open_vector_index(core: "ScoringCore") -> "VectorIndex | None":
+    """Open the near-duplicate index for this model; a broken index only disables /similar."""
+    if not VECTOR_INDEX_DIR:
+        return None
+    from vector_index import VectorIndex
+
+    dim = int(core.embed([_WARMUP_TEXT]).shape[1])
+    try:
+        index = VectorIndex(VECTOR_INDEX_DIR, dim, model=f"{core.embedding_space}@{NUM_LAYERS}")
+    except (OSError, ValueError):
+        logger.exception(f"Vector index disabled: cannot open {VECTOR_INDEX_DIR!r}.")
+        return None
+    logger.info(f"Vector index {VECTOR_INDEX_DIR!r}: {index.stats()}")
+    return index
+
+
+def build_scoring_core(progress: LoadProgress, cache: EmbeddingCache, threads: int) -> "ScoringCore":
+    """
+    Import the ML stack and build the ``ScoringCore`` this configuration
+    describes (model, backend, word segmentation). Shared with ``batch_score``
+    so offline scores come from exactly the same code and settings.
+    """
+    with progress.step("import"):
+        from checkpoint import checkpoint_matches, load_checkpoint, load_from_hub
+        from onnx_backend import load_encoder
+        from scoring import ScoringCore
+        from word_segment import WordSegmenter
+        import torch
+
+    torch.set_num_threads(threads)
+
+    with progress.step("load_model"):
+        if checkpoint_matches(CHECKPOINT_DIR, MODEL_NAME, NUM_LAYERS):
+            progress.source = f"checkpoint:{CHECKPOINT_DIR}"
+            model, tokenizer = load_checkpoint(CHECKPOINT_DIR)
+        else:
+            logger.warning(
+                f"No {NUM_LAYERS}-layer checkpoint for '{MODEL_NAME}' in {CHECKPOINT_DIR!r}; "
+                f"loading from the Hugging Face cache (run checkpoint.py to speed this up)."
+            )
+            progress.source = "hub"
+            model, tokenizer = load_from_hub(MODEL_NAME, NUM_LAYERS)
+
+    with progress.step("load_backend"):
+        encoder = load_encoder(
+            BACKEND,
+            model,
+            model_name=MODEL_NAME,
+            num_layers=NUM_LAYERS,
+            onnx_dir=ONNX_DIR,
+            pad_token_id=tokenizer.pad_token_id,
+            intra_op_threads=ONNX_THREADS or threads,
+        )
+        segmenter = WordSegmenter.from_tokenizer(tokenizer, cache_size=SEGMENT_CACHE) if WORD_SEGMENT else None
+        core = ScoringCore(
+            encoder,
+            tokenizer,
+            model_name=MODEL_NAME,
+            num_layers=NUM_LAYERS,
+            max_len=MAX_SEQ_LEN,
+            batch_size=BATCH_SIZE,
+            reference_cache=cache,
+            long_doc_overlap=LONG_DOC_OVERLAP,
+            long_doc_max_windows=LONG_DOC_MAX_WINDOWS,
+            device="cpu",
+            backend=BACKEND,
+            segmenter=segmenter,
+        )
+
+    logger.info(
+        f"Model loaded (source={progress.source}, backend={BACKEND}, threads={threads}, "
+        f"tokenizer={type(tokenizer).__name__}, "
+        f"fast={getattr(tokenizer, 'is_fast', False)}, "
+        f"word_segment={segmenter.vocabulary_size if segmenter else 'off'})."
+    )
+    return core
+
+
+def _load_scoring_core(progress: LoadProgress) -> "ScoringCore":
+    """Load the truncated model, warm it up and open the vector index (runs in a thread)."""
+    global vector_index
+    core = build_scoring_core(progress, reference_cache, _intra_op_threads())
+
+    if WARMUP:
+        with progress.step("warmup"):
+            core.score_pairs([_WARMUP_TEXT], [_WARMUP_TEXT])
+            reference_cache.clear()
+
+    with progress.step("vector_index"):
+        vector_index = _open_vector_index(core)
+        reference_cache.clear()
+    core.metrics = metrics  # attached after the warm-up so it is not counted
+
+    logger.info(f"Model ready (timings_ms={progress.timings_ms}).")
+    return core
+
 
-bert_scorer: BERTScorer | None = None
+async def _load_in_background() -> None:
+    global scoring_core
+    logger.info(f"Loading model='{MODEL_NAME}' ({NUM_LAYERS} layers) on CPU …")
+    try:
+        scoring_core = await asyncio.to_thread(_load_scoring_core, load_progress)
+    except Exception as exc:
+        logger.exception("Failed to load the scoring model.")
+        load_progress.finish("failed", error=str(exc))
+        return
+    load_progress.finish("ready")
+
+
+def _component_metrics() -> list:
+    """Pool, batcher and cache state, sampled at scrape time."""
+    jobs = Gauge("bert_inference_jobs", "Inference pool jobs by state.", ("state",))
+    waiting = Gauge("bert_batcher_waiting_pairs", "Pairs waiting for a micro-batch.")
+    cache_bytes = Gauge("bert_reference_cache_bytes", "Memory held by cached reference embeddings.")
+    cache_lookups = Counter("bert_reference_cache_lookups_total", "Reference cache lookups.", ("result",))
+    if inference_pool is not None:
+        jobs.set(inference_pool.running, state="running")
+        jobs.set(inference_pool.queued, state="queued")
+    if micro_batcher is not None:
+        waiting.set(micro_batcher.stats()["waiting"])
+    cache = reference_cache.stats()
+    cache_bytes.set(cache["bytes"])
+    cache_lookups.inc(cache["hits"], result="hit")
+    cache_lookups.inc(cache["misses"], result="miss")
+    collected = [jobs, waiting, cache_bytes, cache_lookups]
+    segmenter = scoring_core.segmenter if scoring_core is not None else None
+    if segmenter is not None:
+        seg = segmenter.stats()
+        seg_lookups = Counter("bert_segment_cache_lookups_total", "Segmented-sentence LRU lookups.", ("result",))
+        seg_lookups.inc(seg["hits"], result="hit")
+        seg_lookups.inc(seg["misses"], result="miss")
+        collected.append(seg_lookups)
+    if vector_index is not None:
+        indexed = Gauge("bert_vector_index_vectors", "Article vectors in the near-duplicate index.")
+        indexed.set(len(vector_index))
+        collected.append(indexed)
+    return collected
+
+
+metrics.add_collector(_component_metrics)
 
 
 # ---------------------------------------------------------------------------
@@ -32,25 +332,42 @@ bert_scorer: BERTScorer | None = None
 # ---------------------------------------------------------------------------
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI):
-    global bert_scorer
-    logger.info(f"Loading BERTScorer with model='{MODEL_NAME}' on CPU …")
-    try:
-        bert_scorer = BERTScorer(
-            model_type=MODEL_NAME,
-            lang="vi",
-            num_layers=9,
-            device="cpu",
-            rescale_with_baseline=False,
-        )
-        logger.info("BERTScorer loaded successfully.")
-    except Exception as exc:
-        logger.error(f"Failed to load BERTScorer: {exc}")
-        raise RuntimeError(f"Could not load BERTScorer: {exc}") from exc
+    global scoring_core, vector_index, inference_pool, micro_batcher, model_loading, load_progress
+    load_progress = LoadProgress()
+    model_loading = asyncio.create_task(_load_in_background())
+
+    inference_pool = InferencePool(
+        max_workers=INFERENCE_WORKERS,
+        max_queue=MAX_QUEUE,
+        on_wait=lambda seconds: metrics.observe_stage("queue_wait", seconds),
+    )
+    micro_batcher = MicroBatcher(
+        inference_pool,
+        _score_pairs,
+        window_ms=BATCH_WINDOW_MS,
+        max_batch_size=MICRO_BATCH_MAX,
+        max_pending=BATCHER_MAX_PENDING,
+        on_wait=lambda seconds: metrics.observe_stage("batch_wait", seconds),
+    )
+    micro_batcher.start()
 
     yield  # ── server is running ──
 
     logger.info("Shutting down BERT service.")
-    bert_scorer = None
+    if profiler.active is not None:
+        profiler.active.stop()
+    await micro_batcher.stop()
+    micro_batcher = None
+    inference_pool.shutdown()
+    inference_pool = None
+    if not model_loading.done():
+        model_loading.cancel()  # the loader thread itself finishes in the background
+    model_loading = None
+    scoring_core = None
+    if vector_index is not None:
+        vector_index.close()
+        vector_index = None
+    reference_cache.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -70,11 +387,345 @@ app = FastAPI(
 class ScoreRequest(BaseModel):
     reference_text: str
     candidate_text: str
+    # Encode the whole reference through sliding windows instead of truncating it.
+    long_document: bool = False
+
+
+class LongDocumentReport(BaseModel):
+    reference_tokens: int
+    windows: list[tuple[int, int]]
+    truncated: bool
+    encode_ms: float
+    cached: bool
+
+    @classmethod
+    def from_info(cls, info: "LongDocumentInfo | None") -> "LongDocumentReport | None":
+        if info is None:
+            return None
+        return cls(
+            reference_tokens=info.reference_tokens,
+            windows=list(info.windows),
+            truncated=info.truncated,
+            encode_ms=info.encode_ms,
+            cached=info.cached,
+        )
 
 
 class ScoreResponse(BaseModel):
     f1_score: float
     model_used: str
+    long_document: LongDocumentReport | None = None
+
+
+class ScorePair(BaseModel):
+    reference_text: str
+    candidate_text: str
+
+
+class PairsRequest(BaseModel):
+    """
+    Either an explicit list of ``pairs`` or one ``reference_text`` shared by
+    many ``candidate_texts`` (the fusion case: N proposer summaries of one article).
+    """
+
+    pairs: list[ScorePair] | None = None
+    reference_text: str | None = None
+    candidate_texts: list[str] | None = None
+
+    @model_validator(mode="after")
+    def check_shape(self) -> "PairsRequest":
+        has_pairs = self.pairs is not None
+        has_shared = self.reference_text is not None or self.candidate_texts is not None
+        if has_pairs == has_shared:
+            raise ValueError("Provide either 'pairs' or 'reference_text' + 'candidate_texts'.")
+        if has_shared and (self.reference_text is None or self.candidate_texts is None):
+            raise ValueError("'reference_text' and 'candidate_texts' must be provided together.")
+        if len(self.as_pairs()[0]) > MAX_BATCH_PAIRS:
+            raise ValueError(f"At most {MAX_BATCH_PAIRS} pairs are accepted per request.")
+        return self
+
+    def as_pairs(self) -> tuple[list[str], list[str]]:
+        """Return parallel ``(refs, cands)`` lists regardless of request shape."""
+        if self.pairs is not None:
+            return (
+                [p.reference_text for p in self.pairs],
+                [p.candidate_text for p in self.pairs],
+            )
+        cands = self.candidate_texts or []
+        return [self.reference_text or ""] * len(cands), cands
+
+
+class BatchScoreRequest(PairsRequest):
+    long_document: bool = False
+
+
+class PairScore(BaseModel):
+    precision: float
+    recall: float
+    f1_score: float
+    long_document: LongDocumentReport | None = None
+
+
+class BatchScoreResponse(BaseModel):
+    scores: list[PairScore]
+    model_used: str
+
+
+class LexicalScores(BaseModel):
+    rouge1: float
+    rouge2: float
+    rougeL: float
+    bleu: float
+
+
+class LexicalScoreResponse(BaseModel):
+    scores: list[LexicalScores]
+    elapsed_ms: float
+
+
+class EmbedRequest(BaseModel):
+    texts: list[str]
+    # Also store the vectors in the near-duplicate index under these ids (e.g. article URLs).
+    ids: list[str] | None = None
+    return_vectors: bool = True
+
+    @model_validator(mode="after")
+    def check_shape(self) -> "EmbedRequest":
+        if len(self.texts) > MAX_BATCH_PAIRS:
+            raise ValueError(f"At most {MAX_BATCH_PAIRS} texts are accepted per request.")
+        if self.ids is not None and len(self.ids) != len(self.texts):
+            raise ValueError("'ids' must have one entry per text.")
+        return self
+
+
+class EmbedResponse(BaseModel):
+    embeddings: list[list[float]] | None
+    dim: int
+    indexed: int
+    model_used: str
+
+
+class SimilarRequest(BaseModel):
+    """
+    Look up ``text`` (embedded on the fly) or the vector already stored under
+    ``id``. With ``index`` the text is stored under ``id`` after the lookup,
+    so one call both checks an article and registers it.
+    """
+
+    text: str | None = None
+    id: str | None = None
+    k: int = Field(5, ge=1, le=100)
+    threshold: float | None = None
+    index: bool = False
+
+    @model_validator(mode="after")
+    def check_shape(self) -> "SimilarRequest":
+        if self.text is None and self.id is None:
+            raise ValueError("Provide 'text' or 'id'.")
+        if self.index and (self.text is None or self.id is None):
+            raise ValueError("'index' needs both 'text' and 'id'.")
+        return self
+
+
+class AlignmentRequest(BaseModel):
+    reference_text: str
+    candidate_text: str
+    # Matrix entry to return and rank by: BERTScore precision (how much of the
+    # candidate sentence the reference sentence supports), recall, F1, or the
+    # cosine of mean-pooled sentence vectors.
+    score: Literal["f1", "precision", "recall", "cosine"] = "f1"
+    top_k: int = Field(3, ge=1, le=50)
+    include_matrix: bool = True
+
+
+class SupportingSentence(BaseModel):
+    reference_index: int
+    score: float
+
+
+class SentenceAlignment(BaseModel):
+    candidate_index: int
+    supports: list[SupportingSentence]
+
+
+class AlignmentResponse(BaseModel):
+    reference_sentences: list[str]
+    candidate_sentences: list[str]
+    score: str
+    # Rows are candidate sentences, columns reference sentences.
+    matrix: list[list[float]] | None
+    alignments: list[SentenceAlignment]
+    model_used: str
+
+
+class ProfileRequest(BaseModel):
+    # The session ends after this many scoring requests (/calculate-score,
+    # /calculate-score-batch, /sentence-alignment) or seconds, whichever comes first
+    # (20 requests when neither is given; never longer than BERT_PROFILE_MAX_SECONDS).
+    requests: int | None = Field(None, ge=1)
+    seconds: float | None = Field(None, gt=0)
+    # Python stack sampling period.
+    interval_ms: float = Field(5.0, ge=1.0, le=1000.0)
+    # Also run torch.profiler around every inference job (per-op CPU times).
+    torch_ops: bool = True
+
+
+class SimilarMatch(BaseModel):
+    id: str
+    score: float
+
+
+class SimilarResponse(BaseModel):
+    matches: list[SimilarMatch]
+    indexed_vectors: int
+    elapsed_ms: float
+    model_used: str
+
+
+# ---------------------------------------------------------------------------
+# Scoring helpers
+# ---------------------------------------------------------------------------
+def _score_pairs(
+    refs: list[str], cands: list[str], long_document: bool = False
+) -> list[PairScore]:
+    """
+    Score ``cands[i]`` against ``refs[i]`` for every i in padded batches of
+    ``BATCH_SIZE``. References are served from the embedding cache when the same
+    article was encoded before, so repeats only cost a candidate encoding.
+    """
+    return [
+        PairScore(
+            precision=round(s.precision, 6),
+            recall=round(s.recall, 6),
+            f1_score=round(s.f1, 6),
+            long_document=LongDocumentReport.from_info(s.long_document),
+        )
+        for s in scoring_core.score_pairs(refs, cands, long_document)
+    ]
+
+
+def _embed(texts: list[str], ids: list[str] | None) -> "np.ndarray":
+    """Pooled, L2-normalised vectors for ``texts``; stored in the index under ``ids`` if given."""
+    vectors = scoring_core.embed(texts).numpy()
+    if ids:
+        vector_index.add(ids, vectors)
+    return vectors
+
+
+def _align(payload: AlignmentRequest) -> AlignmentResponse:
+    result = scoring_core.sentence_matrix(
+        payload.reference_text, payload.candidate_text, max_sentences=MAX_ALIGN_SENTENCES
+    )
+    matrix = getattr(result, payload.score)
+    alignments = []
+    if matrix.numel():
+        top = matrix.topk(min(payload.top_k, matrix.size(1)), dim=1)
+        for j, (values, indices) in enumerate(zip(top.values.tolist(), top.indices.tolist())):
+            alignments.append(SentenceAlignment(
+                candidate_index=j,
+                supports=[SupportingSentence(reference_index=i, score=round(v, 6)) for v, i in zip(values, indices)],
+            ))
+    return AlignmentResponse(
+        reference_sentences=result.reference_sentences,
+        candidate_sentences=result.candidate_sentences,
+        score=payload.score,
+        matrix=matrix.round(decimals=6).tolist() if payload.include_matrix else None,
+        alignments=alignments,
+        model_used=MODEL_NAME,
+    )
+
+
+def _similar(payload: SimilarRequest) -> list[tuple[str, float]] | None:
+    """Near-duplicates of the request's text / stored id (itself excluded); None for an unknown id."""
+    if payload.text is not None:
+        vector = scoring_core.embed([payload.text]).numpy()[0]
+    else:
+        vector = vector_index.get(payload.id)
+        if vector is None:
+            return None
+    threshold = SIMILAR_THRESHOLD if payload.threshold is None else payload.threshold
+    matches = vector_index.search(
+        vector, payload.k, threshold, exclude=(payload.id,) if payload.id else ()
+    )
+    if payload.index:
+        vector_index.add([payload.id], vector[None])
+    return matches
+
+
+T = TypeVar("T")
+
+
+def _require_ready() -> None:
+    if scoring_core is None or inference_pool is None or micro_batcher is None:
+        raise HTTPException(status_code=503, detail="Model not loaded yet.")
+
+
+def _require_index() -> None:
+    if vector_index is None:
+        raise HTTPException(status_code=503, detail="Vector index is disabled (BERT_VECTOR_INDEX_DIR).")
+
+
+async def _wait_ready() -> None:
+    """
+    Hold a scoring request that arrives during a cold start until the model is
+    loaded (within the request deadline) instead of failing it.
+    """
+    if scoring_core is None and model_loading is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(model_loading), timeout=REQUEST_TIMEOUT_S)
+        except asyncio.TimeoutError as exc:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Model still loading ({load_progress.phase}).",
+                headers={"Retry-After": str(RETRY_AFTER_S)},
+            ) from exc
+    if load_progress.phase == "failed":
+        raise HTTPException(status_code=503, detail=f"Model failed to load: {load_progress.error}")
+    _require_ready()
+
+
+@contextlib.contextmanager
+def _tracked(endpoint: str, profiled: bool = False):
+    """
+    Count a scoring request, its outcome and its latency. ``profiled`` marks
+    endpoints that run the BERTScore path a profiling session samples; only
+    those count towards the session's request limit.
+    """
+    metrics.requests.inc(endpoint=endpoint)
+    metrics.in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except HTTPException as exc:
+        metrics.errors.inc(endpoint=endpoint, status=str(exc.status_code))
+        raise
+    except Exception:
+        metrics.errors.inc(endpoint=endpoint, status="500")
+        raise
+    finally:
+        metrics.in_flight.dec()
+        metrics.request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+        if profiled and profiler.active is not None:
+            profiler.active.request_done()
+
+
+async def _with_backpressure(awaitable: Awaitable[T]) -> T:
+    """
+    Await scoring work queued on the inference pool / micro-batcher, translating
+    back-pressure and deadline failures into the HTTP errors clients retry on.
+    """
+    try:
+        return await awaitable
+    except QueueFullError as exc:
+        logger.warning(f"Rejecting request: {exc}")
+        raise HTTPException(
+            status_code=503,
+            detail="Scoring queue is full, retry later.",
+            headers={"Retry-After": str(RETRY_AFTER_S)},
+        ) from exc
+    except DeadlineExceededError as exc:
+        logger.warning(f"Request deadline exceeded: {exc}")
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
 
 
 # ---------------------------------------------------------------------------
@@ -82,10 +733,54 @@ class ScoreResponse(BaseModel):
 # ---------------------------------------------------------------------------
 @app.get("/healthz", status_code=200, tags=["Health"])
 async def health_check():
-    """Liveness / readiness probe."""
-    if bert_scorer is None:
-        raise HTTPException(status_code=503, detail="Model not loaded yet.")
-    return {"status": "ok", "model_loaded": True, "model_used": MODEL_NAME}
+    """
+    Liveness probe. Answers as soon as the server is listening, while the model
+    is still loading and while the inference pool is saturated; it only fails
+    once loading has failed for good. Use /readyz to wait for the model.
+    """
+    if load_progress.phase == "failed":
+        raise HTTPException(status_code=500, detail=f"Model failed to load: {load_progress.error}")
+    return {"status": "ok", "phase": load_progress.phase}
+
+
+@app.get("/readyz", status_code=200, tags=["Health"])
+async def readiness_check():
+    """
+    Readiness probe: 200 once the model is loaded and warmed up, 503 before.
+    Reports the current load phase and how long each phase took.
+    """
+    body = {
+        "status": "ok" if scoring_core is not None else "loading",
+        "model_loaded": scoring_core is not None,
+        "model_used": MODEL_NAME,
+        "backend": BACKEND,
+        "pid": os.getpid(),
+        "intra_op_threads": _intra_op_threads(),
+        **load_progress.snapshot(),
+    }
+    if scoring_core is None or inference_pool is None:
+        return JSONResponse(status_code=503, content=body)
+    body["inference"] = inference_pool.stats()
+    return body
+
+
+@app.get("/stats", tags=["Health"])
+async def stats():
+    """Queueing, micro-batching and reference-cache statistics."""
+    _require_ready()
+    return {
+        "inference": inference_pool.stats(),
+        "batcher": micro_batcher.stats(),
+        "reference_cache": reference_cache.stats(),
+        "word_segment": scoring_core.segmenter.stats() if scoring_core.segmenter else None,
+        "vector_index": vector_index.stats() if vector_index is not None else None,
+    }
+
+
+@app.get("/metrics", tags=["Health"])
+async def prometheus_metrics():
+    """Prometheus text-format metrics of this worker process."""
+    return Response(content=metrics.render(), media_type=metrics.content_type)
 
 
 @app.post("/calculate-score", response_model=ScoreResponse, tags=["Scoring"])
@@ -95,36 +790,263 @@ async def calculate_score(payload: ScoreRequest):
 
     - **reference_text**: The ground-truth / source text.
     - **candidate_text**: The generated summary or text to evaluate.
+    - **long_document**: Score against the full reference via sliding windows
+      instead of its first 256 tokens.
     """
-    if bert_scorer is None:
-        raise HTTPException(status_code=503, detail="Model not loaded yet.")
+    with _tracked("calculate-score", profiled=True):
+        await _wait_ready()
+        try:
+            logger.info("Computing BERTScore …")
+            if payload.long_document:
+                # Window encoding is already batched; skip the micro-batcher.
+                [score] = await _with_backpressure(
+                    inference_pool.run(
+                        _score_pairs,
+                        [payload.reference_text],
+                        [payload.candidate_text],
+                        True,
+                        timeout=REQUEST_TIMEOUT_S,
+                    )
+                )
+            else:
+                score = await _with_backpressure(
+                    micro_batcher.submit(
+                        payload.reference_text,
+                        payload.candidate_text,
+                        timeout=REQUEST_TIMEOUT_S,
+                    )
+                )
+            logger.info(f"BERTScore F1 = {score.f1_score}")
+            return ScoreResponse(
+                f1_score=score.f1_score,
+                model_used=MODEL_NAME,
+                long_document=score.long_document,
+            )
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logger.exception("Error during BERTScore calculation.")
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@app.post("/calculate-score-batch", response_model=BatchScoreResponse, tags=["Scoring"])
+async def calculate_score_batch(payload: BatchScoreRequest):
+    """
+    Calculate BERTScore P/R/F1 for many (reference, candidate) pairs at once.
+
+    - **pairs**: explicit list of `{reference_text, candidate_text}` objects, or
+    - **reference_text** + **candidate_texts**: one reference scored against N candidates.
+    - **long_document**: encode references in full through sliding windows.
+
+    Scores are returned in request order.
+    """
+    with _tracked("calculate-score-batch", profiled=True):
+        await _wait_ready()
+        refs, cands = payload.as_pairs()
+        try:
+            logger.info(f"Computing BERTScore for {len(cands)} pair(s) …")
+            scores = await _with_backpressure(
+                inference_pool.run(
+                    _score_pairs, refs, cands, payload.long_document, timeout=REQUEST_TIMEOUT_S
+                )
+            )
+            return BatchScoreResponse(scores=scores, model_used=MODEL_NAME)
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logger.exception("Error during batched BERTScore calculation.")
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@app.post("/lexical-scores", response_model=LexicalScoreResponse, tags=["Scoring"])
+async def lexical_scores(payload: PairsRequest):
+    """
+    ROUGE-1/2/L (recall) and BLEU-4 for many (reference, candidate) pairs, with
+    the same tokenization and formulas as the backend's evaluation service.
+    Accepts the same two request shapes as `/calculate-score-batch`. Does not
+    use the model, so it is served even while PhoBERT is loading.
+    """
+    with _tracked("lexical-scores"):
+        refs, cands = payload.as_pairs()
+        started = time.perf_counter()
+        # Pure CPU work but independent of the model; keep it off the event loop
+        # without queueing it behind BERT inference.
+        scores = await asyncio.to_thread(lexical.score_pairs, refs, cands)
+        return LexicalScoreResponse(
+            scores=[
+                LexicalScores(
+                    rouge1=round(s.rouge1, 4),
+                    rouge2=round(s.rouge2, 4),
+                    rougeL=round(s.rougeL, 4),
+                    bleu=round(s.bleu, 4),
+                )
+                for s in scores
+            ],
+            elapsed_ms=round((time.perf_counter() - started) * 1000.0, 3),
+        )
+
+
+@app.post("/sentence-alignment", response_model=AlignmentResponse, tags=["Scoring"])
+async def sentence_alignment(payload: AlignmentRequest):
+    """
+    Split both texts into sentences and score every candidate sentence against
+    every reference sentence, encoding each sentence once in one batch.
+
+    - **score**: `f1` (default), `precision`, `recall` or `cosine`. Each F1
+      equals `/calculate-score` on that sentence pair.
+    - **top_k**: best-supporting reference sentences returned per candidate sentence.
+    - **include_matrix**: return the full candidate × reference matrix.
+    """
+    with _tracked("sentence-alignment", profiled=True):
+        await _wait_ready()
+        try:
+            return await _with_backpressure(
+                inference_pool.run(_align, payload, timeout=REQUEST_TIMEOUT_S)
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logger.exception("Error during sentence alignment.")
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
 
+
+@app.post("/embed", response_model=EmbedResponse, tags=["Similarity"])
+async def embed(payload: EmbedRequest):
+    """
+    Mean-pooled PhoBERT vectors (L2-normalised, first 256 tokens) for up to
+    `BERT_MAX_BATCH_PAIRS` texts.
+
+    - **ids**: also store the vectors in the near-duplicate index under these ids.
+    - **return_vectors**: set to false to only index.
+    """
+    with _tracked("embed"):
+        await _wait_ready()
+        if payload.ids is not None:
+            _require_index()
+        try:
+            vectors = await _with_backpressure(
+                inference_pool.run(_embed, payload.texts, payload.ids, timeout=REQUEST_TIMEOUT_S)
+            )
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logger.exception("Error during embedding.")
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+        return EmbedResponse(
+            embeddings=vectors.round(6).tolist() if payload.return_vectors else None,
+            dim=int(vectors.shape[1]) if len(payload.texts) else 0,
+            indexed=len(payload.ids or []),
+            model_used=MODEL_NAME,
+        )
+
+
+@app.post("/similar", response_model=SimilarResponse, tags=["Similarity"])
+async def similar(payload: SimilarRequest):
+    """
+    Top-k indexed articles whose cosine similarity to `text` (or to the vector
+    stored under `id`) is at least `threshold` (default `BERT_SIMILAR_THRESHOLD`).
+    The backend can reuse the summary and scores of a match instead of
+    summarizing a near-duplicate again.
+
+    - **index**: store `text` under `id` after the lookup.
+    """
+    with _tracked("similar"):
+        await _wait_ready()
+        _require_index()
+        started = time.perf_counter()
+        try:
+            if payload.text is None:
+                # Lookup by id only: no model work, don't queue behind inference.
+                matches = await asyncio.to_thread(_similar, payload)
+            else:
+                matches = await _with_backpressure(
+                    inference_pool.run(_similar, payload, timeout=REQUEST_TIMEOUT_S)
+                )
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logger.exception("Error during similarity search.")
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+        if matches is None:
+            raise HTTPException(status_code=404, detail=f"No vector stored under id {payload.id!r}.")
+        return SimilarResponse(
+            matches=[SimilarMatch(id=key, score=score) for key, score in matches],
+            indexed_vectors=len(vector_index),
+            elapsed_ms=round((time.perf_counter() - started) * 1000.0, 3),
+            model_used=MODEL_NAME,
+        )
+
+
+def _require_admin(authorization: str | None = Header(None)) -> None:
+    """Admin endpoints exist only with BERT_ADMIN_TOKEN set and need ``Authorization: Bearer <token>``."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token.", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.post("/admin/profile", status_code=202, tags=["Admin"], dependencies=[Depends(_require_admin)])
+async def start_profile(payload: ProfileRequest):
+    """
+    Profile the next `requests` requests or `seconds` seconds handled by this
+    worker: Python stack samples of the inference threads plus torch operator
+    times, both broken down by stage (segment, tokenize, forward, match).
+    Poll `GET /admin/profile` for the report.
+    """
+    await _wait_ready()
+    max_requests = payload.requests if payload.requests or payload.seconds else 20
     try:
-        logger.info("Computing BERTScore …")
-
-        # Safely truncate input texts using the underlying tokenizer to avoid index out-of-bounds.
-        # PhoBERT has a maximum sequence length of 256 tokens.
-        cand_text = payload.candidate_text
-        ref_text = payload.reference_text
-        tokenizer = getattr(bert_scorer, "_tokenizer", None)
-        
-        if tokenizer is not None:
-            cand_tokens = tokenizer(cand_text, truncation=True, max_length=256)
-            cand_text = tokenizer.decode(cand_tokens["input_ids"], skip_special_tokens=True)
-            
-            ref_tokens = tokenizer(ref_text, truncation=True, max_length=256)
-            ref_text = tokenizer.decode(ref_tokens["input_ids"], skip_special_tokens=True)
-
-        _, _, F1 = bert_scorer.score(
-            cands=[cand_text],
-            refs=[ref_text],
+        session = profiler.start(
+            inference_pool,
+            scoring_core,
+            max_requests=max_requests,
+            max_seconds=min(payload.seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS),
+            interval_s=payload.interval_ms / 1000.0,
+            torch_ops=payload.torch_ops,
         )
-        f1_value = round(float(F1[0].item()), 6)
-        logger.info(f"BERTScore F1 = {f1_value}")
-        return ScoreResponse(f1_score=f1_value, model_used=MODEL_NAME)
-    except Exception as exc:
-        logger.exception("Error during BERTScore calculation.")
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    logger.info(f"Profiling session {session.id} started: {payload.model_dump()}")
+    return session.status()
+
+
+@app.get("/admin/profile", tags=["Admin"], dependencies=[Depends(_require_admin)])
+async def profile_status():
+    """The running session of this worker (if any) and the ids of stored reports."""
+    active = profiler.active
+    return {"active": active.status() if active else None, "sessions": profiler.sessions()}
+
+
+@app.delete("/admin/profile", tags=["Admin"], dependencies=[Depends(_require_admin)])
+async def stop_profile():
+    """End the running session now; its report is written in the background."""
+    active = profiler.active
+    if active is None:
+        raise HTTPException(status_code=404, detail="No profiling session is running.")
+    active.stop()
+    return {"id": active.id, "stopping": True}
+
+
+@app.get("/admin/profile/{session_id}", tags=["Admin"], dependencies=[Depends(_require_admin)])
+async def profile_report(session_id: str, format: str = "report"):
+    """
+    A stored session: `format=report` (JSON: stage shares, top frames, top
+    torch ops per stage), `collapsed` (folded stacks for flamegraph.pl /
+    speedscope) or `trace` (Chrome trace JSON).
+    """
+    suffixes = {"report": ".json", "collapsed": ".collapsed", "trace": ".trace.json"}
+    if format not in suffixes:
+        raise HTTPException(status_code=422, detail=f"format must be one of {sorted(suffixes)}.")
+    path = profiler.path(session_id, suffixes[format])
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No {format} for profiling session {session_id!r}.")
+    if format == "collapsed":
+        with open(path, encoding="utf-8") as f:
+            return PlainTextResponse(f.read())
+    return FileResponse(path, media_type="application/json")
 
 
 # ---------------------------------------------------------------------------
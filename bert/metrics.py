@@ -0,0 +1,258 @@
+"""
+Minimal Prometheus text-format metrics for the BERT service.
+
+The service logs little more than "Computing BERTScore …", which says nothing
+about *where* a slow request spent its time. ``ServiceMetrics`` records each
+stage — micro-batch wait, inference-queue wait, tokenization, the encoder
+forward pass and greedy matching — into cumulative histograms, together with
+request / error counters, input token lengths, truncation counts, in-flight
+requests and process RSS, and renders them for ``GET /metrics``.
+
+Recording is a ``bisect`` plus a few integer additions under a lock, so the
+instrumentation stays on under load. Values are per process: in multi-worker
+mode every worker reports its own series, labelled by ``bert_worker_info``.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage latencies range from sub-millisecond matmuls to multi-second forwards.
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+# Token lengths before truncation; PhoBERT keeps at most 256.
+TOKEN_BUCKETS = (16, 32, 64, 128, 192, 256, 384, 512, 1024, 2048, 4096, 8192)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        fn: Callable[[], float] | None = None,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._fn = fn  # sampled at scrape time instead of being set
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> list[str]:
+        if self._fn is not None:
+            return [f"{self.name} {_fmt(self._fn())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last)], sum, count
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = _labels(self.labelnames, key, f'le="{_fmt(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def process_rss_bytes() -> float:
+    """Resident set size of this process (Linux /proc; 0 where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return float(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class ServiceMetrics:
+    """The metric set exported by the BERT service."""
+
+    content_type = _CONTENT_TYPE
+
+    def __init__(self) -> None:
+        self.requests = Counter(
+            "bert_requests_total", "Scoring requests received.", ("endpoint",)
+        )
+        self.errors = Counter(
+            "bert_request_errors_total", "Scoring requests that failed, by HTTP status.", ("endpoint", "status")
+        )
+        self.pairs = Counter("bert_pairs_scored_total", "Reference/candidate pairs scored.")
+        self.request_seconds = Histogram(
+            "bert_request_duration_seconds", "End-to-end scoring request latency.", ("endpoint",)
+        )
+        self.stage_seconds = Histogram(
+            "bert_stage_duration_seconds",
+            "Time spent per stage: batch_wait, queue_wait, segment (within tokenize), tokenize, forward, match.",
+            ("stage",),
+        )
+        self.input_tokens = Histogram(
+            "bert_input_tokens",
+            "Token length of each input text before truncation.",
+            ("role",),
+            buckets=TOKEN_BUCKETS,
+        )
+        self.truncated = Counter(
+            "bert_truncated_inputs_total", "Inputs cut to the model's maximum length.", ("role",)
+        )
+        self.in_flight = Gauge("bert_requests_in_flight", "Scoring requests currently being served.")
+        self.rss = Gauge("bert_process_resident_memory_bytes", "Resident memory of this worker.", fn=process_rss_bytes)
+        self.worker = Gauge("bert_worker_info", "Identifies the worker process serving this scrape.", ("pid",))
+        self.worker.set(1, pid=str(os.getpid()))
+
+        self._metrics: list[_Metric] = [
+            self.requests,
+            self.errors,
+            self.pairs,
+            self.request_seconds,
+            self.stage_seconds,
+            self.input_tokens,
+            self.truncated,
+            self.in_flight,
+            self.rss,
+            self.worker,
+        ]
+        self._extra: list[Callable[[], list[_Metric]]] = []
+
+    # Hooks handed to the scoring core, inference pool and micro-batcher.
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.stage_seconds.observe(seconds, stage=stage)
+
+    def observe_tokens(self, role: str, length: int, truncated: bool) -> None:
+        self.input_tokens.observe(length, role=role)
+        if truncated:
+            self.truncated.inc(role=role)
+
+    def add_collector(self, collect: Callable[[], list[_Metric]]) -> None:
+        """Register metrics built at scrape time (e.g. from another component's ``stats()``)."""
+        self._extra.append(collect)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for collect in self._extra:
+            metrics.extend(collect())
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,230 @@
+"""
+Dynamic micro-batching for single-pair score requests.
+
+Concurrent ``/calculate-score`` calls from the Next.js backend and
+``run_metrics.py`` tend to arrive within milliseconds of each other, yet each
+one pays for its own PhoBERT forward pass. ``MicroBatcher`` parks incoming
+pairs for at most ``window_ms`` (or until ``max_batch_size`` pairs are
+waiting), runs one batched scoring call on the ``InferencePool`` and fans the
+per-pair results back to every waiting request.
+
+While all pool workers are busy the batcher keeps collecting, so batches grow
+naturally with load and shrink to size 1 when traffic is light.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Generic, TypeVar
+
+from inference_pool import DeadlineExceededError, InferencePool, QueueFullError
+
+T = TypeVar("T")
+
+# Number of recent queue-wait samples kept for percentile reporting.
+_WAIT_SAMPLES = 2048
+
+
+@dataclass
+class _Pending:
+    reference_text: str
+    candidate_text: str
+    future: asyncio.Future
+    deadline: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class MicroBatcher(Generic[T]):
+    def __init__(
+        self,
+        pool: InferencePool,
+        score_fn: Callable[[list[str], list[str]], list[T]],
+        *,
+        window_ms: float = 10.0,
+        max_batch_size: int = 16,
+        max_pending: int = 256,
+        on_wait: Callable[[float], None] | None = None,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self._pool = pool
+        self._score_fn = score_fn
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        # Called with the seconds each pair waited for its batch (metrics hook).
+        self._on_wait = on_wait
+
+        self._items: deque[_Pending] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+        # Metrics
+        self._batch_sizes: Counter[int] = Counter()
+        self._requests = 0
+        self._waits_ms: deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._wait_ms_sum = 0.0
+        self._wait_ms_max = 0.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Start the collector task. Must be called from the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self._pool.max_workers)
+        self._task = asyncio.get_running_loop().create_task(self._collect_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._items:
+            pending = self._items.popleft()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Batcher stopped."))
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    async def submit(self, reference_text: str, candidate_text: str, *, timeout: float) -> T:
+        """
+        Queue one pair for the next batch and wait for its score.
+
+        Raises ``QueueFullError`` when ``max_pending`` pairs are already waiting
+        and ``DeadlineExceededError`` when no result arrives within ``timeout``.
+        """
+        if self._task is None or self._wakeup is None:
+            raise RuntimeError("MicroBatcher.start() has not been called.")
+        if len(self._items) >= self.max_pending:
+            raise QueueFullError(
+                f"{len(self._items)} pairs already waiting for a batch (limit {self.max_pending})."
+            )
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._items.append(
+            _Pending(
+                reference_text=reference_text,
+                candidate_text=candidate_text,
+                future=future,
+                deadline=time.monotonic() + timeout,
+            )
+        )
+        self._wakeup.set()
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError as exc:
+            raise DeadlineExceededError(
+                f"Score did not finish within {timeout:.1f}s."
+            ) from exc
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits_ms)
+        batches = sum(self._batch_sizes.values())
+        return {
+            "window_ms": self.window_s * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "waiting": len(self._items),
+            "batches": batches,
+            "requests": self._requests,
+            "mean_batch_size": round(self._requests / batches, 3) if batches else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+            "queue_wait_ms": {
+                "mean": round(self._wait_ms_sum / self._requests, 3) if self._requests else 0.0,
+                "p50": round(_percentile(waits, 0.50), 3),
+                "p95": round(_percentile(waits, 0.95), 3),
+                "p99": round(_percentile(waits, 0.99), 3),
+                "max": round(self._wait_ms_max, 3),
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    async def _collect_forever(self) -> None:
+        assert self._wakeup is not None and self._slots is not None
+        while True:
+            while not self._items:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Hold off forming a batch until a worker can take it; requests keep
+            # accumulating meanwhile, which is what makes batches grow under load.
+            await self._slots.acquire()
+
+            window_end = time.monotonic() + self.window_s
+            while len(self._items) < self.max_batch_size:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch: list[_Pending] = []
+            while self._items and len(batch) < self.max_batch_size:
+                pending = self._items.popleft()
+                if not pending.future.done():  # skip callers that already gave up
+                    batch.append(pending)
+
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list[_Pending]) -> None:
+        assert self._slots is not None
+        try:
+            now = time.monotonic()
+            self._record(batch, now)
+            timeout = max(max(p.deadline for p in batch) - now, 0.001)
+            try:
+                results = await self._pool.run(
+                    self._score_fn,
+                    [p.reference_text for p in batch],
+                    [p.candidate_text for p in batch],
+                    timeout=timeout,
+                )
+            except Exception as exc:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+                return
+
+            for pending, result in zip(batch, results):
+                if not pending.future.done():
+                    pending.future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _record(self, batch: list[_Pending], dispatched_at: float) -> None:
+        self._batch_sizes[len(batch)] += 1
+        self._requests += len(batch)
+        for pending in batch:
+            wait_ms = (dispatched_at - pending.enqueued_at) * 1000.0
+            self._waits_ms.append(wait_ms)
+            self._wait_ms_sum += wait_ms
+            self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+            if self._on_wait is not None:
+                self._on_wait(wait_ms / 1000.0)
@@ -0,0 +1,174 @@
+"""
+ONNX Runtime inference backend for the PhoBERT scorer.
+
+BERTScore only needs the hidden states of the first ``NUM_LAYERS`` encoder
+layers. ``export_onnx`` traces that layer-truncated encoder (input IDs +
+attention mask → last hidden state) into an ONNX graph with dynamic batch and
+sequence axes. ``quantize_int8`` optionally applies dynamic int8 weight
+quantization on top of it. ``OnnxEncoder`` runs either graph with ONNX Runtime
+behind the same call signature as the Hugging Face model
+(``encoder(ids, attention_mask=mask)[0]``), so the scoring core and its
+P/R/F1 interface stay unchanged.
+
+Selected with ``BERT_BACKEND``:
+
+- ``torch`` (default) — fp32 PyTorch, as before
+- ``onnx`` — fp32 ONNX Runtime
+- ``onnx-int8`` — dynamically quantized int8 ONNX Runtime
+
+Graphs are cached under ``BERT_ONNX_DIR`` and exported on first start when
+missing. To build them ahead of time (e.g. during ``docker build``)::
+
+    python onnx_backend.py --model vinai/phobert-base --int8
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from pathlib import Path
+
+import torch
+
+logger = logging.getLogger("bert_service")
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError as exc:  # pragma: no cover - depends on the image
+        raise RuntimeError(
+            "BERT_BACKEND=onnx requires the 'onnx' and 'onnxruntime' packages."
+        ) from exc
+    return onnxruntime
+
+
+def onnx_paths(onnx_dir: str, model_name: str, num_layers: int) -> tuple[Path, Path]:
+    """Return ``(fp32_path, int8_path)`` for ``model_name`` truncated to ``num_layers``."""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name).strip("_")
+    base = Path(onnx_dir) / f"{slug}-l{num_layers}"
+    return base.with_suffix(".onnx"), Path(f"{base}-int8.onnx")
+
+
+class _LastHiddenState(torch.nn.Module):
+    def __init__(self, model: torch.nn.Module) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids, attention_mask=attention_mask)[0]
+
+
+def export_onnx(model: torch.nn.Module, path: Path, pad_token_id: int = 1) -> Path:
+    """Trace the (already layer-truncated) encoder into an ONNX graph at ``path``."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ids = torch.tensor([[0, 5, 6, 7, 2], [0, 5, 2, pad_token_id, pad_token_id]])
+    mask = (ids != pad_token_id).long()
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(model).eval(),
+            (ids, mask),
+            str(path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "last_hidden_state": dynamic,
+            },
+            opset_version=17,
+            dynamo=False,
+        )
+    logger.info(f"Exported ONNX encoder to {path}.")
+    return path
+
+
+def quantize_int8(src: Path, dst: Path) -> Path:
+    """Dynamic int8 quantization of the MatMul/Gemm weights of ``src``."""
+    _require_onnxruntime()
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+    logger.info(f"Quantized ONNX encoder to {dst}.")
+    return dst
+
+
+class OnnxEncoder:
+    """Drop-in replacement for the torch encoder: ``encoder(ids, attention_mask=mask)[0]``."""
+
+    def __init__(self, path: Path, intra_op_threads: int | None = None) -> None:
+        ort = _require_onnxruntime()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self._session = ort.InferenceSession(
+            str(path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> tuple[torch.Tensor]:
+        (hidden,) = self._session.run(
+            ["last_hidden_state"],
+            {
+                "input_ids": input_ids.cpu().numpy(),
+                "attention_mask": attention_mask.cpu().numpy(),
+            },
+        )
+        return (torch.from_numpy(hidden),)
+
+
+def load_encoder(
+    backend: str,
+    model: torch.nn.Module,
+    *,
+    model_name: str,
+    num_layers: int,
+    onnx_dir: str,
+    pad_token_id: int,
+    intra_op_threads: int | None = None,
+):
+    """
+    Return the encoder for ``backend``: the torch ``model`` itself, or an
+    ``OnnxEncoder`` over a graph exported (and quantized) from it on demand.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown BERT_BACKEND '{backend}', expected one of {BACKENDS}.")
+    if backend == "torch":
+        return model
+
+    _require_onnxruntime()
+    fp32_path, int8_path = onnx_paths(onnx_dir, model_name, num_layers)
+    if not fp32_path.exists():
+        export_onnx(model, fp32_path, pad_token_id)
+    path = fp32_path
+    if backend == "onnx-int8":
+        if not int8_path.exists():
+            quantize_int8(fp32_path, int8_path)
+        path = int8_path
+    return OnnxEncoder(path, intra_op_threads)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from bert_score.utils import get_model
+
+    parser = argparse.ArgumentParser(description="Export the layer-truncated PhoBERT encoder to ONNX.")
+    parser.add_argument("--model", default=os.environ.get("BERT_MODEL", "vinai/phobert-base"))
+    parser.add_argument("--num-layers", type=int, default=9)
+    parser.add_argument("--onnx-dir", default=os.environ.get("BERT_ONNX_DIR", "onnx"))
+    parser.add_argument("--int8", action="store_true", help="Also write the int8-quantized graph.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fp32, int8 = onnx_paths(args.onnx_dir, args.model, args.num_layers)
+    export_onnx(get_model(args.model, args.num_layers), fp32)
+    if args.int8:
+        quantize_int8(fp32, int8)
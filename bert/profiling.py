@@ -0,0 +1,384 @@
+"""
+On-demand profiling of the scoring hot path.
+
+``/metrics`` says *which* stage of ``/calculate-score`` is slow; a profiling
+session says *why*. ``POST /admin/profile`` (gated by ``BERT_ADMIN_TOKEN``)
+starts a session for the next N requests or T seconds, whichever ends first.
+While it runs, every inference-pool job is observed by:
+
+- a Python sampler — a thread that reads ``sys._current_frames()`` of the
+  threads currently running a job every ``interval`` and counts their stacks;
+- the torch operator profiler (``torch.profiler``), entered around each job on
+  the worker thread itself (it only records the thread that enters it), with
+  ``ScoringCore`` labelling its stages (``segment``, ``tokenize``,
+  ``forward``, ``match``) via ``record_function``.
+
+When the session ends, the sampler thread writes to ``BERT_PROFILE_DIR``:
+
+- ``<id>.collapsed`` — folded stacks (``frame;frame;frame count``) for
+  ``flamegraph.pl``, speedscope or inferno;
+- ``<id>.trace.json`` — Chrome trace of the first jobs (chrome://tracing,
+  Perfetto);
+- ``<id>.json`` — the report: samples and top frames per stage, and the top
+  torch ops per stage by self CPU time.
+
+Nothing is installed outside a session: no sampler thread runs, the pool's
+``job_wrapper`` is None, ``ScoringCore.profiling`` is False and the request
+hook is a None check, so profiling costs nothing measurable while it is off.
+Sessions are per worker process.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# Innermost frame (file, function) that attributes a Python sample to a stage.
+_STAGE_FRAMES = {
+    ("word_segment.py", None): "segment",
+    ("scoring.py", "prepare"): "segment",
+    ("scoring.py", "tokenize"): "tokenize",
+    ("scoring.py", "_forward"): "forward",
+    ("scoring.py", "encode_long"): "forward",
+    ("scoring.py", "greedy_match"): "match",
+    ("scoring.py", "greedy_match_matrix"): "match",
+    ("scoring.py", "pooled_cosine_matrix"): "match",
+    ("profiler.py", None): "profiler",  # torch.profiler's own overhead (record_function enter/exit)
+}
+# Jobs whose torch trace goes into <id>.trace.json (traces grow quickly).
+_TRACE_JOBS = 10
+_TOP = 20
+_SESSION_ID = re.compile(r"^[0-9TZ-]+$")
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stage_of(frames: list) -> str:
+    for code in reversed(frames):  # innermost first
+        name = os.path.basename(code.co_filename)
+        stage = _STAGE_FRAMES.get((name, code.co_name)) or _STAGE_FRAMES.get((name, None))
+        if stage:
+            return stage
+    return "other"
+
+
+class ProfileSession:
+    def __init__(
+        self,
+        session_id: str,
+        out_dir: str,
+        *,
+        max_requests: int | None,
+        max_seconds: float,
+        interval_s: float,
+        torch_ops: bool,
+        on_finish: Callable[["ProfileSession"], None],
+    ) -> None:
+        self.id = session_id
+        self.out_dir = out_dir
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.interval_s = interval_s
+        self.torch_ops = torch_ops
+        self._on_finish = on_finish
+
+        self.started_at = time.time()
+        self.requests = 0
+        self.jobs = 0
+        self.reason: str | None = None
+        self.report: dict | None = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._running: set[int] = set()  # thread ids currently inside a job (sampled)
+        self._open_jobs = 0  # jobs not yet fully recorded
+        self._stacks: Counter[tuple] = Counter()
+        self._op_time: defaultdict[tuple[str, str], float] = defaultdict(float)  # (stage, op) -> self CPU µs
+        self._op_calls: Counter[tuple[str, str]] = Counter()
+        self._stage_time: defaultdict[str, float] = defaultdict(float)  # stage -> inclusive CPU µs
+        self._trace_events: list = []
+        self._thread = threading.Thread(target=self._sample, name="bert-profiler", daemon=True)
+
+    @property
+    def done(self) -> bool:
+        return self.report is not None
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, reason: str = "stopped") -> None:
+        with self._lock:
+            self.reason = self.reason or reason
+        self._stop.set()
+
+    def request_done(self) -> None:
+        """Request hook: ends the session once ``max_requests`` have completed."""
+        with self._lock:
+            self.requests += 1
+            reached = self.max_requests is not None and self.requests >= self.max_requests
+        if reached:
+            self.stop("requests")
+
+    # ------------------------------------------------------------------
+    # Per-job instrumentation (inference worker threads)
+    # ------------------------------------------------------------------
+    def run_job(self, job: Callable[[], T]) -> T:
+        """``InferencePool.job_wrapper``: run ``job`` under the sampler and the torch profiler."""
+        if self._stop.is_set():
+            return job()
+        with self._lock:
+            self._open_jobs += 1
+            self.jobs += 1
+            trace = self.jobs <= _TRACE_JOBS
+        try:
+            if not self.torch_ops:
+                return self._sampled(job)
+            from torch.profiler import ProfilerActivity, profile
+
+            with profile(activities=[ProfilerActivity.CPU]) as prof:
+                result = self._sampled(job)
+            self._collect_ops(prof, trace)
+            return result
+        finally:
+            with self._lock:
+                self._open_jobs -= 1
+                self._idle.notify_all()
+
+    def _sampled(self, job: Callable[[], T]) -> T:
+        # Only the job itself is sampled, not the profiler's own bookkeeping.
+        tid = threading.get_ident()
+        with self._lock:
+            self._running.add(tid)
+        try:
+            return job()
+        finally:
+            with self._lock:
+                self._running.discard(tid)
+
+    def _collect_ops(self, prof, trace: bool) -> None:
+        times: defaultdict[tuple[str, str], float] = defaultdict(float)
+        calls: Counter[tuple[str, str]] = Counter()
+        stages: defaultdict[str, float] = defaultdict(float)
+        for event in prof.events():
+            if event.name.startswith("stage:"):
+                stages[event.name[len("stage:"):]] += event.cpu_time_total
+                continue
+            parent, stage = event.cpu_parent, "other"
+            while parent is not None:
+                if parent.name.startswith("stage:"):
+                    stage = parent.name[len("stage:"):]
+                    break
+                parent = parent.cpu_parent
+            times[(stage, event.name)] += event.self_cpu_time_total
+            calls[(stage, event.name)] += 1
+        trace_events = []
+        if trace:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "trace.json")
+                prof.export_chrome_trace(path)
+                with open(path, encoding="utf-8") as f:
+                    trace_events = json.load(f).get("traceEvents", [])
+        with self._lock:
+            for key, value in times.items():
+                self._op_time[key] += value
+            self._op_calls.update(calls)
+            for stage, value in stages.items():
+                self._stage_time[stage] += value
+            self._trace_events.extend(trace_events)
+
+    # ------------------------------------------------------------------
+    # Sampler thread
+    # ------------------------------------------------------------------
+    def _sample(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval_s):
+            if time.monotonic() >= deadline:
+                self.stop("seconds")
+                break
+            with self._lock:
+                running = tuple(self._running)
+            if not running:
+                continue
+            frames = sys._current_frames()
+            for tid in running:
+                frame, stack = frames.get(tid), []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                if stack:
+                    self._stacks[tuple(reversed(stack))] += 1
+        # Let jobs that are still inside the torch profiler hand in their ops.
+        with self._lock:
+            self._idle.wait_for(lambda: not self._open_jobs, timeout=30)
+        try:
+            self.report = self._write()
+        finally:
+            self._on_finish(self)
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+    def _write(self) -> dict:
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, self.id)
+
+        stage_samples: Counter[str] = Counter()
+        self_samples: Counter[str] = Counter()
+        stage_frames: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+            for codes, count in self._stacks.most_common():
+                labels = [_frame_label(code) for code in codes]
+                stage = _stage_of(list(codes))
+                f.write(f"{';'.join(labels)} {count}\n")
+                stage_samples[stage] += count
+                self_samples[labels[-1]] += count
+                stage_frames[stage][labels[-1]] += count
+        total = sum(stage_samples.values())
+
+        files = {"collapsed": f"{base}.collapsed"}
+        if self._trace_events:
+            with open(f"{base}.trace.json", "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self._trace_events}, f)
+            files["trace"] = f"{base}.trace.json"
+
+        torch_ops = None
+        if self.torch_ops:
+            torch_ops = {}
+            for stage in sorted({stage for stage, _ in self._op_time} | set(self._stage_time)):
+                ops = sorted(
+                    ((op, us) for (s, op), us in self._op_time.items() if s == stage),
+                    key=lambda item: item[1],
+                    reverse=True,
+                )
+                torch_ops[stage] = {
+                    # Wall time inside the stage (CPU tensors: includes non-torch work such as the tokenizer).
+                    "stage_ms": round(self._stage_time.get(stage, 0.0) / 1000.0, 3),
+                    "self_cpu_ms": round(sum(us for _, us in ops) / 1000.0, 3),
+                    "top_ops": [
+                        {"op": op, "self_cpu_ms": round(us / 1000.0, 3), "calls": self._op_calls[(stage, op)]}
+                        for op, us in ops[:_TOP]
+                    ],
+                }
+
+        report = {
+            "id": self.id,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "duration_s": round(time.time() - self.started_at, 3),
+            "ended_by": self.reason,
+            "requests": self.requests,
+            "jobs": self.jobs,
+            "python": {
+                "interval_ms": round(self.interval_s * 1000.0, 3),
+                "samples": total,
+                "stages": {
+                    stage: {
+                        "samples": count,
+                        "share": round(count / total, 4),
+                        "top_frames": [
+                            {"frame": frame, "samples": n} for frame, n in stage_frames[stage].most_common(5)
+                        ],
+                    }
+                    for stage, count in stage_samples.most_common()
+                },
+                "top_frames": [
+                    {"frame": frame, "self_samples": n, "share": round(n / total, 4)}
+                    for frame, n in self_samples.most_common(_TOP)
+                ],
+            },
+            "torch_ops": torch_ops,
+            "files": files,
+        }
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def status(self) -> dict:
+        return self.report or {
+            "id": self.id,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "running_s": round(time.time() - self.started_at, 3),
+            "requests": self.requests,
+            "max_requests": self.max_requests,
+            "max_seconds": self.max_seconds,
+            "jobs": self.jobs,
+        }
+
+
+class Profiler:
+    """Starts sessions, wires them into the pool / scoring core and finds stored reports."""
+
+    def __init__(self, out_dir: str) -> None:
+        self.out_dir = out_dir
+        self.active: ProfileSession | None = None
+        self._lock = threading.Lock()
+        self._started = 0
+
+    def start(
+        self,
+        pool,
+        core,
+        *,
+        max_requests: int | None,
+        max_seconds: float,
+        interval_s: float,
+        torch_ops: bool,
+    ) -> ProfileSession:
+        def detach(session: ProfileSession) -> None:
+            pool.job_wrapper = None
+            core.profiling = False
+            with self._lock:
+                if self.active is session:
+                    self.active = None
+
+        with self._lock:
+            if self.active is not None:
+                raise RuntimeError(f"Profiling session {self.active.id} is already running.")
+            # Millisecond timestamp plus a per-process sequence number, so a
+            # session started right after a short one never reuses its files.
+            now = time.time()
+            self._started += 1
+            session_id = (
+                time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+                + f"{int(now * 1000) % 1000:03d}Z-{os.getpid()}-{self._started}"
+            )
+            session = ProfileSession(
+                session_id,
+                self.out_dir,
+                max_requests=max_requests,
+                max_seconds=max_seconds,
+                interval_s=interval_s,
+                torch_ops=torch_ops,
+                on_finish=detach,
+            )
+            self.active = session
+        core.profiling = torch_ops
+        pool.job_wrapper = session.run_job
+        session.start()
+        return session
+
+    def sessions(self) -> list[str]:
+        if not os.path.isdir(self.out_dir):
+            return []
+        return sorted(name[: -len(".json")] for name in os.listdir(self.out_dir)
+                      if name.endswith(".json") and not name.endswith(".trace.json"))
+
+    def path(self, session_id: str, suffix: str) -> str | None:
+        """Stored ``<id><suffix>`` file, or None (ids are validated, no path traversal)."""
+        if not _SESSION_ID.match(session_id):
+            return None
+        path = os.path.join(self.out_dir, session_id + suffix)
+        return path if os.path.exists(path) else None
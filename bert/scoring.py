@@ -0,0 +1,546 @@
+"""
+BERTScore scoring core.
+
+Splits ``BERTScorer.score`` into steps that can be reused independently:
+
+1. ``tokenize`` — one batched tokenizer pass per request that truncates at the
+   ID level. The IDs are never decoded back to text and re-tokenized, so
+   nothing is normalised away and every text is tokenized exactly once.
+2. ``encode`` — feed those IDs through the layer-truncated PhoBERT and keep the
+   L2-normalised token embeddings plus their IDF weights (``EncodedText``).
+3. ``greedy_match`` — the cosine greedy matching that turns two encoded texts
+   into precision / recall / F1.
+
+Encoded references are kept in an ``EmbeddingCache`` so an article that is
+scored repeatedly is only pushed through the model once; afterwards a score
+costs one candidate encoding plus a single matmul. The numbers are identical
+to ``BERTScorer.score`` with ``idf=False`` (uniform weights, [CLS]/[SEP]
+weighted 0).
+
+``embed`` mean-pools the same token embeddings into one vector per text for
+near-duplicate lookups (see ``vector_index.py``). ``sentence_matrix`` encodes
+every sentence of a reference and a candidate once, in one batch, and returns
+the BERTScore of every sentence pair (``greedy_match_matrix``) plus pooled
+cosines, for alignment and fact-check grounding.
+
+With a ``WordSegmenter`` (``BERT_WORD_SEGMENT=true``) texts are word-segmented
+after normalisation, before tokenization, and cache keys are kept apart from
+unsegmented ones.
+
+In long-document mode the reference is not truncated to 256 tokens. It is
+split into overlapping 256-token windows that are encoded as one batch, and
+the per-token embeddings are stitched back into a single sequence. Inside an
+overlap each token comes from the window where it sits furthest from the
+edge. Greedy matching then covers the whole article, and cost grows linearly
+with its length.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import unicodedata
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
+
+import torch
+
+from embedding_cache import EmbeddingCache, cache_key
+from word_segment import split_sentences
+
+if TYPE_CHECKING:
+    from metrics import ServiceMetrics
+    from word_segment import WordSegmenter
+
+logger = logging.getLogger("bert_service")
+
+
+@dataclass(frozen=True)
+class EncodedText:
+    embeddings: torch.Tensor  # (seq_len, hidden), L2-normalised
+    idf: torch.Tensor  # (seq_len,)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.embeddings.element_size() * self.embeddings.nelement()
+            + self.idf.element_size() * self.idf.nelement()
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        # Only [CLS] and [SEP] — bert_score treats these as empty sentences.
+        return self.embeddings.size(0) <= 2
+
+
+@dataclass(frozen=True)
+class LongDocumentInfo:
+    reference_tokens: int  # PhoBERT tokens in the full reference (no special tokens)
+    windows: tuple[tuple[int, int], ...]  # [start, end) token span of every encoded window
+    truncated: bool  # True when max_windows cut the reference short
+    encode_ms: float
+    cached: bool = False
+
+
+@dataclass(frozen=True)
+class LongReference:
+    encoded: EncodedText
+    info: LongDocumentInfo
+
+    @property
+    def nbytes(self) -> int:
+        return self.encoded.nbytes
+
+
+@dataclass(frozen=True)
+class Score:
+    precision: float
+    recall: float
+    f1: float
+    long_document: LongDocumentInfo | None = None
+
+
+@dataclass(frozen=True)
+class SentenceMatrix:
+    reference_sentences: list[str]
+    candidate_sentences: list[str]
+    # (candidate sentences, reference sentences); entry [j, i] is the BERTScore
+    # of candidate sentence j against reference sentence i.
+    precision: torch.Tensor
+    recall: torch.Tensor
+    f1: torch.Tensor
+    cosine: torch.Tensor  # between mean-pooled sentence vectors
+
+
+def normalize_text(text: str) -> str:
+    """NFC-normalise (PhoBERT's vocabulary is precomposed) and collapse whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def greedy_match(ref: EncodedText, cand: EncodedText) -> Score:
+    """Cosine greedy matching between two encoded texts, as in ``bert_score.utils.greedy_cos_idf``."""
+    if ref.is_empty or cand.is_empty:
+        return Score(0.0, 0.0, 0.0)
+
+    sim = cand.embeddings @ ref.embeddings.T  # (cand_len, ref_len)
+    word_precision = sim.max(dim=1).values
+    word_recall = sim.max(dim=0).values
+
+    p = float((word_precision * cand.idf).sum() / cand.idf.sum())
+    r = float((word_recall * ref.idf).sum() / ref.idf.sum())
+    f = 2 * p * r / (p + r) if (p + r) != 0 else 0.0
+    return Score(p, r, f)
+
+
+def mean_pool(enc: EncodedText) -> torch.Tensor:
+    """L2-normalised mean of the token embeddings, [CLS]/[SEP] excluded (zeros for an empty text)."""
+    tokens = enc.embeddings[1:-1]
+    if not tokens.size(0):
+        return torch.zeros(enc.embeddings.size(1))
+    pooled = tokens.mean(dim=0)
+    return pooled / pooled.norm().clamp_min(1e-12)
+
+
+def pooled_cosine_matrix(refs: list[EncodedText], cands: list[EncodedText]) -> torch.Tensor:
+    """(cands, refs) cosine similarity of the mean-pooled sentence vectors."""
+    return torch.stack([mean_pool(e) for e in cands]) @ torch.stack([mean_pool(e) for e in refs]).T
+
+
+def greedy_match_matrix(
+    refs: list[EncodedText], cands: list[EncodedText]
+) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    ``greedy_match`` for every (cands[j], refs[i]) pair at once: one similarity
+    matmul over all tokens, then per-sentence max / weighted mean. Returns
+    precision, recall and F1 matrices of shape (len(cands), len(refs)).
+    """
+    ref_spans = _spans([r.embeddings.size(0) for r in refs])
+    cand_spans = _spans([c.embeddings.size(0) for c in cands])
+    ref_idf = torch.cat([r.idf for r in refs])
+    cand_idf = torch.cat([c.idf for c in cands])
+    sim = torch.cat([c.embeddings for c in cands]) @ torch.cat([r.embeddings for r in refs]).T
+
+    # Best match of every candidate token within each reference sentence, and vice versa.
+    best_in_ref = torch.stack([sim[:, a:b].max(dim=1).values for a, b in ref_spans], dim=1)
+    best_in_cand = torch.stack([sim[a:b].max(dim=0).values for a, b in cand_spans])
+    precision = torch.stack([
+        (best_in_ref[a:b] * cand_idf[a:b, None]).sum(dim=0) / cand_idf[a:b].sum().clamp_min(1e-12)
+        for a, b in cand_spans
+    ])
+    recall = torch.stack([
+        (best_in_cand[:, a:b] * ref_idf[a:b]).sum(dim=1) / ref_idf[a:b].sum().clamp_min(1e-12)
+        for a, b in ref_spans
+    ], dim=1)
+    f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    # Same convention as greedy_match: a pair with an empty side scores 0.
+    empty = torch.tensor([c.is_empty for c in cands])[:, None] | torch.tensor([r.is_empty for r in refs])[None, :]
+    return (
+        precision.masked_fill(empty, 0.0),
+        recall.masked_fill(empty, 0.0),
+        f1.masked_fill(empty, 0.0),
+    )
+
+
+def _spans(lengths: list[int]) -> list[tuple[int, int]]:
+    spans, start = [], 0
+    for n in lengths:
+        spans.append((start, start + n))
+        start += n
+    return spans
+
+
+def plan_windows(
+    num_tokens: int, window: int, overlap: int, max_windows: int
+) -> list[tuple[int, int]]:
+    """
+    Split ``num_tokens`` tokens into ``[start, end)`` windows of at most ``window``
+    tokens, consecutive windows sharing ``overlap`` tokens. The last window is
+    shifted back to full width so it keeps as much left context as the others.
+    At most ``max_windows`` windows are returned.
+    """
+    if num_tokens <= window:
+        return [(0, num_tokens)]
+    stride = max(1, window - overlap)
+    spans: list[tuple[int, int]] = []
+    start = 0
+    while len(spans) < max_windows:
+        end = min(start + window, num_tokens)
+        spans.append((start, end))
+        if end >= num_tokens:
+            break
+        start += stride
+    last_start, last_end = spans[-1]
+    if len(spans) > 1 and last_end == num_tokens and last_end - last_start < window:
+        spans[-1] = (num_tokens - window, num_tokens)
+    return spans
+
+
+def _ownership_bounds(spans: list[tuple[int, int]]) -> list[int]:
+    """
+    Boundaries ``b`` such that window ``k`` contributes tokens ``[b[k], b[k+1])``:
+    each overlap is split at its midpoint so every token is taken exactly once,
+    from the window in which it has the most surrounding context.
+    """
+    bounds = [spans[0][0]]
+    for (_, prev_end), (start, _) in zip(spans, spans[1:]):
+        bounds.append((start + prev_end) // 2)
+    bounds.append(spans[-1][1])
+    return bounds
+
+
+class ScoringCore:
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        *,
+        model_name: str,
+        num_layers: int,
+        max_len: int,
+        batch_size: int,
+        reference_cache: EmbeddingCache,
+        long_doc_overlap: int = 64,
+        long_doc_max_windows: int = 64,
+        device: str = "cpu",
+        backend: str = "torch",
+        metrics: ServiceMetrics | None = None,
+        segmenter: WordSegmenter | None = None,
+    ) -> None:
+        self.model_name = model_name
+        self.backend = backend
+        self.num_layers = num_layers
+        self.max_len = max_len
+        self.batch_size = batch_size
+        self.reference_cache = reference_cache
+        self.long_doc_overlap = long_doc_overlap
+        self.long_doc_max_windows = long_doc_max_windows
+        self.metrics = metrics
+        self.segmenter = segmenter
+        # Set during a profiling session: stages are labelled for torch.profiler.
+        self.profiling = False
+
+        # ``model`` is the layer-truncated encoder, or any runtime with the same
+        # call signature (see onnx_backend.OnnxEncoder).
+        self._model = model
+        self._tokenizer = tokenizer
+        self._device = device
+
+        # Embeddings from different backends differ slightly, so they never share cache entries.
+        self._cache_model = model_name if backend == "torch" else f"{model_name}+{backend}"
+        if segmenter is not None:
+            self._cache_model += "+wseg"
+
+        # Same weights BERTScorer.score uses when idf=False.
+        self._idf_dict: defaultdict[int, float] = defaultdict(lambda: 1.0)
+        self._idf_dict[self._tokenizer.sep_token_id] = 0
+        self._idf_dict[self._tokenizer.cls_token_id] = 0
+
+    @property
+    def embedding_space(self) -> str:
+        """Model (and segmentation) that ``embed`` vectors are comparable within; backends are interchangeable."""
+        return f"{self.model_name}+wseg" if self.segmenter is not None else self.model_name
+
+    # ------------------------------------------------------------------
+    # Tokenization
+    # ------------------------------------------------------------------
+    def prepare(self, texts: list[str]) -> list[str]:
+        """Normalise ``texts`` and, with a segmenter, word-segment them (stage ``segment``)."""
+        normalized = [normalize_text(t) for t in texts]
+        if self.segmenter is None:
+            return normalized
+        with self._stage("segment"):
+            return self.segmenter.segment_batch(normalized)
+
+    def tokenize(self, texts: list[str], roles: list[str] | None = None) -> list[list[int]]:
+        """
+        Normalise (and segment) and tokenize ``texts`` in one batched call,
+        truncating to ``max_len`` IDs (special tokens included) so nothing can
+        overflow the position embeddings. ``roles`` labels each text for the
+        token-length metrics.
+        """
+        if not texts:
+            return []
+        full = self._tokenizer(
+            self.prepare(texts),
+            add_special_tokens=True,
+            verbose=False,
+        )["input_ids"]
+        if self.metrics is not None and roles is not None:
+            for ids, role in zip(full, roles):
+                self.metrics.observe_tokens(role, len(ids), len(ids) > self.max_len)
+        # Same IDs as truncation=True: cut the content, keep the closing [SEP].
+        return [ids if len(ids) <= self.max_len else ids[: self.max_len - 1] + ids[-1:] for ids in full]
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+    def _encoded(self, ids: list[int], embeddings: torch.Tensor) -> EncodedText:
+        idf = torch.tensor([self._idf_dict[i] for i in ids], dtype=torch.float)
+        return EncodedText(embeddings=embeddings.clone(), idf=idf)
+
+    def encode(self, sequences: list[list[int]]) -> list[EncodedText]:
+        """Encode token-ID sequences in padded batches, longest first to minimise padding."""
+        order = sorted(range(len(sequences)), key=lambda i: len(sequences[i]), reverse=True)
+        encoded: list[EncodedText | None] = [None] * len(sequences)
+
+        for start in range(0, len(order), self.batch_size):
+            chunk = order[start : start + self.batch_size]
+            embs = self._forward([sequences[i] for i in chunk])
+            for i, emb in zip(chunk, embs):
+                encoded[i] = self._encoded(sequences[i], emb)
+        return encoded  # type: ignore[return-value]
+
+    def _forward(self, sequences: list[list[int]]) -> list[torch.Tensor]:
+        """
+        Run token-ID sequences (special tokens included) through the model as
+        one padded batch; returns un-padded, L2-normalised embeddings.
+        """
+        lengths = [len(seq) for seq in sequences]
+        ids = torch.full(
+            (len(sequences), max(lengths)), self._tokenizer.pad_token_id, dtype=torch.long
+        )
+        mask = torch.zeros_like(ids)
+        for row, seq in enumerate(sequences):
+            ids[row, : len(seq)] = torch.tensor(seq, dtype=torch.long)
+            mask[row, : len(seq)] = 1
+        out = self._model(ids.to(self._device), attention_mask=mask.to(self._device))[0].cpu()
+        out = out / out.norm(dim=-1, keepdim=True)
+        return [out[row, :length] for row, length in enumerate(lengths)]
+
+    def encode_long(self, text: str) -> LongReference:
+        """Encode a prepared (normalised / segmented) reference of any length through overlapping windows."""
+        started = time.perf_counter()
+        cls_id = self._tokenizer.cls_token_id
+        sep_id = self._tokenizer.sep_token_id
+        ids = (
+            self._tokenizer.encode(text, add_special_tokens=False, verbose=False)
+            if text
+            else []
+        )
+
+        spans = plan_windows(
+            len(ids), self.max_len - 2, self.long_doc_overlap, self.long_doc_max_windows
+        )
+        sequences = [[cls_id, *ids[start:end], sep_id] for start, end in spans]
+        window_embs: list[torch.Tensor] = []
+        for start in range(0, len(sequences), self.batch_size):
+            window_embs.extend(self._forward(sequences[start : start + self.batch_size]))
+
+        bounds = _ownership_bounds(spans)
+        pieces = [window_embs[0][:1]]  # [CLS]
+        for k, (start, _) in enumerate(spans):
+            pieces.append(window_embs[k][bounds[k] - start + 1 : bounds[k + 1] - start + 1])
+        pieces.append(window_embs[-1][-1:])  # [SEP]
+
+        covered = ids[: spans[-1][1]]
+        idf = torch.tensor(
+            [self._idf_dict[cls_id], *(self._idf_dict[i] for i in covered), self._idf_dict[sep_id]],
+            dtype=torch.float,
+        )
+        truncated = spans[-1][1] < len(ids)
+        if truncated:
+            logger.warning(
+                f"Long-document reference of {len(ids)} tokens cut to {spans[-1][1]} "
+                f"(BERT_LONG_DOC_MAX_WINDOWS={self.long_doc_max_windows})."
+            )
+        return LongReference(
+            encoded=EncodedText(embeddings=torch.cat(pieces), idf=idf),
+            info=LongDocumentInfo(
+                reference_tokens=len(ids),
+                windows=tuple(spans),
+                truncated=truncated,
+                encode_ms=round((time.perf_counter() - started) * 1000.0, 3),
+            ),
+        )
+
+    def encode_long_references(self, texts: list[str]) -> list[LongReference]:
+        """Long-document counterpart of ``encode_references`` (prepared texts)."""
+        variant = f"long:{self.long_doc_overlap}:{self.long_doc_max_windows}"
+        result: dict[str, LongReference] = {}
+        for text in dict.fromkeys(texts):
+            key = cache_key(self._cache_model, self.num_layers, self.max_len, text, variant)
+            hit = self.reference_cache.get(key)
+            if hit is not None:
+                result[text] = LongReference(
+                    encoded=hit.encoded,
+                    info=LongDocumentInfo(**{**hit.info.__dict__, "cached": True}),
+                )
+            else:
+                result[text] = self.encode_long(text)
+                self.reference_cache.put(key, result[text])
+        return [result[t] for t in texts]
+
+    def encode_references(self, sequences: list[list[int]]) -> list[EncodedText]:
+        """Encode reference ID sequences, serving repeats from the cache."""
+        keys = [
+            cache_key(self._cache_model, self.num_layers, self.max_len, " ".join(map(str, ids)))
+            for ids in sequences
+        ]
+        found: dict[str, EncodedText] = {}
+        missing: dict[str, list[int]] = {}
+        for key, ids in zip(keys, sequences):
+            if key in found or key in missing:
+                continue
+            hit = self.reference_cache.get(key)
+            if hit is not None:
+                found[key] = hit
+            else:
+                missing[key] = ids
+
+        if missing:
+            for key, enc in zip(missing, self.encode(list(missing.values()))):
+                self.reference_cache.put(key, enc)
+                found[key] = enc
+        return [found[key] for key in keys]
+
+    @torch.no_grad()
+    def embed(self, texts: list[str]) -> torch.Tensor:
+        """
+        One L2-normalised vector per text: the mean of its token embeddings
+        ([CLS]/[SEP] excluded) over the first ``max_len`` tokens. Goes through
+        the reference cache, so embedding an article also warms it for scoring.
+        """
+        if not texts:
+            return torch.empty(0, 0)
+        with self._stage("tokenize"):
+            ids = self.tokenize(texts)
+        with self._stage("forward"):
+            encoded = self.encode_references(ids)
+        return torch.stack([mean_pool(enc) for enc in encoded])
+
+    @torch.no_grad()
+    def sentence_matrix(self, reference: str, candidate: str, max_sentences: int = 256) -> SentenceMatrix:
+        """
+        Split both texts into sentences, tokenize and encode every distinct
+        sentence once (one batched pass) and score every candidate sentence
+        against every reference sentence. Each F1 equals ``score_pairs`` on
+        that sentence pair. Raises ``ValueError`` beyond ``max_sentences``.
+        """
+        refs = split_sentences(normalize_text(reference))
+        cands = split_sentences(normalize_text(candidate))
+        if len(refs) + len(cands) > max_sentences:
+            raise ValueError(f"{len(refs) + len(cands)} sentences; at most {max_sentences} are accepted.")
+        if not refs or not cands:
+            zeros = torch.zeros(len(cands), len(refs))
+            return SentenceMatrix(refs, cands, zeros, zeros, zeros, zeros)
+
+        unique = list(dict.fromkeys(refs + cands))
+        with self._stage("tokenize"):
+            ids = self.tokenize(unique, ["sentence"] * len(unique))
+        with self._stage("forward"):
+            encoded = dict(zip(unique, self.encode(ids)))
+        with self._stage("match"):
+            ref_enc = [encoded[s] for s in refs]
+            cand_enc = [encoded[s] for s in cands]
+            precision, recall, f1 = greedy_match_matrix(ref_enc, cand_enc)
+            cosine = pooled_cosine_matrix(ref_enc, cand_enc)
+        return SentenceMatrix(refs, cands, precision, recall, f1, cosine)
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        with torch.profiler.record_function(f"stage:{name}") if self.profiling else nullcontext():
+            if self.metrics is None:
+                yield
+                return
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.metrics.observe_stage(name, time.perf_counter() - started)
+
+    @torch.no_grad()
+    def score_pairs(
+        self, refs: list[str], cands: list[str], long_document: bool = False
+    ) -> list[Score]:
+        """
+        Score ``cands[i]`` against ``refs[i]`` for every i. With
+        ``long_document`` the references are encoded in full through sliding
+        windows instead of being truncated to ``max_len`` tokens.
+        """
+        if not cands:
+            return []
+
+        unique_refs = list(dict.fromkeys(refs))
+        unique_cands = list(dict.fromkeys(cands))
+
+        # Word segmentation (if enabled) is also reported on its own as "segment";
+        # window tokenization of long references is counted under "forward".
+        with self._stage("tokenize"):
+            if long_document:
+                cand_ids = self.tokenize(unique_cands, ["candidate"] * len(unique_cands))
+            else:
+                # One tokenizer pass for every distinct text in the request.
+                ids = self.tokenize(
+                    unique_refs + unique_cands,
+                    ["reference"] * len(unique_refs) + ["candidate"] * len(unique_cands),
+                )
+                ref_ids, cand_ids = ids[: len(unique_refs)], ids[len(unique_refs) :]
+
+        with self._stage("forward"):
+            if long_document:
+                long_refs = self.encode_long_references(self.prepare(unique_refs))
+                ref_by_text = {r: lr.encoded for r, lr in zip(unique_refs, long_refs)}
+                info_by_text = {r: lr.info for r, lr in zip(unique_refs, long_refs)}
+            else:
+                ref_by_text = dict(zip(unique_refs, self.encode_references(ref_ids)))
+                info_by_text = {}
+            cand_by_text = dict(zip(unique_cands, self.encode(cand_ids)))
+
+        if long_document and self.metrics is not None:
+            for lr in long_refs:
+                self.metrics.observe_tokens("reference", lr.info.reference_tokens + 2, lr.info.truncated)
+
+        with self._stage("match"):
+            scores = []
+            for r, c in zip(refs, cands):
+                s = greedy_match(ref_by_text[r], cand_by_text[c])
+                scores.append(Score(s.precision, s.recall, s.f1, long_document=info_by_text.get(r)))
+        if self.metrics is not None:
+            self.metrics.pairs.inc(len(scores))
+        return scores
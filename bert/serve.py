@@ -0,0 +1,68 @@
+"""
+Multi-process launcher for the BERT service.
+
+``uvicorn main:app --workers N`` used to mean N private copies of PhoBERT. With
+the pre-sliced checkpoint (see ``checkpoint.py``) each worker instead
+memory-maps the same ``model.pt`` read-only: the weights live once in the OS
+page cache and every worker process shares those pages. Intra-op threads are
+split between workers (``main._intra_op_threads``) so N workers together use
+the cores one worker used to, but run N forward passes at a time.
+
+This script makes sure the shared artifacts exist *before* the workers start,
+so they don't all download / export them at once, then hands over to uvicorn:
+
+    BERT_WORKERS=4 python serve.py
+
+The ONNX backends keep a private copy of the graph per worker (ONNX Runtime
+does not map initializers from disk), so there the checkpoint only speeds up
+startup.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+
+import uvicorn
+
+# Cheap to import: the ML stack is only loaded inside the app's lifespan.
+from main import BACKEND, CHECKPOINT_DIR, MODEL_NAME, NUM_LAYERS, ONNX_DIR
+
+logger = logging.getLogger("bert_service")
+
+
+def prepare_shared_artifacts() -> None:
+    """Build the checkpoint (and ONNX graph) once in the parent process if missing."""
+    from checkpoint import checkpoint_matches, load_checkpoint, save_checkpoint
+
+    if not checkpoint_matches(CHECKPOINT_DIR, MODEL_NAME, NUM_LAYERS):
+        logger.info(f"Building shared checkpoint in {CHECKPOINT_DIR!r} …")
+        save_checkpoint(MODEL_NAME, NUM_LAYERS, CHECKPOINT_DIR)
+
+    if BACKEND != "torch":
+        from onnx_backend import load_encoder
+
+        model, tokenizer = load_checkpoint(CHECKPOINT_DIR)
+        load_encoder(
+            BACKEND,
+            model,
+            model_name=MODEL_NAME,
+            num_layers=NUM_LAYERS,
+            onnx_dir=ONNX_DIR,
+            pad_token_id=tokenizer.pad_token_id,
+        )
+
+
+def serve() -> None:
+    workers = max(1, int(os.environ.get("BERT_WORKERS", "1")))
+    port = int(os.environ.get("PORT", 7860))
+    host = os.environ.get("HOST", "0.0.0.0")
+
+    if workers > 1:
+        prepare_shared_artifacts()
+    logger.info(f"Starting {workers} worker process(es) on {host}:{port}.")
+    uvicorn.run("main:app", host=host, port=port, workers=workers)
+
+
+if __name__ == "__main__":
+    serve()
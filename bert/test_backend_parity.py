@@ -0,0 +1,146 @@
+"""
+Parity between the torch backend and the ONNX Runtime backends.
+
+The articles behind ``metrics_reports/dataset`` are only stored as URLs, so
+the pairs come from ``BERT_PARITY_ARTICLES`` when set — a JSONL file with one
+``{"reference": <article text>, "candidate": <summary>}`` object per line —
+and otherwise from the Vietnamese summaries in
+``fusion_reports/results/moa-*.json`` (fused summary as reference, each forced
+single-model summary as candidate).
+
+Run with ``-s`` to see the latency comparison.
+"""
+
+import glob
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from bert_score import BERTScorer
+
+from embedding_cache import EmbeddingCache
+from onnx_backend import load_encoder
+from scoring import ScoringCore
+
+MODEL_NAME = os.environ.get("BERT_MODEL", "vinai/phobert-base")
+NUM_LAYERS = 9
+MAX_PAIRS = int(os.environ.get("BERT_PARITY_MAX_PAIRS", "64"))
+
+# fp32 ONNX should agree with torch up to float rounding; int8 weights move
+# individual scores a little but must not shift the ranking of summaries.
+FP32_MAX_DELTA = 1e-3
+INT8_MEAN_DELTA = 0.02
+INT8_MAX_DELTA = 0.08
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _load_pairs() -> list[tuple[str, str]]:
+    path = os.environ.get("BERT_PARITY_ARTICLES")
+    pairs: list[tuple[str, str]] = []
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    pairs.append((row["reference"], row["candidate"]))
+    else:
+        for report in sorted(glob.glob(str(REPO_ROOT / "fusion_reports/results/moa-*.json"))):
+            with open(report, encoding="utf-8") as f:
+                records = json.load(f).get("records", [])
+            for record in records:
+                reference = (record.get("fusion") or {}).get("fused_summary")
+                for forced in record.get("forced", []):
+                    if reference and forced.get("summary"):
+                        pairs.append((reference, forced["summary"]))
+    if not pairs:
+        pytest.skip("No parity texts available.")
+    return pairs[:MAX_PAIRS]
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    return BERTScorer(
+        model_type=MODEL_NAME,
+        lang="vi",
+        num_layers=NUM_LAYERS,
+        device="cpu",
+        rescale_with_baseline=False,
+        use_fast_tokenizer=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def pairs():
+    return _load_pairs()
+
+
+def _core(scorer, backend: str, onnx_dir: Path) -> ScoringCore:
+    encoder = load_encoder(
+        backend,
+        scorer._model,
+        model_name=MODEL_NAME,
+        num_layers=NUM_LAYERS,
+        onnx_dir=str(onnx_dir),
+        pad_token_id=scorer._tokenizer.pad_token_id,
+    )
+    return ScoringCore(
+        encoder,
+        scorer._tokenizer,
+        model_name=MODEL_NAME,
+        num_layers=NUM_LAYERS,
+        max_len=256,
+        batch_size=16,
+        reference_cache=EmbeddingCache(0),  # time the encoder, not the cache
+        backend=backend,
+    )
+
+
+def _timed_f1(core: ScoringCore, pairs) -> tuple[list[float], float]:
+    refs = [r for r, _ in pairs]
+    cands = [c for _, c in pairs]
+    core.score_pairs(refs[:2], cands[:2])  # warm-up
+    started = time.perf_counter()
+    scores = core.score_pairs(refs, cands)
+    return [s.f1 for s in scores], time.perf_counter() - started
+
+
+@pytest.mark.parametrize(
+    "backend, mean_tol, max_tol",
+    [
+        ("onnx", FP32_MAX_DELTA, FP32_MAX_DELTA),
+        ("onnx-int8", INT8_MEAN_DELTA, INT8_MAX_DELTA),
+    ],
+)
+def test_f1_matches_torch(scorer, pairs, tmp_path_factory, backend, mean_tol, max_tol):
+    onnx_dir = tmp_path_factory.getbasetemp() / "onnx"
+    torch_f1, torch_s = _timed_f1(_core(scorer, "torch", onnx_dir), pairs)
+    onnx_f1, onnx_s = _timed_f1(_core(scorer, backend, onnx_dir), pairs)
+
+    deltas = [abs(a - b) for a, b in zip(torch_f1, onnx_f1)]
+    mean_delta = sum(deltas) / len(deltas)
+    print(
+        f"\n{backend}: {len(pairs)} pairs, mean |ΔF1|={mean_delta:.2e}, "
+        f"max |ΔF1|={max(deltas):.2e}, torch {torch_s * 1000:.0f} ms, "
+        f"{backend} {onnx_s * 1000:.0f} ms ({torch_s / onnx_s:.2f}x)"
+    )
+    assert mean_delta <= mean_tol
+    assert max(deltas) <= max_tol
+
+
+def test_unknown_backend_is_rejected(scorer):
+    with pytest.raises(ValueError):
+        load_encoder(
+            "tensorrt",
+            scorer._model,
+            model_name=MODEL_NAME,
+            num_layers=NUM_LAYERS,
+            onnx_dir="unused",
+            pad_token_id=scorer._tokenizer.pad_token_id,
+        )
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from batch_score import Articles, iter_records, load_done
+from report_stream import iter_report  # on sys.path via batch_score
+
+
+def test_records_from_jsonl_and_reports(tmp_path):
+    pairs = tmp_path / "pairs.jsonl"
+    pairs.write_text(
+        json.dumps({"url": "u1", "model": "m", "reference": "bài báo", "candidate": "tóm tắt"}) + "\n\n"
+        + json.dumps({"url": "u2", "candidate_text": "tóm tắt 2"}) + "\n",
+        encoding="utf-8",
+    )
+    report = tmp_path / "moa.json"
+    report.write_text(json.dumps({"records": [{
+        "index": 1,
+        "url": "u2",
+        "forced": [{"model": "gpt-4o-mini", "summary": "bản tóm tắt"}, {"model": "x", "summary": None}],
+        "fusion": {"aggregator_model": "gpt-4o", "fused_summary": "bản hợp nhất"},
+    }]}), encoding="utf-8")
+    articles = tmp_path / "articles.jsonl"
+    articles.write_text(json.dumps({"url": "u2", "reference": "bài báo 2"}) + "\n", encoding="utf-8")
+
+    records = list(iter_records([str(pairs), str(report)], Articles(str(articles))))
+    assert [r["key"] for r in records] == [
+        "pairs.jsonl:1", "pairs.jsonl:3", "moa.json:1:fusion", "moa.json:1:forced:gpt-4o-mini",
+    ]
+    assert records[0] == {"key": "pairs.jsonl:1", "url": "u1", "model": "m", "reference": "bài báo",
+                          "candidate": "tóm tắt"}
+    assert all(r["reference"] == "bài báo 2" for r in records[1:])
+    assert records[2]["model"] == "gpt-4o" and records[3]["mode"] == "forced"
+
+
+def test_checkpoint_drops_partial_line(tmp_path):
+    out = tmp_path / "scores.jsonl"
+    out.write_text('{"key": "a", "f1_score": 0.5}\n{"key": "b", "f1', encoding="utf-8")
+    assert load_done(str(out)) == {"a"}
+    assert out.read_text(encoding="utf-8") == '{"key": "a", "f1_score": 0.5}\n'
+    assert load_done(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_report_records_are_decoded_one_at_a_time(tmp_path):
+    report = {"proposers": ["a"], "records": [{"index": 1, "n": 12345}, {"index": 2, "s": "tóm tắt, [x]"}],
+              "statistics": {"p": 0.5}}
+    path = tmp_path / "r.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    for chunk_size in (1, 3, 1 << 16):
+        events = list(iter_report(str(path), chunk_size=chunk_size))
+        assert [v for e, _, v in events if e == "record"] == report["records"]
+        assert {k: v for e, k, v in events if e == "field"} == {"proposers": ["a"], "statistics": {"p": 0.5}}
+    (tmp_path / "empty.json").write_text('{"records": []}', encoding="utf-8")
+    assert list(iter_report(str(tmp_path / "empty.json"))) == []
+    (tmp_path / "torn.json").write_text('{"records": [{"index": 1}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_report(str(tmp_path / "torn.json")))
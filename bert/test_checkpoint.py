@@ -0,0 +1,25 @@
+import os
+
+import torch
+
+from checkpoint import checkpoint_matches, load_checkpoint, load_from_hub, save_checkpoint
+
+MODEL_NAME = os.environ.get("BERT_MODEL", "vinai/phobert-base")
+NUM_LAYERS = 9
+
+
+def test_checkpoint_round_trip(tmp_path):
+    save_checkpoint(MODEL_NAME, NUM_LAYERS, tmp_path)
+    assert checkpoint_matches(tmp_path, MODEL_NAME, NUM_LAYERS)
+    assert not checkpoint_matches(tmp_path, MODEL_NAME, NUM_LAYERS + 1)
+
+    model, tokenizer = load_checkpoint(tmp_path)
+    reference, _ = load_from_hub(MODEL_NAME, NUM_LAYERS)
+    assert len(model.encoder.layer) == NUM_LAYERS
+
+    ids = torch.tensor([tokenizer("Sinh viên tham gia hiến máu.")["input_ids"]])
+    mask = torch.ones_like(ids)
+    with torch.no_grad():
+        expected = reference(ids, attention_mask=mask)[0]
+        actual = model(ids, attention_mask=mask)[0]
+    assert torch.equal(expected, actual)
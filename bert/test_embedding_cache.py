@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+from embedding_cache import EmbeddingCache, cache_key
+
+
+@dataclass
+class Blob:
+    nbytes: int
+
+
+def test_lru_eviction_by_bytes():
+    cache = EmbeddingCache(max_bytes=100)
+    cache.put("a", Blob(40))
+    cache.put("b", Blob(40))
+    assert cache.get("a") is not None  # "a" is now most recently used
+    cache.put("c", Blob(40))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 80
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_oversized_entry_is_not_cached():
+    cache = EmbeddingCache(max_bytes=10)
+    cache.put("big", Blob(11))
+    assert len(cache) == 0
+
+
+def test_key_depends_on_model_layer_and_text():
+    base = cache_key("vinai/phobert-base", 9, 256, "xin chào")
+    assert base == cache_key("vinai/phobert-base", 9, 256, "xin chào")
+    assert base != cache_key("vinai/phobert-base", 8, 256, "xin chào")
+    assert base != cache_key("vinai/phobert-large", 9, 256, "xin chào")
+    assert base != cache_key("vinai/phobert-base", 9, 256, "xin chao")
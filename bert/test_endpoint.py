@@ -1,4 +1,9 @@
+import tempfile
+import time
+
 from fastapi.testclient import TestClient
+
+import main
 from main import app
 
 client = TestClient(app)
@@ -20,5 +25,193 @@ def test_long_input():
         assert "f1_score" in data, "Response JSON missing f1_score"
         print("Success! F1 Score:", data["f1_score"])
 
+def test_batch_matches_single():
+    reference = "thử nghiệm " * 300
+    candidates = ["thử nghiệm ngắn", "một câu hoàn toàn khác"]
+
+    with client:
+        batch = client.post("/calculate-score-batch", json={
+            "reference_text": reference,
+            "candidate_texts": candidates,
+        })
+        assert batch.status_code == 200, f"Expected 200 OK, got {batch.status_code}: {batch.text}"
+        scores = batch.json()["scores"]
+        assert len(scores) == len(candidates)
+
+        for candidate, score in zip(candidates, scores):
+            single = client.post("/calculate-score", json={
+                "reference_text": reference,
+                "candidate_text": candidate,
+            }).json()
+            assert abs(single["f1_score"] - score["f1_score"]) < 1e-4
+        print("Success! Batch scores:", scores)
+
+def test_long_document_covers_whole_reference():
+    reference = "ngày hội hiến máu chủ nhật đỏ thu hút đông đảo sinh viên " * 80
+    short_reference = "ngày hội hiến máu chủ nhật đỏ"
+    candidate = "sinh viên tham gia hiến máu"
+
+    with client:
+        response = client.post("/calculate-score", json={
+            "reference_text": reference,
+            "candidate_text": candidate,
+            "long_document": True,
+        })
+        assert response.status_code == 200, response.text
+        info = response.json()["long_document"]
+        assert len(info["windows"]) > 1
+        assert info["windows"][-1][1] == info["reference_tokens"]
+        assert not info["truncated"]
+
+        # A reference that fits in one window scores exactly as in normal mode.
+        plain = client.post("/calculate-score", json={
+            "reference_text": short_reference, "candidate_text": candidate,
+        }).json()
+        windowed = client.post("/calculate-score", json={
+            "reference_text": short_reference, "candidate_text": candidate, "long_document": True,
+        }).json()
+        assert abs(plain["f1_score"] - windowed["f1_score"]) < 1e-4
+        print("Success! Windows:", info["windows"])
+
+def test_liveness_and_readiness():
+    with client:
+        # Liveness answers straight away, even while the model is still loading.
+        live = client.get("/healthz")
+        assert live.status_code == 200, live.text
+
+        # A scoring call made during the cold start waits for the model.
+        response = client.post("/calculate-score", json={
+            "reference_text": "thử nghiệm", "candidate_text": "thử nghiệm",
+        })
+        assert response.status_code == 200, response.text
+
+        ready = client.get("/readyz")
+        assert ready.status_code == 200, ready.text
+        data = ready.json()
+        assert data["phase"] == "ready"
+        assert {"import", "load_model", "total"} <= data["timings_ms"].keys()
+        print("Success! Load timings:", data["timings_ms"])
+
+def test_metrics_endpoint():
+    with client:
+        client.post("/calculate-score", json={
+            "reference_text": "thử nghiệm " * 300, "candidate_text": "thử nghiệm",
+        })
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        for stage in ("batch_wait", "queue_wait", "tokenize", "forward", "match"):
+            assert f'bert_stage_duration_seconds_count{{stage="{stage}"}}' in text
+        assert 'bert_requests_total{endpoint="calculate-score"}' in text
+        assert 'bert_truncated_inputs_total{role="reference"}' in text
+        assert "bert_process_resident_memory_bytes" in text
+        print("Success! /metrics returned", len(text.splitlines()), "lines")
+
+def test_lexical_scores():
+    with client:
+        response = client.post("/lexical-scores", json={
+            "reference_text": "ngày hội hiến máu thu hút sinh viên",
+            "candidate_texts": ["ngày hội hiến máu", "không liên quan"],
+        })
+        assert response.status_code == 200, response.text
+        scores = response.json()["scores"]
+        assert len(scores) == 2
+        assert scores[0]["rouge1"] > scores[1]["rouge1"]
+        assert set(scores[0]) == {"rouge1", "rouge2", "rougeL", "bleu"}
+        print("Success! Lexical scores:", scores)
+
+def test_embed_and_similar():
+    article = "Ngày hội hiến máu Chủ Nhật Đỏ thu hút đông đảo sinh viên tham gia tại Hà Nội."
+    other = "Giá vàng trong nước hôm nay tăng mạnh theo đà thế giới."
+    default_dir = main.VECTOR_INDEX_DIR
+    with tempfile.TemporaryDirectory() as index_dir:
+        main.VECTOR_INDEX_DIR = index_dir
+        try:
+            with client:
+                response = client.post("/embed", json={"texts": [article, other], "ids": ["a", "b"]})
+                assert response.status_code == 200, response.text
+                data = response.json()
+                assert data["indexed"] == 2 and len(data["embeddings"]) == 2
+                assert abs(sum(x * x for x in data["embeddings"][0]) - 1.0) < 1e-3
+
+                # A lightly edited copy of "a", registered under its own URL.
+                response = client.post("/similar", json={
+                    "text": article + " Đây là bản đăng lại.", "id": "c", "threshold": 0.0, "k": 2, "index": True,
+                })
+                assert response.status_code == 200, response.text
+                matches = response.json()["matches"]
+                assert matches[0]["id"] == "a" and matches[0]["score"] >= matches[-1]["score"]
+
+                by_id = client.post("/similar", json={"id": "c", "threshold": 0.0}).json()
+                assert by_id["indexed_vectors"] == 3 and by_id["matches"][0]["id"] == "a"
+                assert client.post("/similar", json={"id": "missing"}).status_code == 404
+                print("Success! Near-duplicates:", matches)
+        finally:
+            main.VECTOR_INDEX_DIR = default_dir
+
+def test_admin_profile_is_gated():
+    default_token, default_dir = main.ADMIN_TOKEN, main.profiler.out_dir
+    with tempfile.TemporaryDirectory() as profile_dir:
+        main.profiler.out_dir = profile_dir
+        try:
+            with client:
+                main.ADMIN_TOKEN = ""
+                assert client.get("/admin/profile").status_code == 404
+                main.ADMIN_TOKEN = "s3cret"
+                assert client.get("/admin/profile", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+                admin = {"Authorization": "Bearer s3cret"}
+                started = client.post("/admin/profile", json={"requests": 1, "interval_ms": 1}, headers=admin)
+                assert started.status_code == 202, started.text
+                session_id = started.json()["id"]
+                # Requests that do not run BERTScore do not use up the session.
+                client.post("/lexical-scores", json={"reference_text": "thử nghiệm", "candidate_texts": ["thử"]})
+                assert client.get("/admin/profile", headers=admin).json()["active"]["id"] == session_id
+                client.post("/calculate-score", json={"reference_text": "thử nghiệm", "candidate_text": "thử"})
+                for _ in range(100):
+                    if session_id in client.get("/admin/profile", headers=admin).json()["sessions"]:
+                        break
+                    time.sleep(0.05)
+                report = client.get(f"/admin/profile/{session_id}", headers=admin).json()
+                assert report["ended_by"] == "requests" and "forward" in report["torch_ops"]
+                folded = client.get(f"/admin/profile/{session_id}?format=collapsed", headers=admin)
+                assert folded.status_code == 200
+                print("Success! Profile:", report["torch_ops"]["forward"]["stage_ms"], "ms in forward")
+        finally:
+            main.ADMIN_TOKEN, main.profiler.out_dir = default_token, default_dir
+
+def test_sentence_alignment_matches_pair_scores():
+    reference = "Ngày hội hiến máu thu hút đông đảo sinh viên. Giá vàng hôm nay tăng mạnh. Trời Hà Nội mưa to."
+    candidate = "Giá vàng tăng. Nhiều sinh viên đi hiến máu."
+
+    with client:
+        response = client.post("/sentence-alignment", json={
+            "reference_text": reference,
+            "candidate_text": candidate,
+            "top_k": 2,
+        })
+        assert response.status_code == 200, response.text
+        data = response.json()
+        refs, cands = data["reference_sentences"], data["candidate_sentences"]
+        assert len(refs) == 3 and len(cands) == 2
+        assert len(data["matrix"]) == 2 and all(len(row) == 3 for row in data["matrix"])
+        assert [len(a["supports"]) for a in data["alignments"]] == [2, 2]
+
+        single = client.post("/calculate-score", json={
+            "reference_text": refs[1],
+            "candidate_text": cands[0],
+        }).json()
+        assert abs(single["f1_score"] - data["matrix"][0][1]) < 1e-4
+        print("Success! Alignments:", data["alignments"])
+
 if __name__ == "__main__":
     test_long_input()
+    test_batch_matches_single()
+    test_long_document_covers_whole_reference()
+    test_liveness_and_readiness()
+    test_metrics_endpoint()
+    test_lexical_scores()
+    test_embed_and_similar()
+    test_admin_profile_is_gated()
+    test_sentence_alignment_matches_pair_scores()
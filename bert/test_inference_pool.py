@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from inference_pool import DeadlineExceededError, InferencePool, QueueFullError
+
+
+def test_runs_off_event_loop():
+    pool = InferencePool(max_workers=1, max_queue=1)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        worker_thread = await pool.run(threading.get_ident, timeout=5)
+        assert worker_thread != loop_thread
+
+    asyncio.run(main())
+    pool.shutdown()
+
+
+def test_event_loop_stays_responsive():
+    pool = InferencePool(max_workers=1, max_queue=1)
+
+    async def main():
+        slow = asyncio.create_task(pool.run(time.sleep, 0.3, timeout=5))
+        start = time.monotonic()
+        await asyncio.sleep(0.01)  # a "health check" scheduled during inference
+        assert time.monotonic() - start < 0.1
+        await slow
+
+    asyncio.run(main())
+    pool.shutdown()
+
+
+def test_rejects_when_queue_full():
+    pool = InferencePool(max_workers=1, max_queue=1)
+
+    async def main():
+        running = asyncio.create_task(pool.run(time.sleep, 0.2, timeout=5))
+        queued = asyncio.create_task(pool.run(time.sleep, 0.01, timeout=5))
+        await asyncio.sleep(0.02)
+        with pytest.raises(QueueFullError):
+            await pool.run(time.sleep, 0.01, timeout=5)
+        await asyncio.gather(running, queued)
+        # Slots are released once the work finishes.
+        assert pool.pending == 0
+        await pool.run(time.sleep, 0, timeout=5)
+
+    asyncio.run(main())
+    pool.shutdown()
+
+
+def test_deadline_drops_queued_job():
+    pool = InferencePool(max_workers=1, max_queue=4)
+    calls = []
+
+    async def main():
+        running = asyncio.create_task(pool.run(time.sleep, 0.2, timeout=5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(DeadlineExceededError):
+            await pool.run(calls.append, "late", timeout=0.05)
+        await running
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    pool.shutdown()
+    assert calls == []
+    assert pool.pending == 0
@@ -0,0 +1,100 @@
+import math
+import random
+import time
+from collections import Counter
+
+from lexical import score_many, score_pairs, tokenize
+
+
+# Straight ports of backend/utils/rouge-custom.ts and sentence BLEU-4.
+def _ngrams(tokens, n):
+    return [" ".join(tokens[i : i + n]) for i in range(len(tokens) - n + 1)]
+
+
+def _rouge_n(cand, ref, n):
+    c, r = tokenize(cand), tokenize(ref)
+    ref_ngrams = _ngrams(r, n)
+    if not r or not ref_ngrams:
+        return 0.0
+    remaining = Counter(ref_ngrams)
+    overlap = 0
+    for g in _ngrams(c, n):
+        if remaining[g] > 0:
+            overlap += 1
+            remaining[g] -= 1
+    return overlap / len(ref_ngrams)
+
+
+def _rouge_l(cand, ref):
+    a, b = tokenize(cand), tokenize(ref)
+    if not b:
+        return 0.0
+    dp = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            dp[i][j] = dp[i - 1][j - 1] + 1 if a[i - 1] == b[j - 1] else max(dp[i - 1][j], dp[i][j - 1])
+    return dp[-1][-1] / len(b)
+
+
+def _bleu(cand, ref):
+    c, r = tokenize(cand), tokenize(ref)
+    if not c or not r:
+        return 0.0
+    log_p = 0.0
+    for n in range(1, 5):
+        cg, rg = Counter(_ngrams(c, n)), Counter(_ngrams(r, n))
+        total = sum(cg.values())
+        overlap = sum(min(v, rg[g]) for g, v in cg.items())
+        if total == 0 or overlap == 0:
+            return 0.0
+        log_p += math.log(overlap / total) / 4
+    bp = 1.0 if len(c) > len(r) else math.exp(1 - len(r) / len(c))
+    return bp * math.exp(log_p)
+
+
+WORDS = "ngày hội hiến máu sinh viên tham gia trường đại học bách khoa thành phố bệnh viện năm 2024 covid_19".split()
+
+
+def _text(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)) + "."
+
+
+def test_tokenizer_matches_natural_word_tokenizer():
+    # Letters outside [A-Za-zА-Яа-я] split words, exactly like natural's regex.
+    assert tokenize("Hiến máu, COVID_19 2024!") == ["hi", "n", "m", "u", "covid_19", "2024"]
+    assert tokenize("  ...  ") == []
+
+
+def test_matches_reference_implementation():
+    rng = random.Random(7)
+    for _ in range(30):
+        ref = _text(rng, rng.randint(0, 120))
+        cands = [_text(rng, rng.randint(0, 40)) for _ in range(3)] + [ref]
+        for cand, score in zip(cands, score_many(ref, cands)):
+            assert math.isclose(score.rouge1, _rouge_n(cand, ref, 1), abs_tol=1e-12)
+            assert math.isclose(score.rouge2, _rouge_n(cand, ref, 2), abs_tol=1e-12)
+            assert math.isclose(score.rougeL, _rouge_l(cand, ref), abs_tol=1e-12)
+            assert math.isclose(score.bleu, _bleu(cand, ref), abs_tol=1e-12)
+
+
+def test_pairs_keep_request_order():
+    refs = ["a b c d", "x y z", "a b c d"]
+    cands = ["a b", "x y z", "c d"]
+    scores = score_pairs(refs, cands)
+    assert [s.rouge1 for s in scores] == [0.5, 1.0, 0.5]
+
+
+def test_dataset_batch_is_fast():
+    # 50 articles × 5 summaries, about the size of one run_metrics.py batch.
+    rng = random.Random(0)
+    refs, cands = [], []
+    for _ in range(50):
+        article = _text(rng, 2000)
+        for _ in range(5):
+            refs.append(article)
+            cands.append(_text(rng, 250))
+    started = time.perf_counter()
+    score_pairs(refs, cands)
+    elapsed = time.perf_counter() - started
+    print(f"\n{len(cands)} pairs scored in {elapsed * 1000:.0f} ms")
+    assert elapsed < 5.0
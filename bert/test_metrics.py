@@ -0,0 +1,32 @@
+from metrics import Counter, Histogram, ServiceMetrics
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("stage_seconds", "Stage latency.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        h.observe(value, stage="forward")
+    lines = h.render()
+    assert 'stage_seconds_bucket{stage="forward",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="forward",le="1.0"} 3' in lines
+    assert 'stage_seconds_bucket{stage="forward",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="forward"} 4' in lines
+    assert h.count(stage="forward") == 4
+
+
+def test_counter_labels_are_escaped():
+    c = Counter("errors_total", "Errors.", ("detail",))
+    c.inc(detail='bad "quote"')
+    assert c.render() == ['errors_total{detail="bad \\"quote\\""} 1.0']
+
+
+def test_service_metrics_render():
+    m = ServiceMetrics()
+    m.observe_stage("tokenize", 0.002)
+    m.observe_tokens("reference", 300, truncated=True)
+    m.observe_tokens("candidate", 40, truncated=False)
+    text = m.render()
+    assert "# TYPE bert_stage_duration_seconds histogram" in text
+    assert 'bert_truncated_inputs_total{role="reference"} 1.0' in text
+    assert 'bert_truncated_inputs_total{role="candidate"}' not in text
+    assert 'bert_input_tokens_count{role="candidate"} 1' in text
+    assert text.endswith("\n")
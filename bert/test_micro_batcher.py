@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from inference_pool import DeadlineExceededError, InferencePool, QueueFullError
+from micro_batcher import MicroBatcher
+
+
+def _fake_score(calls):
+    def score(refs, cands):
+        calls.append(len(cands))
+        return [f"{r}|{c}" for r, c in zip(refs, cands)]
+    return score
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+    pool = InferencePool(max_workers=1, max_queue=4)
+
+    async def main():
+        batcher = MicroBatcher(pool, _fake_score(calls), window_ms=50, max_batch_size=8)
+        batcher.start()
+        results = await asyncio.gather(
+            *(batcher.submit(f"ref{i}", f"cand{i}", timeout=5) for i in range(5))
+        )
+        stats = batcher.stats()
+        await batcher.stop()
+        return results, stats
+
+    results, stats = asyncio.run(main())
+    pool.shutdown()
+    assert results == [f"ref{i}|cand{i}" for i in range(5)]
+    assert calls == [5]
+    assert stats["batches"] == 1
+    assert stats["batch_size_histogram"] == {"5": 1}
+    assert stats["queue_wait_ms"]["max"] >= 0
+
+
+def test_max_batch_size_splits_batches():
+    calls = []
+    pool = InferencePool(max_workers=1, max_queue=4)
+
+    async def main():
+        batcher = MicroBatcher(pool, _fake_score(calls), window_ms=20, max_batch_size=3)
+        batcher.start()
+        await asyncio.gather(*(batcher.submit("r", str(i), timeout=5) for i in range(7)))
+        await batcher.stop()
+
+    asyncio.run(main())
+    pool.shutdown()
+    assert sum(calls) == 7
+    assert max(calls) <= 3
+
+
+def test_errors_fan_out_to_every_waiter():
+    pool = InferencePool(max_workers=1, max_queue=4)
+
+    def boom(refs, cands):
+        raise ValueError("model exploded")
+
+    async def main():
+        batcher = MicroBatcher(pool, boom, window_ms=20, max_batch_size=8)
+        batcher.start()
+        results = await asyncio.gather(
+            *(batcher.submit("r", "c", timeout=5) for _ in range(3)),
+            return_exceptions=True,
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(main())
+    pool.shutdown()
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_rejects_when_too_many_pending():
+    pool = InferencePool(max_workers=1, max_queue=4)
+
+    def slow(refs, cands):
+        time.sleep(0.2)
+        return cands
+
+    async def main():
+        batcher = MicroBatcher(pool, slow, window_ms=0, max_batch_size=1, max_pending=1)
+        batcher.start()
+        first = asyncio.create_task(batcher.submit("r", "a", timeout=5))
+        await asyncio.sleep(0.02)  # "a" is now running, the next one waits
+        second = asyncio.create_task(batcher.submit("r", "b", timeout=5))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await batcher.submit("r", "c", timeout=5)
+        assert await first == "a"
+        assert await second == "b"
+        await batcher.stop()
+
+    asyncio.run(main())
+    pool.shutdown()
+
+
+def test_deadline():
+    pool = InferencePool(max_workers=1, max_queue=4)
+
+    def slow(refs, cands):
+        time.sleep(0.2)
+        return cands
+
+    async def main():
+        batcher = MicroBatcher(pool, slow, window_ms=0, max_batch_size=4)
+        batcher.start()
+        with pytest.raises(DeadlineExceededError):
+            await batcher.submit("r", "c", timeout=0.05)
+        await asyncio.sleep(0.25)
+        await batcher.stop()
+
+    asyncio.run(main())
+    pool.shutdown()
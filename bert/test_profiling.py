@@ -0,0 +1,77 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import torch
+
+from profiling import Profiler, _stage_of
+from scoring import ScoringCore, greedy_match_matrix, pooled_cosine_matrix
+
+
+def _forward_stage():
+    with torch.profiler.record_function("stage:forward"):
+        x = torch.randn(64, 64)
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            x = torch.tanh(x @ x.T)
+    return float(x.sum())
+
+
+def test_session_profiles_jobs_then_detaches(tmp_path):
+    pool = SimpleNamespace(job_wrapper=None)
+    core = SimpleNamespace(profiling=False)
+    profiler = Profiler(str(tmp_path))
+    session = profiler.start(pool, core, max_requests=2, max_seconds=30, interval_s=0.002, torch_ops=True)
+    assert pool.job_wrapper is not None and core.profiling
+
+    for _ in range(2):
+        pool.job_wrapper(_forward_stage)
+        session.request_done()
+    session._thread.join(timeout=30)
+
+    assert session.done and profiler.active is None
+    assert pool.job_wrapper is None and not core.profiling
+    report = session.report
+    assert report["ended_by"] == "requests" and report["jobs"] == 2
+    assert report["python"]["samples"] > 0
+    forward = report["torch_ops"]["forward"]
+    assert forward["stage_ms"] >= 50 and {op["op"] for op in forward["top_ops"]} >= {"aten::mm", "aten::tanh"}
+
+    assert profiler.sessions() == [session.id]
+    with open(profiler.path(session.id, ".json"), encoding="utf-8") as f:
+        assert json.load(f)["id"] == session.id
+    with open(profiler.path(session.id, ".collapsed"), encoding="utf-8") as f:
+        line = f.readline()
+    assert "_forward_stage (test_profiling.py" in line and line.rstrip().split(" ")[-1].isdigit()
+    assert os.path.exists(report["files"]["trace"])
+    assert profiler.path("../etc/passwd", ".json") is None
+
+
+def test_time_limit_ends_an_idle_session(tmp_path):
+    pool = SimpleNamespace(job_wrapper=None)
+    core = SimpleNamespace(profiling=False)
+    profiler = Profiler(str(tmp_path))
+    session = profiler.start(pool, core, max_requests=None, max_seconds=0.05, interval_s=0.01, torch_ops=False)
+    session._thread.join(timeout=10)
+    assert session.report["ended_by"] == "seconds" and session.report["torch_ops"] is None
+    assert profiler.active is None
+
+
+def test_back_to_back_sessions_get_distinct_ids(tmp_path):
+    pool = SimpleNamespace(job_wrapper=None)
+    core = SimpleNamespace(profiling=False)
+    profiler = Profiler(str(tmp_path))
+    ids = []
+    for _ in range(2):
+        session = profiler.start(pool, core, max_requests=None, max_seconds=0.01, interval_s=0.005, torch_ops=False)
+        session._thread.join(timeout=10)
+        ids.append(session.id)
+    assert ids[0] != ids[1] and sorted(profiler.sessions()) == sorted(ids)
+    assert all(profiler.path(i, ".json") for i in ids)
+
+
+def test_sentence_alignment_frames_are_attributed_to_match():
+    # Innermost mapped frame wins: the matching helpers, not the sentence_matrix caller.
+    for helper in (greedy_match_matrix, pooled_cosine_matrix):
+        assert _stage_of([ScoringCore.sentence_matrix.__code__, helper.__code__]) == "match"
@@ -0,0 +1,51 @@
+import torch
+
+from scoring import EncodedText, _ownership_bounds, greedy_match, greedy_match_matrix, plan_windows
+
+
+def test_short_text_is_one_window():
+    assert plan_windows(100, 254, 64, 64) == [(0, 100)]
+    assert plan_windows(0, 254, 64, 64) == [(0, 0)]
+
+
+def test_windows_cover_every_token_once():
+    spans = plan_windows(1000, 254, 64, 64)
+    assert spans[0][0] == 0 and spans[-1][1] == 1000
+    assert all(end - start == 254 for start, end in spans)
+    for (_, prev_end), (start, _) in zip(spans, spans[1:]):
+        assert start < prev_end  # consecutive windows overlap
+
+    bounds = _ownership_bounds(spans)
+    owned = [t for k in range(len(spans)) for t in range(bounds[k], bounds[k + 1])]
+    assert owned == list(range(1000))
+    for k, (start, end) in enumerate(spans):
+        assert start <= bounds[k] <= bounds[k + 1] <= end
+
+
+def test_max_windows_truncates():
+    spans = plan_windows(10_000, 254, 64, 4)
+    assert len(spans) == 4
+    assert spans[-1][1] < 10_000
+
+
+def _encoded(n: int, seed: int) -> EncodedText:
+    g = torch.Generator().manual_seed(seed)
+    emb = torch.randn(n, 8, generator=g)
+    emb = emb / emb.norm(dim=-1, keepdim=True)
+    idf = torch.ones(n)
+    idf[0] = idf[-1] = 0  # [CLS] / [SEP]
+    return EncodedText(embeddings=emb, idf=idf)
+
+
+def test_greedy_match_matrix_equals_pairwise_matching():
+    refs = [_encoded(n, seed) for seed, n in enumerate([7, 2, 12])]  # the second one is empty
+    cands = [_encoded(n, 10 + seed) for seed, n in enumerate([5, 9])]
+    precision, recall, f1 = greedy_match_matrix(refs, cands)
+    assert f1.shape == (2, 3)
+    for j, cand in enumerate(cands):
+        for i, ref in enumerate(refs):
+            expected = greedy_match(ref, cand)
+            assert abs(float(precision[j, i]) - expected.precision) < 1e-5
+            assert abs(float(recall[j, i]) - expected.recall) < 1e-5
+            assert abs(float(f1[j, i]) - expected.f1) < 1e-5
+    assert float(f1[:, 1].abs().sum()) == 0.0
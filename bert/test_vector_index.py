@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex
+
+
+def _unit(rng, n, dim=16):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_search_ranks_by_cosine_and_applies_threshold(tmp_path):
+    rng = np.random.default_rng(0)
+    index = VectorIndex(str(tmp_path), dim=16, initial_capacity=4)  # forces growth
+    vectors = _unit(rng, 50)
+    index.add([f"u{i}" for i in range(50)], vectors)
+
+    query = vectors[7] + 0.05 * vectors[3]
+    matches = index.search(query, k=3)
+    assert matches[0][0] == "u7" and matches[0][1] > 0.99
+    assert [s for _, s in matches] == sorted((s for _, s in matches), reverse=True)
+
+    assert index.search(query, k=3, threshold=0.95) == matches[:1]
+    assert index.search(vectors[7], k=1, exclude=("u7",))[0][0] != "u7"
+    assert index.stats()["vectors"] == 50 and index.stats()["capacity"] == 64
+
+
+def test_upsert_and_persistence(tmp_path):
+    rng = np.random.default_rng(1)
+    a, b, c = _unit(rng, 3)
+    index = VectorIndex(str(tmp_path), dim=16, model="m")
+    index.add(["x", "y"], np.stack([a, b]))
+    index.add(["x"], c[None] * 3)  # overwritten in place, re-normalised
+    assert len(index) == 2
+    index.close()
+
+    reopened = VectorIndex(str(tmp_path), dim=16, model="m")
+    assert len(reopened) == 2
+    np.testing.assert_allclose(reopened.get("x"), c, atol=1e-3)
+    assert reopened.get("missing") is None
+    assert reopened.search(c, k=1)[0][0] == "x"
+
+    with pytest.raises(ValueError):
+        VectorIndex(str(tmp_path), dim=16, model="other")
+
+
+def test_second_handle_sees_appended_ids(tmp_path):
+    rng = np.random.default_rng(2)
+    first = VectorIndex(str(tmp_path), dim=16, initial_capacity=2)
+    second = VectorIndex(str(tmp_path), dim=16)  # e.g. another serve.py worker
+    vectors = _unit(rng, 10)
+    first.add([f"u{i}" for i in range(10)], vectors)
+
+    assert second.search(vectors[9], k=1)[0][0] == "u9"
+    second.add(["u10"], vectors[:1])
+    assert first.search(vectors[0], k=2)[1][0] in {"u0", "u10"}
+    assert len(first) == 11
@@ -0,0 +1,38 @@
+from word_segment import WordSegmenter
+
+WORDS = ["sinh_viên", "đại_học", "bách_khoa", "đại_học_bách_khoa", "hiến_máu", "việt_nam", "chủ_nhật"]
+
+
+def test_longest_match_keeps_casing_and_splits_punctuation():
+    seg = WordSegmenter(WORDS)
+    out = seg.segment_sentence("Trường Đại học Bách khoa có hơn 2.000 sinh viên hiến máu, ngày 12/5.")
+    assert out == "Trường Đại_học_Bách_khoa có hơn 2.000 sinh_viên hiến_máu , ngày 12/5 ."
+
+
+def test_unknown_syllables_are_left_alone():
+    seg = WordSegmenter(WORDS)
+    assert seg.segment_sentence("trời hôm nay đẹp") == "trời hôm nay đẹp"
+    assert seg.segment_sentence("") == ""
+
+
+def test_vocab_filter_skips_bpe_pieces():
+    class Tokenizer:
+        def get_vocab(self):
+            return {"sinh_viên": 0, "viên@@": 1, "_": 2, "nam": 3, "việt_nam@@": 4}
+
+    seg = WordSegmenter.from_tokenizer(Tokenizer())
+    assert seg.vocabulary_size == 1
+    assert seg.segment_sentence("sinh viên Việt Nam") == "sinh_viên Việt Nam"
+
+
+def test_sentences_are_memoised():
+    seg = WordSegmenter(WORDS, cache_size=2)
+    text = "Sinh viên hiến máu. Ngày Chủ nhật đỏ! Việt Nam."
+    first = seg.segment_batch([text, text])
+    assert first[0] == first[1] == "Sinh_viên hiến_máu . Ngày Chủ_nhật đỏ ! Việt_Nam ."
+    stats = seg.stats()
+    assert stats["misses"] == 3 and stats["hits"] == 0
+    assert stats["cached_sentences"] == 2  # LRU bound
+
+    assert seg.segment_batch(["Việt Nam."]) == ["Việt_Nam ."]
+    assert seg.stats()["hits"] == 1
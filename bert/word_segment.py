@@ -0,0 +1,124 @@
+"""
+In-process Vietnamese word segmentation for PhoBERT input.
+
+``vinai/phobert-base`` was pre-trained on word-segmented text, where the
+syllables of a multi-syllable word are joined with underscores
+(``"sinh viên"`` → ``"sinh_viên"``), as produced by VnCoreNLP's RDRSegmenter.
+Raw text makes the BPE split every syllable on its own, so the same sentence
+costs more tokens (and hits the 256-token cap sooner) and the words don't
+line up with the embeddings PhoBERT learned.
+
+``WordSegmenter`` does forward longest matching against the multi-syllable
+words of the PhoBERT vocabulary itself (``get_vocab()`` entries containing
+``_``), so it needs no Java server and no extra data files, and it only ever
+joins syllables into words the model has a single embedding for. Matching is
+case-insensitive; the original casing is kept. Punctuation is split off into
+its own tokens, as in VnCoreNLP's output.
+
+Texts are processed sentence by sentence and every segmented sentence is
+memoised in an LRU keyed by a hash of the sentence: news articles repeat
+boilerplate (bylines, captions, "Xem thêm" lines) and the same articles are
+rescored many times, so most sentences are hits after the first pass.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+# Sentence boundaries: whitespace after ., !, ?, … (optionally followed by a closing quote/bracket).
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?…])|(?<=[.!?…][\"'”’)\]]))\s+")
+# Numbers (kept whole: "2.000", "12/5"), syllables and stand-alone punctuation.
+_TOKEN = re.compile(r"\d+(?:[.,:/]\d+)*|\w+|[^\w\s]")
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split normalised text after sentence-final punctuation (closing quotes/brackets stay attached)."""
+    return [s for s in _SENTENCE_END.split(text) if s]
+
+
+def _sentence_key(sentence: str) -> bytes:
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+
+
+class WordSegmenter:
+    def __init__(self, words: Iterable[str], cache_size: int = 50_000, max_syllables: int = 4) -> None:
+        self._words: set[tuple[str, ...]] = set()
+        longest = 1
+        for word in words:
+            syllables = tuple(word.lower().split("_"))
+            if len(syllables) > 1 and all(syllables):
+                self._words.add(syllables)
+                longest = max(longest, len(syllables))
+        self.max_syllables = min(longest, max_syllables)
+        self.cache_size = cache_size
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, **kwargs) -> "WordSegmenter":
+        """Dictionary = the multi-syllable words in the tokenizer's vocabulary (BPE pieces excluded)."""
+        vocab = tokenizer.get_vocab()
+        return cls((w for w in vocab if "_" in w.strip("_") and not w.endswith("@@")), **kwargs)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._words)
+
+    def segment_sentence(self, sentence: str) -> str:
+        """Longest-match segmentation of one sentence (no caching)."""
+        tokens = _TOKEN.findall(sentence)
+        lowered = [t.lower() for t in tokens]
+        out: list[str] = []
+        i = 0
+        while i < len(tokens):
+            span = 1
+            if lowered[i].isalpha():
+                for n in range(min(self.max_syllables, len(tokens) - i), 1, -1):
+                    if tuple(lowered[i : i + n]) in self._words:
+                        span = n
+                        break
+            out.append("_".join(tokens[i : i + span]))
+            i += span
+        return " ".join(out)
+
+    def segment_batch(self, texts: list[str]) -> list[str]:
+        """Segment every text, sentence by sentence, through the shared LRU."""
+        split = [split_sentences(text) for text in texts]
+        keys = {s: _sentence_key(s) for sentences in split for s in sentences}
+
+        done: dict[str, str] = {}
+        with self._lock:
+            for sentence, key in keys.items():
+                hit = self._cache.get(key)
+                if hit is not None:
+                    self._cache.move_to_end(key)
+                    done[sentence] = hit
+            self.hits += len(done)
+            self.misses += len(keys) - len(done)
+
+        fresh = {s: self.segment_sentence(s) for s in keys if s not in done}
+        if fresh:
+            with self._lock:
+                for sentence, segmented in fresh.items():
+                    self._cache[keys[sentence]] = segmented
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            done.update(fresh)
+        return [" ".join(done[s] for s in sentences) for sentences in split]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "dictionary_words": len(self._words),
+                "cached_sentences": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,369 @@
+"""
+Queryable index over the fusion batch reports in ``results/``.
+
+Comparing runs used to mean loading every multi-MB report with ``json.load``
+and hand-joining records. ``update`` stream-parses each report record by
+record (only one record is ever decoded at a time) into a SQLite index:
+
+- ``runs``     — one row per report file (run = file name without ``.json``):
+  size and mtime for change detection, start/finish time, aggregator and
+  proposers
+- ``outputs``  — one row per summary, keyed by (run, record_index, role,
+  model): ``role`` is ``fusion`` (the fused summary; ``model`` is the
+  aggregator), ``draft`` (a proposer draft inside a fusion) or ``forced``
+  (a single-model run), with url, latency_ms, total_cost_usd, total_tokens,
+  the lexical/BERT scores and the pairwise judge verdict
+- ``approaches`` — the per-approach ``axis_a`` rows of ``unified-report-*``
+
+Updates are incremental: files whose size and mtime are unchanged are
+skipped, changed files are reindexed in one transaction, and runs whose file
+disappeared are dropped. Queries then run against indexed columns:
+
+    python report_index.py update
+    python report_index.py models [--role fusion] [--run 'moa-%'] [--json]
+    python report_index.py runs
+    python report_index.py sql "SELECT model, AVG(bert_score) FROM outputs GROUP BY model"
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sqlite3
+import time
+
+from report_stream import iter_report
+
+DEFAULT_REPORTS = "results"
+DEFAULT_DB = "report_index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run         TEXT PRIMARY KEY,
+    path        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    kind        TEXT NOT NULL,
+    started_at  TEXT,
+    finished_at TEXT,
+    aggregator  TEXT,
+    proposers   TEXT,
+    records     INTEGER NOT NULL,
+    indexed_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    run              TEXT NOT NULL REFERENCES runs(run),
+    record_index     INTEGER NOT NULL,
+    role             TEXT NOT NULL,
+    model            TEXT NOT NULL,
+    url              TEXT,
+    mode             TEXT,
+    aggregator_model TEXT,
+    status           TEXT,
+    latency_ms       REAL,
+    total_cost_usd   REAL,
+    total_tokens     INTEGER,
+    rouge1           REAL,
+    rouge2           REAL,
+    rougeL           REAL,
+    bleu             REAL,
+    bert_score       REAL,
+    compression_rate REAL,
+    judge_winner     TEXT,
+    PRIMARY KEY (run, record_index, role, model)
+);
+CREATE INDEX IF NOT EXISTS outputs_model ON outputs (role, model, latency_ms);
+CREATE INDEX IF NOT EXISTS outputs_url ON outputs (url);
+CREATE TABLE IF NOT EXISTS approaches (
+    run         TEXT NOT NULL REFERENCES runs(run),
+    approach    TEXT NOT NULL,
+    n           INTEGER,
+    rouge1      REAL,
+    rougeL      REAL,
+    bleu        REAL,
+    bert_score  REAL,
+    compression REAL,
+    PRIMARY KEY (run, approach)
+);
+"""
+
+SCORE_FIELDS = ("rouge1", "rouge2", "rougeL", "bleu", "bert_score", "compression_rate")
+OUTPUT_COLUMNS = (
+    "run", "record_index", "role", "model", "url", "mode", "aggregator_model", "status",
+    "latency_ms", "total_cost_usd", "total_tokens", *SCORE_FIELDS, "judge_winner",
+)
+
+
+# ---------------------------------------------------------------------------
+# Report -> rows
+# ---------------------------------------------------------------------------
+def _scores(source):
+    source = source or {}
+    return tuple(source.get(field) for field in SCORE_FIELDS)
+
+
+def _record_rows(run, record):
+    """``outputs`` rows for one report record."""
+    index = record.get("index")
+    url = record.get("url")
+    fusion = record.get("fusion") or {}
+    aggregator = fusion.get("aggregator_model")
+    if aggregator:
+        judge = fusion.get("judge_pairwise") or {}
+        yield (
+            run, index, "fusion", aggregator, url, fusion.get("mode", "fusion"), aggregator, "success",
+            fusion.get("latency_ms"), fusion.get("total_cost_usd"), fusion.get("total_tokens"),
+            *_scores(fusion.get("fused_scores")), judge.get("winner_label"),
+        )
+        for draft in fusion.get("drafts") or []:
+            yield (
+                run, index, "draft", draft.get("model_name"), url, fusion.get("mode", "fusion"), aggregator,
+                draft.get("status"), draft.get("latency_ms"), draft.get("estimated_cost_usd"), None,
+                *_scores(draft.get("scores")), None,
+            )
+    for forced in record.get("forced") or []:
+        tokens = None
+        if forced.get("prompt_tokens") is not None or forced.get("completion_tokens") is not None:
+            tokens = (forced.get("prompt_tokens") or 0) + (forced.get("completion_tokens") or 0)
+        yield (
+            run, index, "forced", forced.get("model"), url, forced.get("mode", "forced"), None,
+            "success" if forced.get("summary") else "error", forced.get("latency_ms"),
+            forced.get("estimated_cost_usd"), tokens, *_scores(forced), None,
+        )
+
+
+def _approach_row(run, row):
+    return (
+        run, row.get("approach"), row.get("n"), row.get("rouge1"), row.get("rougeL"),
+        row.get("bleu"), row.get("bert"), row.get("compression"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+class ReportIndex:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _drop(self, run):
+        for table in ("outputs", "approaches", "runs"):
+            self._conn.execute(f"DELETE FROM {table} WHERE run = ?", (run,))
+
+    def index_file(self, path):
+        """(Re)index one report in a single transaction; returns the number of rows written."""
+        run = os.path.splitext(os.path.basename(path))[0]
+        st = os.stat(path)
+        header = {}
+        records = rows = 0
+        insert_output = f"INSERT OR REPLACE INTO outputs VALUES ({', '.join('?' * len(OUTPUT_COLUMNS))})"
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._drop(run)
+            # The runs row goes first (outputs reference it) and is completed below.
+            self._conn.execute(
+                "INSERT INTO runs (run, path, size, mtime_ns, kind, records, indexed_at) VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (run, os.path.abspath(path), st.st_size, st.st_mtime_ns, "unknown", time.time()),
+            )
+            for event, key, value in iter_report(path):
+                if event == "record":
+                    batch = [row for row in _record_rows(run, value) if row[3]]
+                    self._conn.executemany(insert_output, batch)
+                    records += 1
+                    rows += len(batch)
+                elif key == "axis_a" and isinstance(value, list):
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO approaches VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [_approach_row(run, row) for row in value if row.get("approach")],
+                    )
+                    rows += len(value)
+                elif key != "statistics":
+                    header[key] = value
+            kind = "unified" if "generated_at" in header else ("batch" if "proposers" in header else "unknown")
+            self._conn.execute(
+                "UPDATE runs SET kind = ?, started_at = ?, finished_at = ?, aggregator = ?, proposers = ?, "
+                "records = ? WHERE run = ?",
+                (
+                    kind, header.get("started_at") or header.get("generated_at"), header.get("finished_at"),
+                    header.get("aggregator"), json.dumps(header.get("proposers")) if header.get("proposers") else None,
+                    records, run,
+                ),
+            )
+        return rows
+
+    def update(self, reports_dir=DEFAULT_REPORTS):
+        """Index new or changed ``*.json`` reports and drop runs whose file is gone."""
+        known = {
+            row["run"]: (row["path"], row["size"], row["mtime_ns"])
+            for row in self._conn.execute("SELECT run, path, size, mtime_ns FROM runs")
+        }
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0, "rows": 0, "failed": []}
+        seen = set()
+        for path in sorted(glob.glob(os.path.join(reports_dir, "*.json"))):
+            run = os.path.splitext(os.path.basename(path))[0]
+            seen.add(run)
+            st = os.stat(path)
+            if known.get(run) == (os.path.abspath(path), st.st_size, st.st_mtime_ns):
+                counts["unchanged"] += 1
+                continue
+            try:
+                counts["rows"] += self.index_file(path)
+                counts["indexed"] += 1
+            except ValueError as exc:  # includes JSONDecodeError: a report still being written
+                counts["failed"].append(f"{path}: {exc}")
+        for run in set(known) - seen:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._drop(run)
+            counts["removed"] += 1
+        return counts
+
+    def query(self, sql, params=()):
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    # ------------------------------------------------------------------
+    # Cross-run summaries
+    # ------------------------------------------------------------------
+    def _filters(self, role=None, run=None):
+        clauses, params = [], []
+        if role:
+            clauses.append("role = ?")
+            params.append(role)
+        if run:
+            clauses.append("run LIKE ?")
+            params.append(run)
+        return (" AND " + " AND ".join(clauses) if clauses else ""), params
+
+    def model_summary(self, role=None, run=None):
+        """
+        Per (role, model): rows, runs, latency p50/p95, mean cost and tokens,
+        mean BERTScore and cost per BERTScore point (USD per 0.01 F1, over
+        rows that have both).
+        """
+        where, params = self._filters(role, run)
+        summary = {}
+        for row in self._conn.execute(
+            "SELECT role, model, COUNT(*) AS n, COUNT(DISTINCT run) AS runs, AVG(total_cost_usd) AS cost, "
+            "AVG(total_tokens) AS tokens, AVG(bert_score) AS bert_score, "
+            "SUM(CASE WHEN bert_score IS NOT NULL THEN total_cost_usd END) AS paired_cost, "
+            "SUM(CASE WHEN total_cost_usd IS NOT NULL THEN bert_score END) AS paired_bert "
+            f"FROM outputs WHERE 1 = 1{where} GROUP BY role, model ORDER BY role, model",
+            params,
+        ):
+            summary[(row["role"], row["model"])] = {
+                "role": row["role"],
+                "model": row["model"],
+                "n": row["n"],
+                "runs": row["runs"],
+                "latency_ms": {"p50": None, "p95": None},
+                "mean_cost_usd": row["cost"],
+                "mean_tokens": row["tokens"],
+                "mean_bert_score": row["bert_score"],
+                "cost_per_bert_point": (
+                    row["paired_cost"] / (row["paired_bert"] * 100) if row["paired_bert"] else None
+                ),
+            }
+        # The (role, model, latency_ms) index returns latencies already sorted.
+        latencies = {}
+        for row in self._conn.execute(
+            f"SELECT role, model, latency_ms FROM outputs WHERE latency_ms IS NOT NULL{where} "
+            "ORDER BY role, model, latency_ms",
+            params,
+        ):
+            latencies.setdefault((row[0], row[1]), []).append(row[2])
+        for key, values in latencies.items():
+            summary[key]["latency_ms"] = {"p50": _percentile(values, 0.50), "p95": _percentile(values, 0.95)}
+        return list(summary.values())
+
+    def run_summary(self):
+        return self.query(
+            "SELECT r.run, r.kind, r.started_at, r.aggregator, r.records, "
+            "COUNT(o.run) AS outputs, AVG(CASE WHEN o.role = 'fusion' THEN o.bert_score END) AS fused_bert, "
+            "SUM(CASE WHEN o.role IN ('fusion', 'forced') THEN o.total_cost_usd END) AS cost_usd "
+            "FROM runs r LEFT JOIN outputs o ON o.run = r.run GROUP BY r.run ORDER BY r.started_at"
+        )
+
+
+def _percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def _fmt(value, digits=3):
+    if value is None:
+        return "N/A"
+    return f"{value:.{digits}f}" if isinstance(value, float) else str(value)
+
+
+def print_models(summary):
+    print(f"{'Role':<7} {'Model':<26} {'N':>5} {'Runs':>4} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'cost $':>9} {'tokens':>7} {'BERT':>6} {'$/BERT pt':>10}")
+    print("-" * 101)
+    for s in summary:
+        lat = s["latency_ms"]
+        print(f"{s['role']:<7} {s['model']:<26} {s['n']:>5} {s['runs']:>4} {_fmt(lat['p50'], 0):>8} "
+              f"{_fmt(lat['p95'], 0):>8} {_fmt(s['mean_cost_usd'], 5):>9} {_fmt(s['mean_tokens'], 0):>7} "
+              f"{_fmt(s['mean_bert_score']):>6} {_fmt(s['cost_per_bert_point'], 6):>10}")
+
+
+def print_runs(runs):
+    print(f"{'Run':<44} {'Kind':<8} {'Records':>7} {'Outputs':>7} {'Fused BERT':>10} {'Cost $':>8}")
+    print("-" * 89)
+    for r in runs:
+        print(f"{r['run']:<44} {r['kind']:<8} {r['records']:>7} {r['outputs']:>7} "
+              f"{_fmt(r['fused_bert']):>10} {_fmt(r['cost_usd'], 4):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query the fusion batch reports.")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"SQLite index (default: {DEFAULT_DB})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    update_cmd = sub.add_parser("update", help="Index new or changed reports")
+    update_cmd.add_argument("--reports", default=DEFAULT_REPORTS, help=f"Report directory (default: {DEFAULT_REPORTS})")
+    models_cmd = sub.add_parser("models", help="Per-model latency, cost and BERTScore across runs")
+    models_cmd.add_argument("--role", choices=("fusion", "draft", "forced"), help="Only this kind of output")
+    models_cmd.add_argument("--run", help="Only runs matching this SQL LIKE pattern, e.g. 'moa-%%'")
+    models_cmd.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    runs_cmd = sub.add_parser("runs", help="One line per indexed report")
+    runs_cmd.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    sql_cmd = sub.add_parser("sql", help="Run an ad-hoc query and print the rows as JSON lines")
+    sql_cmd.add_argument("query")
+    args = parser.parse_args()
+
+    index = ReportIndex(args.db)
+    try:
+        started = time.perf_counter()
+        if args.command == "update":
+            counts = index.update(args.reports)
+            counts["elapsed_s"] = round(time.perf_counter() - started, 3)
+            print(json.dumps(counts, indent=2))
+        elif args.command == "models":
+            summary = index.model_summary(args.role, args.run)
+            if args.json:
+                print(json.dumps(summary, indent=2))
+            else:
+                print_models(summary)
+        elif args.command == "runs":
+            runs = index.run_summary()
+            if args.json:
+                print(json.dumps(runs, indent=2))
+            else:
+                print_runs(runs)
+        else:
+            for row in index.query(args.query):
+                print(json.dumps(row, ensure_ascii=False))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
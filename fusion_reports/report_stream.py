@@ -0,0 +1,97 @@
+"""
+Streaming reader for the fusion batch reports in ``results/``.
+
+Reports are one JSON object whose ``records`` array grows to many MB.
+``iter_report`` walks the top-level object with an incremental
+``raw_decode`` over a sliding buffer and decodes the records one at a time,
+so readers (``report_index.py``, ``bert/batch_score.py``) hold a single
+record in memory regardless of the report size.
+"""
+
+import json
+
+CHUNK_SIZE = 1 << 16
+
+
+class _Stream:
+    """Incremental ``raw_decode`` over a text file, one JSON value at a time."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        # Read at least as much as is already buffered so that one large value
+        # costs O(size) instead of O(size^2) retries.
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of file."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:  # '' (end of file) is in every string
+            raise ValueError(f"expected one of {chars!r} at offset {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number ending exactly at the end of the buffer may continue in
+            # the next chunk.
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_report(path, stream_key="records", chunk_size=CHUNK_SIZE):
+    """
+    Yield ``("field", key, value)`` for every top-level field of a report and
+    ``("record", key, item)`` for each element of the ``stream_key`` array,
+    decoding one element at a time.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _Stream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == stream_key and stream.peek() == "[":
+                stream.expect("[")
+                if stream.peek() != "]":
+                    while True:
+                        yield "record", key, stream.value()
+                        if stream.expect(",]") == "]":
+                            break
+                else:
+                    stream.expect("]")
+            else:
+                yield "field", key, stream.value()
+            if stream.expect(",}") == "}":
+                return
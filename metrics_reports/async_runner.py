@@ -0,0 +1,353 @@
+"""
+Pipelined asyncio runner for run_metrics.py (``python run_metrics.py --async``).
+
+The synchronous runner opens a new connection per call, runs summarize and
+evaluate back-to-back for each URL and never has more than two URLs in flight.
+Here the two stages are decoupled:
+
+    URLs ──> summarize queue ──[LLM limiter]──> evaluate queue ──[BERT limiter]──> CSV
+
+- ``ConnectionPool`` keeps HTTP/1.1 keep-alive connections to the backend open
+  and reuses them across requests (stdlib asyncio streams, no extra deps).
+- Each stage has its own ``AimdLimiter``: its concurrency limit grows by about
+  one slot per round trip while requests succeed within the target latency and
+  is halved (at most once per round trip) on 429/5xx, timeouts or latency above
+  the target, so each backend is pushed as hard as it can take.
+- Summaries and scores go through the same ``ResultStore`` as the synchronous
+  runner, so both runners resume each other's work, and finished rows are
+  streamed into the same columnar store (``columnar_store.py``).
+"""
+
+import asyncio
+import json
+import ssl
+import time
+from urllib.parse import urlsplit
+
+import run_metrics
+from run_metrics import METRIC_VERSION, EMPTY_ROW, output_path, read_urls, result_row, write_csv
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 4
+
+
+def add_async_args(parser):
+    group = parser.add_argument_group("async runner")
+    group.add_argument("--llm-concurrency", type=int, default=2, help="Initial summarize concurrency")
+    group.add_argument("--llm-max", type=int, default=16, help="Upper bound for summarize concurrency")
+    group.add_argument("--llm-target-latency", type=float, default=60.0,
+                       help="Summarize latency (s) above which concurrency is reduced")
+    group.add_argument("--bert-concurrency", type=int, default=2, help="Initial evaluate concurrency")
+    group.add_argument("--bert-max", type=int, default=16, help="Upper bound for evaluate concurrency")
+    group.add_argument("--bert-target-latency", type=float, default=20.0,
+                       help="Evaluate latency (s) above which concurrency is reduced")
+    group.add_argument("--timeout", type=float, default=180.0, help="Per-request timeout (s)")
+
+
+class HttpError(Exception):
+    def __init__(self, status, body, retry_after=None):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _StaleConnection(Exception):
+    """The server closed the connection before sending any response byte."""
+
+
+class ConnectionPool:
+    """Minimal keep-alive HTTP/1.1 JSON client over asyncio streams."""
+
+    def __init__(self, base_url, max_idle=64):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.max_idle = max_idle
+        self._idle = []
+        self.opened = 0
+        self.reused = 0
+
+    async def _connect(self):
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def post_json(self, path, payload, timeout):
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"POST {self.base_path}{path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\nAccept: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n"
+        ).encode("latin-1")
+
+        # An idle connection may have been closed by the server in the meantime;
+        # that surfaces as EOF before any response byte, so retry on a fresh one.
+        while True:
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await self._connect()
+            try:
+                writer.write(head + body)
+                await writer.drain()
+                status, headers, data = await asyncio.wait_for(self._read_response(reader), timeout)
+                break
+            except (_StaleConnection, ConnectionResetError, BrokenPipeError) as exc:
+                writer.close()
+                if not reused:
+                    raise ConnectionError(f"{self.host}:{self.port} closed the connection") from exc
+            except BaseException:
+                writer.close()
+                raise
+        if reused:
+            self.reused += 1
+
+        if headers.get("connection", "").lower() == "close" or len(self._idle) >= self.max_idle:
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+
+        text = data.decode("utf-8", errors="replace")
+        if status >= 400:
+            retry_after = headers.get("retry-after")
+            raise HttpError(status, text, float(retry_after) if retry_after and retry_after.isdigit() else None)
+        return json.loads(text)
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise _StaleConnection()
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/") or not parts[1].isdigit():
+            raise ValueError(f"malformed status line {status_line[:80]!r}")
+        status = int(parts[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)  # CRLF after each chunk
+            return status, headers, b"".join(chunks)
+        if "content-length" in headers:
+            return status, headers, await reader.readexactly(int(headers["content-length"]))
+        headers["connection"] = "close"  # body ends at EOF
+        return status, headers, await reader.read()
+
+    def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class AimdLimiter:
+    """Concurrency limit with additive increase / multiplicative decrease."""
+
+    def __init__(self, name, initial, maximum, target_latency, minimum=1, backoff=0.5):
+        self.name = name
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._last_decrease = 0.0
+        self.successes = 0
+        self.overloads = 0
+        self.peak = self.limit
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, overloaded=False):
+        """Return a slot. ``overloaded`` marks 429/5xx/timeouts; slow successes count too."""
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded or latency > self.target_latency:
+                self.overloads += 1
+                # One decrease per round trip: the requests already in flight
+                # were sent under the old limit and will report the same signal.
+                if now - self._last_decrease > latency:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.successes += 1
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+                self.peak = max(self.peak, self.limit)
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            "limit": round(self.limit, 2),
+            "peak": round(self.peak, 2),
+            "successes": self.successes,
+            "overloads": self.overloads,
+        }
+
+
+async def call_limited(pool, limiter, path, payload, timeout, label):
+    """
+    POST through ``limiter``, retrying overload responses with backoff. Returns
+    None when the request fails for good; the slot is released on every path.
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.acquire()
+        started = time.monotonic()
+        retry_after = None
+        overloaded = False
+        try:
+            return await pool.post_json(path, payload, timeout)
+        except HttpError as exc:
+            overloaded = exc.status in RETRY_STATUSES
+            if not overloaded:
+                print(f"{label} -> HTTP {exc.status}, giving up")
+                return None
+            retry_after = exc.retry_after
+            error = f"HTTP {exc.status}"
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError) as exc:
+            overloaded = True
+            error = type(exc).__name__
+        except ValueError as exc:
+            # Non-JSON body or malformed status line: retrying will not help.
+            print(f"{label} -> invalid response ({exc}), giving up")
+            return None
+        finally:
+            await limiter.release(time.monotonic() - started, overloaded=overloaded)
+
+        if attempt < MAX_ATTEMPTS:
+            delay = retry_after if retry_after is not None else 2 ** attempt
+            print(f"{label} -> {error}, retry {attempt}/{MAX_ATTEMPTS - 1} in {delay:.0f}s")
+            await asyncio.sleep(delay)
+    print(f"{label} -> failed after {MAX_ATTEMPTS} attempts")
+    return None
+
+
+async def run_datasets(dataset_files, run, args):
+    pool = ConnectionPool(run_metrics.BACKEND_URL)
+    llm = AimdLimiter("llm", args.llm_concurrency, args.llm_max, args.llm_target_latency)
+    bert = AimdLimiter("bert", args.bert_concurrency, args.bert_max, args.bert_target_latency)
+    summarize_q = asyncio.Queue()
+    evaluate_q = asyncio.Queue()
+
+    urls_by_file = {f: read_urls(f) for f in dataset_files}
+    # A URL listed twice in a dataset is processed once; its row is repeated in the CSV.
+    unique_by_file = {f: list(dict.fromkeys(urls)) for f, urls in urls_by_file.items()}
+    rows = {f: {} for f in dataset_files}
+    total = sum(len(u) for u in unique_by_file.values())
+    done = 0
+
+    # SQLite and file I/O runs in worker threads (the stores and the columnar
+    # sink lock internally) so a slow commit never stalls the event loop.
+    async def finish(filename, url, row):
+        nonlocal done
+        if url in rows[filename]:
+            return  # a worker failed after this URL was already recorded
+        rows[filename][url] = row or {"URL": url, **EMPTY_ROW}
+        done += 1
+        if len(rows[filename]) == len(unique_by_file[filename]):
+            await asyncio.to_thread(run.finish_dataset, filename)
+            out_path = "columnar store"
+            if run.write_csv:
+                out_path = output_path(filename, run)
+                await asyncio.to_thread(write_csv, out_path, [rows[filename][u] for u in urls_by_file[filename]])
+            print(f">>>> Finished dataset {filename}. Saved to {out_path} "
+                  f"[{done}/{total}, llm limit {llm.limit:.1f}, bert limit {bert.limit:.1f}]")
+
+    async def summarize_one(filename, url):
+        stored = await asyncio.to_thread(run.store.get_summary, url, run.model_key, run.config_hash)
+        if stored is not None:
+            await asyncio.to_thread(run.remember, url, stored["content"])
+        else:
+            started = time.monotonic()
+            payload, snapshot = await asyncio.to_thread(run.summarize_request, url)
+            res = await call_limited(pool, llm, "/api/summarize", payload, args.timeout, f"[summarize] {url}")
+            summary = res and res.get("summary")
+            content = res and await asyncio.to_thread(run.article_text, url, res, snapshot)
+            if not summary or not content:
+                print(f"[summarize] {url} -> no summary or extracted content")
+                await finish(filename, url, None)
+                return
+            latency = round(time.monotonic() - started, 2)
+            await asyncio.to_thread(run.store.put_summary, url, run.model_key, run.config_hash, summary, content,
+                                    res.get("model"), latency, res.get("usage", {}).get("total_tokens", 0))
+            stored = await asyncio.to_thread(run.store.get_summary, url, run.model_key, run.config_hash)
+            print(f"[summarize] {url} -> {latency:.2f}s")
+        await evaluate_q.put((filename, url, stored))
+
+    async def evaluate_one(filename, url, stored):
+        scores = None
+        if not run.recompute_metrics:
+            scores = await asyncio.to_thread(run.store.get_metrics, url, run.model_key, run.config_hash,
+                                             METRIC_VERSION)
+        if scores is None:
+            scores = await call_limited(pool, bert, "/api/evaluate",
+                                        {"original": stored["content"], "summary": stored["summary"]},
+                                        args.timeout, f"[evaluate] {url}")
+            if scores:
+                await asyncio.to_thread(run.store.put_metrics, url, run.model_key, run.config_hash,
+                                        METRIC_VERSION, scores)
+        if scores:
+            await asyncio.to_thread(run.emit, filename, url, stored, scores)
+        await finish(filename, url, result_row(url, stored, scores) if scores else None)
+
+    # Like the synchronous runner, an unexpected error fails its URL, not the run.
+    async def summarize_worker():
+        while True:
+            item = await summarize_q.get()
+            if item is None:
+                return
+            try:
+                await summarize_one(*item)
+            except Exception as exc:
+                print(f"URL {item[1]} generated an exception: {exc}")
+                await finish(item[0], item[1], None)
+
+    async def evaluate_worker():
+        while True:
+            item = await evaluate_q.get()
+            if item is None:
+                return
+            try:
+                await evaluate_one(*item)
+            except Exception as exc:
+                print(f"URL {item[1]} generated an exception: {exc}")
+                await finish(item[0], item[1], None)
+
+    for filename, urls in unique_by_file.items():
+        for url in urls:
+            summarize_q.put_nowait((filename, url))
+
+    # One worker per possible slot; the limiters decide how many actually send.
+    summarizers = [asyncio.create_task(summarize_worker()) for _ in range(args.llm_max)]
+    evaluators = [asyncio.create_task(evaluate_worker()) for _ in range(args.bert_max)]
+    started = time.monotonic()
+    try:
+        for _ in summarizers:
+            summarize_q.put_nowait(None)
+        await asyncio.gather(*summarizers)
+        for _ in evaluators:
+            evaluate_q.put_nowait(None)
+        await asyncio.gather(*evaluators)
+    finally:
+        for task in summarizers + evaluators:
+            task.cancel()
+        pool.close()
+
+    print(f"Processed {done}/{total} URLs in {time.monotonic() - started:.1f}s; "
+          f"llm {llm.stats()}, bert {bert.stats()}, "
+          f"connections opened {pool.opened}, reused {pool.reused}")
@@ -0,0 +1,369 @@
+"""
+Columnar result store for run_metrics.py.
+
+The per-dataset CSVs are rewritten in full at the end of every dataset, and
+cross-model numbers used to come from ``fill_results.mjs`` pulling rows back
+out of Supabase. Here every finished URL is streamed into a Parquet dataset
+as soon as it is scored, partitioned like the CSVs:
+
+    results/columnar/category=1_thoi_su/model=gpt-4o/part-<run_id>.parquet
+
+- Rows are buffered per partition and written as a Parquet row group every
+  ``row_group_size`` rows; a partition's file is finalised when its dataset
+  finishes (or the run ends). Files are written under a ``.tmp`` name and
+  renamed when complete, so readers never see a half-written file.
+- Runs never rewrite earlier files: each run adds one part per partition.
+  Queries keep the latest row per (category, model, url), so reruns and
+  ``--recompute-metrics`` supersede older rows instead of double-counting.
+- ``summarize_models`` reads one model partition and only the needed columns
+  at a time to compute mean / p50 / p95 per metric; ``export_csv`` rebuilds
+  the familiar per-dataset CSVs (``{category}.csv`` for runs without
+  ``--model``, ``{category}_{model}.csv`` otherwise, as run_metrics.py names
+  them) and the all-models comparison CSV from the dataset.
+
+    python columnar_store.py summary [--json]
+    python columnar_store.py export [--out results]
+
+Requires ``pyarrow`` (``pip install pyarrow``); without it run_metrics.py
+keeps writing CSVs only.
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+DEFAULT_ROOT = os.path.join("results", "columnar")
+ROW_GROUP_SIZE = 256
+
+# Partition of runs without --model (``RunConfig.model_key``).
+DEFAULT_MODEL = "default"
+
+# Metrics aggregated by ``summarize_models``, in report order.
+SUMMARY_FIELDS = ("rouge1", "rouge2", "rougeL", "bleu", "bert_score", "compression_rate", "latency_s", "total_tokens")
+
+# Columnar field -> CSV header used by run_metrics.py / fill_results.mjs.
+CSV_COLUMNS = {
+    "rouge1": "ROUGE-1",
+    "rouge2": "ROUGE-2",
+    "rougeL": "ROUGE-L",
+    "bleu": "BLEU",
+    "bert_score": "BERTSCORE",
+    "latency_s": "LATENCY",
+    "compression_rate": "COMPRESSION RATE",
+    "total_tokens": "TOTAL TOKENS",
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as exc:
+        raise RuntimeError("The columnar store needs pyarrow: pip install pyarrow") from exc
+    return pyarrow
+
+
+def have_pyarrow():
+    try:
+        _require_pyarrow()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _schema():
+    pa = _require_pyarrow()
+    return pa.schema([
+        ("url", pa.string()),
+        ("config_hash", pa.string()),
+        ("metric_version", pa.string()),
+        ("response_model", pa.string()),
+        ("run_id", pa.string()),
+        ("written_at", pa.float64()),
+        ("rouge1", pa.float64()),
+        ("rouge2", pa.float64()),
+        ("rougeL", pa.float64()),
+        ("bleu", pa.float64()),
+        ("bert_score", pa.float64()),
+        ("compression_rate", pa.float64()),
+        ("latency_s", pa.float64()),
+        ("total_tokens", pa.int64()),
+    ])
+
+
+def partition_value(value):
+    """Directory-safe partition value (model names contain ``/``)."""
+    return value.replace("/", "-").replace("=", "-")
+
+
+def category_of(dataset_filename):
+    return os.path.splitext(os.path.basename(dataset_filename))[0]
+
+
+def csv_name(category, model):
+    """CSV file name ``run_metrics.output_path`` gives this partition's dataset."""
+    return f"{category}.csv" if model == DEFAULT_MODEL else f"{category}_{model}.csv"
+
+
+def record(url, stored, scores, config_hash, metric_version):
+    """One columnar row for a stored summary and its scores."""
+    def num(value):
+        return None if value in (None, "") else float(value)
+
+    return {
+        "url": url,
+        "config_hash": config_hash,
+        "metric_version": metric_version,
+        "response_model": stored.get("response_model"),
+        "rouge1": num(scores.get("rouge1")),
+        "rouge2": num(scores.get("rouge2")),
+        "rougeL": num(scores.get("rougeL")),
+        "bleu": num(scores.get("bleu")),
+        "bert_score": num(scores.get("bert_score")),
+        "compression_rate": num(scores.get("compression_rate")),
+        "latency_s": num(stored.get("latency")),
+        "total_tokens": None if stored.get("total_tokens") is None else int(stored["total_tokens"]),
+    }
+
+
+class ColumnarSink:
+    """Streams result rows into ``root/category=…/model=…/part-<run_id>.parquet``."""
+
+    def __init__(self, root=DEFAULT_ROOT, row_group_size=ROW_GROUP_SIZE, run_id=None):
+        self.pa = _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        self._pq = pq
+        self.root = root
+        self.row_group_size = row_group_size
+        self.run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.schema = _schema()
+        self.rows_written = 0
+        self._buffers = {}
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def _path(self, category, model):
+        return os.path.join(
+            self.root, f"category={partition_value(category)}", f"model={partition_value(model)}",
+            f"part-{self.run_id}.parquet",
+        )
+
+    def append(self, category, model, row):
+        key = (category, model)
+        with self._lock:
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append({**row, "run_id": self.run_id, "written_at": time.time()})
+            if len(buffer) >= self.row_group_size:
+                self._flush(key)
+
+    def _flush(self, key):
+        buffer = self._buffers.pop(key, None)
+        if not buffer:
+            return
+        writer = self._writers.get(key)
+        if writer is None:
+            path = self._path(*key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = self._writers[key] = self._pq.ParquetWriter(path + ".tmp", self.schema, compression="zstd")
+        writer.write_table(self.pa.Table.from_pylist(buffer, schema=self.schema))
+        self.rows_written += len(buffer)
+
+    def close_partition(self, category, model):
+        """Write the last row group and publish the partition's file."""
+        key = (category, model)
+        with self._lock:
+            self._flush(key)
+            writer = self._writers.pop(key, None)
+            if writer is not None:
+                writer.close()
+                path = self._path(*key)
+                os.replace(path + ".tmp", path)
+
+    def close(self):
+        for key in set(self._buffers) | set(self._writers):
+            self.close_partition(*key)
+
+
+def _parts(root):
+    """(category, model) pairs present under ``root``, from the directory names alone."""
+    pairs = []
+    if not os.path.isdir(root):
+        return pairs
+    for cat_dir in sorted(os.listdir(root)):
+        if not cat_dir.startswith("category="):
+            continue
+        for model_dir in sorted(os.listdir(os.path.join(root, cat_dir))):
+            if model_dir.startswith("model="):
+                pairs.append((cat_dir.split("=", 1)[1], model_dir.split("=", 1)[1]))
+    return pairs
+
+
+def _files(root, category=None, model=None):
+    files = []
+    for cat, mod in _parts(root):
+        if (category is None or cat == category) and (model is None or mod == model):
+            part_dir = os.path.join(root, f"category={cat}", f"model={mod}")
+            files += [os.path.join(part_dir, f) for f in sorted(os.listdir(part_dir)) if f.endswith(".parquet")]
+    return files
+
+
+def models(root=DEFAULT_ROOT):
+    return sorted({model for _, model in _parts(root)})
+
+
+def read_latest(root, columns, category=None, model=None, config_hash=None):
+    """
+    Rows of one category and/or model, keeping only the newest row per
+    (category, url). Only ``columns`` (plus the keys) are read from disk.
+    """
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    files = _files(root, category, model)
+    if not files:
+        return None
+    wanted = sorted(set(columns) | {"url", "written_at"} | ({"config_hash"} if config_hash else set()))
+    tables = []
+    for path in files:
+        table = pq.read_table(path, columns=wanted)
+        if config_hash:
+            table = table.filter(pc.equal(table["config_hash"], config_hash))
+        cat = os.path.basename(os.path.dirname(os.path.dirname(path))).split("=", 1)[1]
+        tables.append(table.append_column("category", pa.array([cat] * table.num_rows, pa.string())))
+    table = pa.concat_tables(tables)
+    if table.num_rows == 0:
+        return table
+
+    table = table.sort_by([("written_at", "descending")])
+    keys = pc.binary_join_element_wise(table["category"], table["url"], "\x1f").to_numpy(zero_copy_only=False)
+    _, first = np.unique(keys, return_index=True)
+    return table.take(np.sort(first))
+
+
+def _describe(values):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"n": 0, "mean": None, "p50": None, "p95": None}
+    return {
+        "n": int(values.size),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+    }
+
+
+def summarize_models(root=DEFAULT_ROOT, fields=SUMMARY_FIELDS, config_hash=None):
+    """Per-model mean / p50 / p95 of ``fields``, one model partition in memory at a time."""
+    summary = {}
+    for model in models(root):
+        table = read_latest(root, fields, model=model, config_hash=config_hash)
+        if table is None or table.num_rows == 0:
+            continue
+        summary[model] = {"rows": table.num_rows}
+        for field in fields:
+            column = table[field].cast("float64").to_numpy(zero_copy_only=False)
+            summary[model][field] = _describe(np.asarray(column, dtype=np.float64))
+    return summary
+
+
+def _fmt(value):
+    if value is None:
+        return ""
+    return f"{value:.4f}" if isinstance(value, float) else str(value)
+
+
+def _dataset_urls(dataset_dir, category):
+    path = os.path.join(dataset_dir, f"{category}.csv")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [row[0].strip() for row in reader if row and row[0].strip()]
+
+
+def export_csv(root=DEFAULT_ROOT, out_dir="results", dataset_dir="dataset", config_hash=None):
+    """
+    Write each partition's CSV under the name run_metrics.py gives it (URLs in
+    dataset order, blank rows for URLs without results) and
+    ``comparison_all_models.csv``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    fields = list(CSV_COLUMNS)
+    header = ["URL", *CSV_COLUMNS.values()]
+    written = []
+    comparison_path = os.path.join(out_dir, "comparison_all_models.csv")
+    with open(comparison_path, "w", encoding="utf-8", newline="") as comp:
+        comp_writer = csv.writer(comp)
+        comp_writer.writerow(["URL", "MODEL", *CSV_COLUMNS.values()])
+        for category, model in _parts(root):
+            table = read_latest(root, fields, category=category, model=model, config_hash=config_hash)
+            if table is None:
+                continue
+            by_url = {row["url"]: row for row in table.select(["url", *fields]).to_pylist()}
+            urls = _dataset_urls(dataset_dir, category) or sorted(by_url)
+
+            out_path = os.path.join(out_dir, csv_name(category, model))
+            with open(out_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for url in urls:
+                    row = by_url.get(url)
+                    values = [_fmt(row[field]) if row else "" for field in fields]
+                    writer.writerow([url, *values])
+                    if row:
+                        comp_writer.writerow([url, model, *values])
+            written.append((out_path, len(by_url), len(urls)))
+    return written, comparison_path
+
+
+def print_summary(summary):
+    cols = ("rouge1", "rouge2", "rougeL", "bleu", "bert_score", "latency_s", "total_tokens")
+    print(f"{'Model':<22} {'N':>5} " + " ".join(f"{c:>21}" for c in cols))
+    print(f"{'':<22} {'':>5} " + " ".join(f"{'mean / p50 / p95':>21}" for _ in cols))
+    print("-" * (29 + 22 * len(cols)))
+    for model, stats in summary.items():
+        cells = []
+        for c in cols:
+            s = stats[c]
+            digits = 0 if c == "total_tokens" else (2 if c == "latency_s" else 3)
+            cells.append("N/A".rjust(21) if s["mean"] is None else
+                         f"{s['mean']:.{digits}f}/{s['p50']:.{digits}f}/{s['p95']:.{digits}f}".rjust(21))
+        print(f"{model:<22} {stats['rows']:>5} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and export the columnar evaluation results.")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Columnar dataset root (default: {DEFAULT_ROOT})")
+    parser.add_argument("--config-hash", help="Only consider rows produced with this summarization config")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_cmd = sub.add_parser("summary", help="Per-model mean/p50/p95 of every metric")
+    summary_cmd.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    export_cmd = sub.add_parser("export", help="Rebuild the per-category/per-model CSVs")
+    export_cmd.add_argument("--out", default="results", help="Output directory (default: results)")
+    export_cmd.add_argument("--dataset-dir", default="dataset", help="Where the URL lists live (default: dataset)")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        summary = summarize_models(args.root, config_hash=args.config_hash)
+        if args.json:
+            print(json.dumps(summary, indent=2))
+        else:
+            print_summary(summary)
+    else:
+        written, comparison_path = export_csv(args.root, args.out, args.dataset_dir, args.config_hash)
+        for path, filled, total in written:
+            print(f"  {path}: {filled}/{total} URLs filled")
+        print(f"  {comparison_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@
  * Pulls evaluation_metrics from Supabase and fills the results CSVs.
  * Creates per-model result files: results/{category}_{model}.csv
  * Also creates a combined comparison CSV.
+ * (Runs made with run_metrics.py can rebuild the same files locally from the
+ * columnar store: python columnar_store.py export.)
  */
 
 import { readFileSync, writeFileSync, mkdirSync, readdirSync } from 'fs';
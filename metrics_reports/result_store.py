@@ -0,0 +1,134 @@
+"""
+On-disk result store for run_metrics.py.
+
+Every finished step is committed to a SQLite database the moment it
+completes, so an interrupted run loses at most the URLs that were in flight:
+
+- ``contents``  — extracted article texts, keyed by their SHA-256 (the same
+  article fetched for several models is stored once)
+- ``summaries`` — one row per (url, model, config_hash): the summary, its
+  latency and token usage, and a pointer into ``contents``
+- ``metrics``   — one row per (url, model, config_hash, metric_version)
+
+``config_hash`` covers everything that changes the summary (request payload,
+``--config-tag`` for prompt changes); ``metric_version`` covers everything
+that changes the scores. Reruns skip whatever is already stored, and
+``--recompute-metrics`` rescores stored summaries without calling the LLM.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    sha256 TEXT PRIMARY KEY,
+    text   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    url            TEXT NOT NULL,
+    model          TEXT NOT NULL,
+    config_hash    TEXT NOT NULL,
+    summary        TEXT NOT NULL,
+    content_sha256 TEXT NOT NULL REFERENCES contents(sha256),
+    response_model TEXT,
+    latency        REAL,
+    total_tokens   INTEGER,
+    created_at     REAL NOT NULL,
+    PRIMARY KEY (url, model, config_hash)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    url              TEXT NOT NULL,
+    model            TEXT NOT NULL,
+    config_hash      TEXT NOT NULL,
+    metric_version   TEXT NOT NULL,
+    rouge1           REAL,
+    rouge2           REAL,
+    rougeL           REAL,
+    bleu             REAL,
+    bert_score       REAL,
+    compression_rate REAL,
+    created_at       REAL NOT NULL,
+    PRIMARY KEY (url, model, config_hash, metric_version)
+);
+"""
+
+METRIC_FIELDS = ("rouge1", "rouge2", "rougeL", "bleu", "bert_score", "compression_rate")
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def config_hash(config):
+    """Stable short hash of a JSON-serialisable summarization config."""
+    return sha256(json.dumps(config, sort_keys=True, ensure_ascii=False))[:16]
+
+
+class ResultStore:
+    def __init__(self, path):
+        self.path = path
+        # One connection shared by the worker threads; every write is its own
+        # committed transaction so nothing is lost if the run dies.
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Summaries
+    # ------------------------------------------------------------------
+    def get_summary(self, url, model, cfg_hash):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.*, c.text AS content FROM summaries s "
+                "JOIN contents c ON c.sha256 = s.content_sha256 "
+                "WHERE s.url = ? AND s.model = ? AND s.config_hash = ?",
+                (url, model, cfg_hash),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def put_summary(self, url, model, cfg_hash, summary, content, response_model, latency, total_tokens):
+        content_sha = sha256(content)
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR IGNORE INTO contents (sha256, text) VALUES (?, ?)", (content_sha, content)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, model, cfg_hash, summary, content_sha, response_model, latency, total_tokens, time.time()),
+            )
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+    def get_metrics(self, url, model, cfg_hash, metric_version):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM metrics WHERE url = ? AND model = ? AND config_hash = ? AND metric_version = ?",
+                (url, model, cfg_hash, metric_version),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def put_metrics(self, url, model, cfg_hash, metric_version, scores):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, model, cfg_hash, metric_version, *(scores.get(f) for f in METRIC_FIELDS), time.time()),
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("contents", "summaries", "metrics")
+            }
@@ -2,14 +2,31 @@ import os
 import csv
 import json
 import time
+import argparse
 import urllib.request
 import urllib.error
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import columnar_store
+from result_store import ResultStore, config_hash
+from snapshot_store import SnapshotStore
+
 # Define paths relative to the script execution Directory (which should be metrics_reports)
 DATASET_DIR = "dataset"
 RESULTS_DIR = "results"
 BACKEND_URL = "http://localhost:3000"
+DEFAULT_DB = os.path.join(RESULTS_DIR, "results.sqlite")
+DEFAULT_COLUMNAR = os.path.join(RESULTS_DIR, "columnar")
+DEFAULT_SNAPSHOTS = os.path.join(RESULTS_DIR, "snapshots.sqlite")
+
+# Bump when /api/evaluate changes how scores are computed; cached summaries are
+# then rescored on the next run without calling the LLM again.
+METRIC_VERSION = "1"
+
+EMPTY_ROW = {
+    "ROUGE-1": "", "ROUGE-2": "", "ROUGE-L": "", "BLEU": "", "BERTSCORE": "",
+    "LATENCY": "", "COMPRESSION RATE": "", "TOTAL TOKENS": ""
+}
 
 def call_api(endpoint, payload):
     url = f"{BACKEND_URL}{endpoint}"
@@ -28,57 +45,145 @@ def call_api(endpoint, payload):
         print(f"Error for {url}: {e}")
         return None
 
-def process_url(url, i, total):
+class RunConfig:
+    def __init__(self, store, model=None, config_tag="", recompute_metrics=False, sink=None, write_csv=True,
+                 snapshots=None, refresh_snapshots=False):
+        self.store = store
+        self.snapshots = snapshots
+        self.refresh_snapshots = refresh_snapshots
+        self.sink = sink
+        self.write_csv = write_csv
+        self.model = model
+        self.model_key = model or columnar_store.DEFAULT_MODEL
+        self.recompute_metrics = recompute_metrics
+        # Everything except the URL that decides what summary comes back.
+        self.summarize_payload = {"debug": True}
+        if model:
+            self.summarize_payload["model"] = model
+        self.config_hash = config_hash({"summarize": self.summarize_payload, "tag": config_tag})
+
+    def summarize_request(self, url):
+        """
+        ``(payload, article_text)`` for /api/summarize. With a snapshot the text is
+        sent as ``content``, so the backend neither fetches nor extracts the page
+        and no debug payload is needed; otherwise the backend fetches the URL.
+        """
+        text = None
+        if self.snapshots and not self.refresh_snapshots:
+            text = self.snapshots.get(url)
+        if text is None:
+            return {"url": url, **self.summarize_payload}, None
+        payload = {k: v for k, v in self.summarize_payload.items() if k != "debug"}
+        return {"url": url, "content": text, **payload}, text
+
+    def article_text(self, url, response, snapshot=None):
+        """The article behind a summarize response, snapshotting freshly extracted text."""
+        if snapshot is not None:
+            return snapshot
+        text = response.get("debug", {}).get("extractedContent", {}).get("fullContent")
+        self.remember(url, text)
+        return text
+
+    def remember(self, url, text):
+        if text and self.snapshots:
+            self.snapshots.put(url, text)
+
+    def emit(self, filename, url, stored, scores):
+        """Stream a finished row into the columnar store (if enabled)."""
+        if self.sink:
+            row = columnar_store.record(url, stored, scores, self.config_hash, METRIC_VERSION)
+            self.sink.append(columnar_store.category_of(filename), self.model_key, row)
+
+    def finish_dataset(self, filename):
+        if self.sink:
+            self.sink.close_partition(columnar_store.category_of(filename), self.model_key)
+
+
+def summarize(url, i, total, run):
+    """Return the stored summary for ``url`` or create (and store) it."""
+    cached = run.store.get_summary(url, run.model_key, run.config_hash)
+    if cached:
+        print(f"[{i}/{total}] Cached summary: {url}")
+        run.remember(url, cached["content"])
+        return cached
+
     print(f"[{i}/{total}] Summarizing: {url}")
     start_time = time.time()
     
-    # 1. Call Summarize API (non-streaming, require debug info for original content)
-    summary_res = call_api("/api/summarize", {"url": url, "debug": True})
+    # 1. Call Summarize API (non-streaming; debug info carries the original content
+    #    unless it comes from the snapshot store)
+    payload, snapshot = run.summarize_request(url)
+    summary_res = call_api("/api/summarize", payload)
     
     latency = time.time() - start_time
     
     if not summary_res:
         print(f"[{i}/{total}] -> Failed to summarize (API Error) {url}")
-        return url, None
+        return None
         
     summary = summary_res.get("summary")
-    debug_info = summary_res.get("debug", {})
-    extracted_content = debug_info.get("extractedContent", {}).get("fullContent")
+    extracted_content = run.article_text(url, summary_res, snapshot)
     usage = summary_res.get("usage", {})
     total_tokens = usage.get("total_tokens", 0)
     
     if not summary or not extracted_content:
         print(f"[{i}/{total}] -> Missing summary or extracted content {url}")
-        return url, None
-        
-    print(f"[{i}/{total}] -> Summarized in {latency:.2f}s. Evaluating...")
-    
+        return None
+
+    print(f"[{i}/{total}] -> Summarized in {latency:.2f}s.")
+    run.store.put_summary(
+        url, run.model_key, run.config_hash, summary, extracted_content,
+        summary_res.get("model"), round(latency, 2), total_tokens,
+    )
+    return run.store.get_summary(url, run.model_key, run.config_hash)
+
+def evaluate(url, i, total, run, stored):
+    """Return stored metrics for the summary, or score it via /api/evaluate and store them."""
+    if not run.recompute_metrics:
+        cached = run.store.get_metrics(url, run.model_key, run.config_hash, METRIC_VERSION)
+        if cached:
+            return cached
+
+    print(f"[{i}/{total}] -> Evaluating...")
     # 2. Call Evaluate API
-    eval_res = call_api("/api/evaluate", {"original": extracted_content, "summary": summary})
+    eval_res = call_api("/api/evaluate", {"original": stored["content"], "summary": stored["summary"]})
     
     if not eval_res:
         print(f"[{i}/{total}] -> Failed to evaluate {url}")
+        return None
+
+    run.store.put_metrics(url, run.model_key, run.config_hash, METRIC_VERSION, eval_res)
+    return eval_res
+
+def process_url(url, i, total, run, filename=None):
+    stored = summarize(url, i, total, run)
+    if not stored:
         return url, None
-        
-    return url, {
+
+    scores = evaluate(url, i, total, run, stored)
+    if not scores:
+        return url, None
+
+    if filename:
+        run.emit(filename, url, stored, scores)
+    return url, result_row(url, stored, scores)
+
+def result_row(url, stored, scores):
+    """CSV row for a stored summary and its scores."""
+    return {
         "URL": url,
-        "ROUGE-1": eval_res.get("rouge1"),
-        "ROUGE-2": eval_res.get("rouge2"),
-        "ROUGE-L": eval_res.get("rougeL"),
-        "BLEU": eval_res.get("bleu"),
-        "BERTSCORE": eval_res.get("bert_score"),
-        "LATENCY": round(latency, 2),
-        "COMPRESSION RATE": eval_res.get("compression_rate"),
-        "TOTAL TOKENS": total_tokens
+        "ROUGE-1": scores.get("rouge1"),
+        "ROUGE-2": scores.get("rouge2"),
+        "ROUGE-L": scores.get("rougeL"),
+        "BLEU": scores.get("bleu"),
+        "BERTSCORE": scores.get("bert_score"),
+        "LATENCY": stored["latency"],
+        "COMPRESSION RATE": scores.get("compression_rate"),
+        "TOTAL TOKENS": stored["total_tokens"]
     }
 
-def process_dataset(filename):
-    print(f"\n==========================================")
-    print(f"Processing dataset: {filename}")
-    print(f"==========================================")
+def read_urls(filename):
     in_path = os.path.join(DATASET_DIR, filename)
-    out_path = os.path.join(RESULTS_DIR, filename)
-    
     urls = []
     with open(in_path, "r", encoding="utf-8") as f:
         reader = csv.reader(f)
@@ -86,12 +191,31 @@ def process_dataset(filename):
         for row in reader:
             if row and row[0].strip():
                 urls.append(row[0].strip())
+    return urls
+
+def output_path(filename, run):
+    out_name = filename if not run.model else f"{os.path.splitext(filename)[0]}_{run.model.replace('/', '-')}.csv"
+    return os.path.join(RESULTS_DIR, out_name)
+
+def write_csv(out_path, results):
+    fields = ["URL", "ROUGE-1", "ROUGE-2", "ROUGE-L", "BLEU", "BERTSCORE", "LATENCY", "COMPRESSION RATE", "TOTAL TOKENS"]
+    with open(out_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+def process_dataset(filename, run, workers=2):
+    print(f"\n==========================================")
+    print(f"Processing dataset: {filename}")
+    print(f"==========================================")
+    out_path = output_path(filename, run)
+    urls = read_urls(filename)
                 
     results_map = {}
     
-    # Using 2 concurrent workers to avoid rate limiting and excessive load on BERT microserver
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        futures = {executor.submit(process_url, url, i+1, len(urls)): url for i, url in enumerate(urls)}
+    # 2 concurrent workers by default to avoid rate limiting and excessive load on BERT microserver
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_url, url, i+1, len(urls), run, filename): url for i, url in enumerate(urls)}
         
         for future in as_completed(futures):
             url = futures[future]
@@ -100,35 +224,71 @@ def process_dataset(filename):
                 if res:
                     results_map[processed_url] = res
                 else:
-                    results_map[processed_url] = {
-                        "URL": url,
-                        "ROUGE-1": "", "ROUGE-2": "", "ROUGE-L": "", "BLEU": "", "BERTSCORE": "",
-                        "LATENCY": "", "COMPRESSION RATE": "", "TOTAL TOKENS": ""
-                    }
+                    results_map[processed_url] = {"URL": url, **EMPTY_ROW}
             except Exception as exc:
                 print(f"URL {url} generated an exception: {exc}")
-                results_map[url] = {
-                    "URL": url,
-                    "ROUGE-1": "", "ROUGE-2": "", "ROUGE-L": "", "BLEU": "", "BERTSCORE": "",
-                    "LATENCY": "", "COMPRESSION RATE": "", "TOTAL TOKENS": ""
-                }
-                
+                results_map[url] = {"URL": url, **EMPTY_ROW}
+
+    run.finish_dataset(filename)
+    if not run.write_csv:
+        print(f">>>> Finished dataset {filename}.\n")
+        return
+
     # Restore original order as they appear in the dataset
     results = [results_map[url] for url in urls]
             
     # Write results to CSV
-    fields = ["URL", "ROUGE-1", "ROUGE-2", "ROUGE-L", "BLEU", "BERTSCORE", "LATENCY", "COMPRESSION RATE", "TOTAL TOKENS"]
-    with open(out_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        writer.writerows(results)
+    write_csv(out_path, results)
         
     print(f">>>> Finished dataset {filename}. Saved to {out_path}\n")
 
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Summarize and score every dataset URL, resuming from the result store.")
+    parser.add_argument("--model", help="Model to summarize with (default: the backend's default model)")
+    parser.add_argument("--config-tag", default="", help="Bump when prompts/config change so summaries are regenerated")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Result store path (default: {DEFAULT_DB})")
+    parser.add_argument("--recompute-metrics", action="store_true",
+                        help="Rescore stored summaries via /api/evaluate without calling the LLM again")
+    parser.add_argument("--columnar-dir", default=DEFAULT_COLUMNAR,
+                        help=f"Stream rows into a Parquet dataset here (default: {DEFAULT_COLUMNAR}; '' disables)")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="Skip the per-dataset CSVs (export them later with columnar_store.py export)")
+    parser.add_argument("--snapshots", default=DEFAULT_SNAPSHOTS,
+                        help=f"Article snapshot store (default: {DEFAULT_SNAPSHOTS}; '' disables)")
+    parser.add_argument("--refresh-snapshots", action="store_true",
+                        help="Let the backend re-fetch pages; changed texts are added as new snapshots")
+    parser.add_argument("--workers", type=int, default=2, help="Thread-pool size of the synchronous runner")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Use the pipelined asyncio runner with adaptive concurrency (see async_runner.py)")
+    return parser
+
 def main():
+    parser = build_arg_parser()
+    from async_runner import add_async_args
+    add_async_args(parser)
+    args = parser.parse_args()
+
     # Ensure results directory exists
     if not os.path.exists(RESULTS_DIR):
         os.makedirs(RESULTS_DIR)
+
+    store = ResultStore(args.db)
+    sink = None
+    if args.columnar_dir:
+        if columnar_store.have_pyarrow():
+            sink = columnar_store.ColumnarSink(args.columnar_dir)
+            print(f"Columnar output: {args.columnar_dir} (run {sink.run_id})")
+        else:
+            print("pyarrow is not installed; writing CSVs only (pip install pyarrow for columnar output)")
+    if args.no_csv and sink is None:
+        parser.error("--no-csv needs the columnar store (install pyarrow, keep --columnar-dir)")
+    snapshots = SnapshotStore(args.snapshots) if args.snapshots else None
+    run = RunConfig(store, model=args.model, config_tag=args.config_tag, recompute_metrics=args.recompute_metrics,
+                    sink=sink, write_csv=not args.no_csv,
+                    snapshots=snapshots, refresh_snapshots=args.refresh_snapshots)
+    print(f"Result store: {args.db} {store.stats()} (config {run.config_hash}, metrics v{METRIC_VERSION})")
+    if snapshots:
+        print(f"Snapshots: {args.snapshots} {snapshots.stats()}")
         
     # Find all CSV files in the dataset folder
     dataset_files = [f for f in os.listdir(DATASET_DIR) if f.endswith(".csv")]
@@ -138,8 +298,20 @@ def main():
         print("No dataset files found!")
         return
         
-    for filename in dataset_files:
-        process_dataset(filename)
+    try:
+        if args.use_async:
+            import asyncio
+            from async_runner import run_datasets
+            asyncio.run(run_datasets(dataset_files, run, args))
+        else:
+            for filename in dataset_files:
+                process_dataset(filename, run, workers=args.workers)
+    finally:
+        if sink:
+            sink.close()
+        if snapshots:
+            snapshots.close()
+        store.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+"""
+Compressed article snapshots for run_metrics.py.
+
+Without snapshots every run sends ``debug: True`` to ``/api/summarize`` so the
+backend re-downloads and re-extracts each news page just to return
+``extractedContent.fullContent``, and the article behind a URL can change
+between runs. Here the extracted text of each URL is kept locally:
+
+- ``snapshots`` — one row per (url, fetched_at): the text compressed with
+  zstd (``zstandard``, when installed) or zlib, its codec, SHA-256 and
+  length. A new row is only added when the text actually changed, so the
+  table doubles as a change history of each page.
+
+Once a URL has a snapshot the runner sends the text as ``content`` (the
+backend then skips fetching and extraction entirely) and scores against that
+same text, so reruns are reproducible and do no page I/O. Snapshots are
+filled by the runner on the first pass, or from texts already in the result
+store:
+
+    python snapshot_store.py import-results            # results/results.sqlite -> snapshots
+    python snapshot_store.py pairs --out pairs.jsonl   # {"reference", "candidate"} for bert/ tooling
+    python snapshot_store.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback
+    zstandard = None
+
+DEFAULT_PATH = os.path.join("results", "snapshots.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    url        TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    codec      TEXT NOT NULL,
+    sha256     TEXT NOT NULL,
+    length     INTEGER NOT NULL,
+    blob       BLOB NOT NULL,
+    PRIMARY KEY (url, fetched_at)
+);
+"""
+
+
+def _compress(text):
+    raw = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+
+def _decompress(codec, blob):
+    if codec == "zlib":
+        return zlib.decompress(blob).decode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This snapshot is zstd-compressed: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    raise ValueError(f"Unknown snapshot codec {codec!r}")
+
+
+class SnapshotStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, url, at=None):
+        """Newest text for ``url`` (fetched no later than ``at``, if given), or None."""
+        sql = "SELECT codec, blob FROM snapshots WHERE url = ?"
+        params = [url]
+        if at is not None:
+            sql += " AND fetched_at <= ?"
+            params.append(at)
+        with self._lock:
+            row = self._conn.execute(sql + " ORDER BY fetched_at DESC LIMIT 1", params).fetchone()
+        return _decompress(*row) if row else None
+
+    def put(self, url, text, fetched_at=None):
+        """Store ``text`` for ``url`` unless it equals the newest snapshot; returns True if stored."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            latest = self._conn.execute(
+                "SELECT sha256 FROM snapshots WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)
+            ).fetchone()
+            if latest and latest[0] == digest:
+                return False
+            codec, blob = _compress(text)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                (url, fetched_at or time.time(), codec, digest, len(text), blob),
+            )
+        return True
+
+    def stats(self):
+        with self._lock:
+            urls, versions, raw, stored = self._conn.execute(
+                "SELECT COUNT(DISTINCT url), COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(LENGTH(blob)), 0) "
+                "FROM snapshots"
+            ).fetchone()
+        return {"urls": urls, "snapshots": versions, "text_chars": raw, "compressed_bytes": stored}
+
+
+def import_results(store, results_db):
+    """Snapshot every article text already held by run_metrics.py's result store."""
+    conn = sqlite3.connect(f"file:{results_db}?mode=ro", uri=True)
+    added = 0
+    try:
+        rows = conn.execute(
+            "SELECT s.url, c.text, MIN(s.created_at) FROM summaries s "
+            "JOIN contents c ON c.sha256 = s.content_sha256 GROUP BY s.url, c.sha256 ORDER BY 3"
+        )
+        for url, text, created_at in rows:
+            added += store.put(url, text, fetched_at=created_at)
+    finally:
+        conn.close()
+    return added
+
+
+def export_pairs(store, results_db, out_path):
+    """
+    Write ``{"url", "model", "reference", "candidate"}`` JSONL — snapshot text
+    against every stored summary — e.g. for ``BERT_PARITY_ARTICLES``.
+    """
+    conn = sqlite3.connect(f"file:{results_db}?mode=ro", uri=True)
+    written = 0
+    try:
+        with open(out_path, "w", encoding="utf-8") as f:
+            for url, model, summary in conn.execute("SELECT url, model, summary FROM summaries ORDER BY url, model"):
+                text = store.get(url)
+                if text:
+                    f.write(json.dumps({"url": url, "model": model, "reference": text, "candidate": summary},
+                                       ensure_ascii=False) + "\n")
+                    written += 1
+    finally:
+        conn.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local article snapshot store.")
+    parser.add_argument("--path", default=DEFAULT_PATH, help=f"Snapshot database (default: {DEFAULT_PATH})")
+    parser.add_argument("--results-db", default=os.path.join("results", "results.sqlite"),
+                        help="run_metrics.py result store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Print snapshot counts and sizes")
+    sub.add_parser("import-results", help="Snapshot the article texts already in the result store")
+    pairs = sub.add_parser("pairs", help="Export article/summary pairs as JSONL")
+    pairs.add_argument("--out", default="pairs.jsonl")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.path)
+    try:
+        if args.command == "import-results":
+            print(f"Imported {import_results(store, args.results_db)} snapshot(s)")
+        elif args.command == "pairs":
+            print(f"Wrote {export_pairs(store, args.results_db, args.out)} pair(s) to {args.out}")
+        print(store.stats(), f"codec for new snapshots: {'zstd' if zstandard else 'zlib'}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import csv
+import os
+from types import SimpleNamespace
+
+from columnar_store import ColumnarSink, export_csv, record
+from run_metrics import output_path
+
+
+def _row(bert_score, latency):
+    stored = {"response_model": "gpt-4o-mini", "latency": latency, "total_tokens": 1200}
+    scores = {"rouge1": 0.5, "rouge2": 0.4, "rougeL": 0.3, "bleu": 0.1, "bert_score": bert_score,
+              "compression_rate": 12.5}
+    return record("", stored, scores, "cfg", "1")
+
+
+def test_export_rebuilds_the_run_metrics_csvs(tmp_path):
+    dataset = tmp_path / "dataset"
+    dataset.mkdir()
+    (dataset / "1_thoi_su.csv").write_text("URL\nhttps://a\nhttps://b\nhttps://c\n", encoding="utf-8")
+
+    root = str(tmp_path / "columnar")
+    sink = ColumnarSink(root, row_group_size=1)
+    sink.append("1_thoi_su", "default", {**_row(0.61, 3.5), "url": "https://c"})
+    sink.append("1_thoi_su", "default", {**_row(0.62, 4.0), "url": "https://a"})
+    sink.append("1_thoi_su", "gpt-4o", {**_row(0.7, 2.0), "url": "https://b"})
+    sink.close()
+
+    out = tmp_path / "results"
+    written, comparison = export_csv(root, str(out), str(dataset))
+
+    # Same file names run_metrics.py writes without and with --model.
+    default_csv = output_path("1_thoi_su.csv", SimpleNamespace(model=None))
+    model_csv = output_path("1_thoi_su.csv", SimpleNamespace(model="gpt-4o"))
+    assert sorted(os.path.basename(p) for p, _, _ in written) == sorted(
+        [os.path.basename(default_csv), os.path.basename(model_csv)]
+    )
+
+    with open(out / os.path.basename(default_csv), encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["URL"] for r in rows] == ["https://a", "https://b", "https://c"]
+    assert rows[0]["BERTSCORE"] == "0.6200" and rows[0]["LATENCY"] == "4.0000"
+    assert rows[0]["TOTAL TOKENS"] == "1200"
+    assert rows[1]["BERTSCORE"] == ""  # no result for this URL in the default partition
+    assert rows[2]["BERTSCORE"] == "0.6100"
+
+    with open(comparison, encoding="utf-8") as f:
+        assert sum(1 for _ in f) == 1 + 3